@@ -0,0 +1,229 @@
+import os
+import os.path
+import imp
+import time
+import struct
+import marshal
+import hashlib
+import logging
+import threading
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+
+class BytecodeCache(object):
+    """
+        On-disk cache of compiled command module code objects.
+
+        Each entry is stored in its own file within the cache
+        directory, named after a hash of the module's path.  An entry
+        records the interpreter's bytecode magic number and the
+        module's modification time and size; it is only used if all
+        of them still match, so an entry can never return code for a
+        different version of a module or interpreter.
+
+        The cache is thread-safe, because it is used by the loader
+        pipeline's workers.
+
+    """
+
+    _extension = ".bbc"
+    _header = struct.Struct("<4sdqI32s")
+
+    # Temporary files younger than this may still be being written by
+    #  another thread, so prune() leaves them alone.
+    temp_grace_period = 10 * 60  # Seconds.
+
+    def __init__(self, directory):
+        self._directory = directory
+        self._magic = imp.get_magic()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __str__(self):
+        return "<{0}({1})>".format(self.__class__.__name__,
+                                   self._directory)
+
+    def get_directory(self):
+        return self._directory
+
+    def get_statistics(self):
+        """ Returns a (hits, misses) 2-tuple. """
+        return (self.hits, self.misses)
+
+    #-----------------------------------------------------------------------
+    # Entry access.
+
+    def load(self, path, modified_time, size):
+        """
+            Returns a ``(code, digest)`` 2-tuple for the module at
+            *path* with the given modification time and size, or None
+            if no valid entry is cached.
+
+        """
+
+        entry = self._read_entry(self._get_entry_path(path), True)
+        if entry:
+            entry_path, entry_time, entry_size, digest, code = entry
+            if (entry_path == os.path.abspath(path) and
+                    entry_time == modified_time and entry_size == size):
+                self._count(hit=True)
+                return code, digest
+        self._count(hit=False)
+        return None
+
+    def store(self, path, modified_time, size, digest, code):
+        """ Stores the compiled *code* of the module at *path*. """
+        if not self._create_directory():
+            return
+
+        encoded_path = os.path.abspath(path).encode("utf-8")
+        header = self._header.pack(self._magic, modified_time, size,
+                                   len(encoded_path), digest)
+        entry_path = self._get_entry_path(path)
+        temp_path = "{0}.{1}.tmp".format(entry_path,
+                                         threading.currentThread().ident)
+        try:
+            entry_file = open(temp_path, "wb")
+            try:
+                entry_file.write(header)
+                entry_file.write(encoded_path)
+                marshal.dump(code, entry_file)
+            finally:
+                entry_file.close()
+            self._replace(temp_path, entry_path)
+        except (IOError, OSError), e:
+            log.warning("Failed to write bytecode cache entry for {0}:"
+                        " {1}".format(path, e))
+            self._remove(temp_path)
+
+    def prune(self, valid_paths=None):
+        """
+            Removes stale entries from the cache.
+
+            An entry is stale if it was written by a different
+            interpreter version, if its module no longer exists or has
+            changed, or if *valid_paths* is given and does not contain
+            its module's path.  Temporary files left behind by failed
+            writes are removed once they are older than
+            *temp_grace_period*.
+
+            :returns: The number of entries removed.
+
+        """
+
+        if valid_paths is not None:
+            valid_paths = set(os.path.abspath(p) for p in valid_paths)
+        try:
+            filenames = os.listdir(self._directory)
+        except OSError:
+            return 0
+
+        removed = 0
+        for filename in filenames:
+            if not filename.endswith((self._extension, ".tmp")):
+                continue
+            entry_path = os.path.join(self._directory, filename)
+            if self._is_stale(entry_path, valid_paths):
+                if self._remove(entry_path):
+                    removed += 1
+        log.debug("Pruned {0} stale entries from bytecode cache {1}."
+                  "".format(removed, self._directory))
+        return removed
+
+    #-----------------------------------------------------------------------
+    # Internal methods.
+
+    def _count(self, hit):
+        self._lock.acquire()
+        try:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        finally:
+            self._lock.release()
+
+    def _get_entry_path(self, path):
+        key = os.path.normcase(os.path.abspath(path)).encode("utf-8")
+        filename = hashlib.md5(key).hexdigest() + self._extension
+        return os.path.join(self._directory, filename)
+
+    def _read_entry(self, entry_path, read_code):
+        try:
+            entry_file = open(entry_path, "rb")
+        except IOError:
+            return None
+
+        try:
+            try:
+                data = entry_file.read(self._header.size)
+                if len(data) != self._header.size:
+                    return None
+                (magic, modified_time, size,
+                 path_length, digest) = self._header.unpack(data)
+                if magic != self._magic:
+                    return None
+                path = entry_file.read(path_length).decode("utf-8")
+                code = None
+                if read_code:
+                    code = marshal.load(entry_file)
+            finally:
+                entry_file.close()
+        except (IOError, EOFError, ValueError, TypeError), e:
+            log.warning("Invalid bytecode cache entry {0}: {1}"
+                        "".format(entry_path, e))
+            return None
+        return path, modified_time, size, digest, code
+
+    def _is_stale(self, entry_path, valid_paths):
+        if entry_path.endswith(".tmp"):
+            try:
+                age = time.time() - os.path.getmtime(entry_path)
+            except OSError:
+                return False
+            return age > self.temp_grace_period
+        entry = self._read_entry(entry_path, False)
+        if not entry:
+            return True
+        path, modified_time, size = entry[:3]
+        if valid_paths is not None and path not in valid_paths:
+            return True
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return True
+        return (stat.st_mtime, stat.st_size) != (modified_time, size)
+
+    def _create_directory(self):
+        if os.path.isdir(self._directory):
+            return True
+        try:
+            os.makedirs(self._directory)
+        except OSError, e:
+            if not os.path.isdir(self._directory):
+                log.warning("Failed to create bytecode cache directory"
+                            " {0}: {1}".format(self._directory, e))
+                return False
+        return True
+
+    def _replace(self, source, destination):
+        try:
+            os.rename(source, destination)
+        except OSError:
+            # On Windows, rename() fails if the destination exists.
+            self._remove(destination)
+            os.rename(source, destination)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        return True
@@ -0,0 +1,123 @@
+import logging
+import threading
+from contextlib                     import contextmanager
+from pyutilib.component.core        import ExtensionPoint
+from bumblebee.command.interfaces   import ICommandSetObserver
+from bumblebee.command.registry     import get_command_set_registry
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+
+class ChangeBatch(object):
+    """
+        Collects command set load and unload notifications, so that
+        they can be delivered to observers as a single delta.
+
+        A command set which is loaded and then unloaded within the same
+        batch, or vice versa, cancels out and is not reported.
+
+    """
+
+    observers = ExtensionPoint(ICommandSetObserver)
+
+    def __init__(self):
+        self._added = []
+        self._removed = []
+
+    def loaded(self, command_set):
+        if not self._discard(self._removed, command_set):
+            self._added.append(command_set)
+
+    def unloaded(self, command_set):
+        if not self._discard(self._added, command_set):
+            self._removed.append(command_set)
+
+    def is_empty(self):
+        return not (self._added or self._removed)
+
+    def deliver(self):
+        """ Notifies all observers of this batch's changes, if any. """
+        if self.is_empty():
+            return
+        added, removed = tuple(self._added), tuple(self._removed)
+        self._added, self._removed = [], []
+        log.debug("Command sets changed: {0} added, {1} removed."
+                  "".format(len(added), len(removed)))
+
+        # Bring the registry up to date first, so that observers can
+        #  query it.
+        get_command_set_registry().apply_changes(added, removed)
+        for observer in self.observers:
+            try:
+                observer.command_sets_changed(added, removed)
+            except Exception, e:
+                log.exception("Observer {0} failed: {1}"
+                              "".format(observer, e))
+
+    def _discard(self, command_sets, command_set):
+        for index, item in enumerate(command_sets):
+            if item is command_set:
+                del command_sets[index]
+                return True
+        return False
+
+
+#---------------------------------------------------------------------------
+# Per-thread batch nesting.
+
+_state = threading.local()
+
+
+def _get_open_batch():
+    return getattr(_state, "batch", None)
+
+
+@contextmanager
+def batched_changes():
+    """
+        Context manager which collects all command set changes made
+        within it and delivers them to observers as one delta when the
+        outermost ``with`` block ends.
+
+        Batches nest; inner batches are merged into the outermost one.
+
+    """
+
+    if _get_open_batch() is not None:
+        yield _get_open_batch()
+        return
+
+    batch = ChangeBatch()
+    _state.batch = batch
+    try:
+        yield batch
+    finally:
+        _state.batch = None
+        batch.deliver()
+
+
+def notify_loaded(command_set):
+    """ Reports that *command_set* has been loaded. """
+    batch = _get_open_batch()
+    if batch is not None:
+        batch.loaded(command_set)
+    else:
+        batch = ChangeBatch()
+        batch.loaded(command_set)
+        batch.deliver()
+
+
+def notify_unloaded(command_set):
+    """ Reports that *command_set* has been unloaded. """
+    batch = _get_open_batch()
+    if batch is not None:
+        batch.unloaded(command_set)
+    else:
+        batch = ChangeBatch()
+        batch.unloaded(command_set)
+        batch.deliver()
@@ -0,0 +1,381 @@
+import os
+import os.path
+import time
+import hashlib
+import logging
+import threading
+import cPickle as pickle
+from collections import deque
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+# Structural hashing.
+
+def get_grammar_key(grammar, namespace=""):
+    """
+        Returns a hash of the structure of *grammar*: the names, export
+        state and elements of its rules, including referenced rules
+        which are not part of the grammar, and the names of its lists.
+
+        Two grammars with the same key compile to the same result, so
+        rules' activation and lists' contents, which are sent to the
+        engine separately, are not part of the key.
+
+        :param namespace: Text which distinguishes the keys of
+            different compilers.
+
+    """
+
+    parts = [namespace]
+    visited = set()
+    for rule in grammar.rules:
+        _describe_rule(rule, parts, visited)
+    for lst in getattr(grammar, "lists", ()):
+        parts.append("list {0}".format(lst.name))
+    text = "\n".join(parts)
+    if isinstance(text, unicode):
+        text = text.encode("utf-8")
+    return hashlib.sha1(text).hexdigest()
+
+
+def _describe_rule(rule, parts, visited):
+    if id(rule) in visited:
+        return
+    visited.add(id(rule))
+    parts.append("rule {0} {1}".format(rule.name, int(bool(rule.exported))))
+    _describe_element(rule.element, parts, visited)
+
+
+def _describe_element(element, parts, visited):
+    element_type = type(element)
+    parts.append("{0}.{1}".format(element_type.__module__,
+                                  element_type.__name__))
+
+    # Elements describe themselves, including their children, as a
+    #  grammar string; otherwise their children are described here.
+    gstring = getattr(element, "gstring", None)
+    if callable(gstring):
+        parts.append(gstring())
+    else:
+        words = getattr(element, "words", None)
+        if words is not None:
+            parts.append(repr(words))
+        for child in getattr(element, "children", ()):
+            _describe_element(child, parts, visited)
+        parts.append("end")
+
+    # Rules referenced by the element are compiled along with it.
+    referenced = getattr(element, "rule", None)
+    if referenced is not None:
+        _describe_rule(referenced, parts, visited)
+
+
+#===========================================================================
+
+class GrammarCache(object):
+    """
+        Cache of compiled grammars, held in memory and on disk.
+
+        Entries are keyed by :func:`get_grammar_key`, so a grammar which
+        is rebuilt unchanged, when its command module is reloaded or
+        when Bumblebee restarts, is not compiled again.  Each entry is
+        stored in its own file within the cache directory, and entries
+        which have not been used for *max_age* days are removed by
+        :meth:`prune`.
+
+        Results which cannot be pickled are only cached in memory.  The
+        cache is thread-safe.
+
+    """
+
+    _extension = ".bgc"
+    _format = 1
+
+    def __init__(self, directory=None, max_memory_entries=1000,
+                 max_age=30):
+        self._directory = directory
+        self._max_memory_entries = max_memory_entries
+        self._max_age = max_age
+        self._entries = {}
+        self._order = deque()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def __str__(self):
+        return "<{0}({1})>".format(self.__class__.__name__,
+                                   self._directory)
+
+    def get_directory(self):
+        return self._directory
+
+    def get_statistics(self):
+        """ Returns a (memory hits, disk hits, misses) 3-tuple. """
+        return (self.memory_hits, self.disk_hits, self.misses)
+
+    def get_hit_rate(self):
+        """ Returns the fraction of lookups which were hits, or None. """
+        hits = self.memory_hits + self.disk_hits
+        if not hits + self.misses:
+            return None
+        return hits / float(hits + self.misses)
+
+    def reset_statistics(self):
+        self.memory_hits = self.disk_hits = self.misses = 0
+
+    #-----------------------------------------------------------------------
+    # Entry access.
+
+    def compile(self, grammar, compile_function, namespace=""):
+        """
+            Returns the cached result of compiling *grammar*, or calls
+            *compile_function* to compile it and caches the result.
+
+        """
+
+        key = get_grammar_key(grammar, namespace)
+        found, value = self.get(key)
+        if found:
+            return value
+        value = compile_function()
+        self.put(key, value)
+        return value
+
+    def get(self, key):
+        """ Returns a ``(found, value)`` 2-tuple for *key*. """
+        self._lock.acquire()
+        try:
+            if key in self._entries:
+                self.memory_hits += 1
+                return True, self._entries[key]
+        finally:
+            self._lock.release()
+
+        found, value = self._read_entry(key)
+        self._lock.acquire()
+        try:
+            if found:
+                self.disk_hits += 1
+                self._remember(key, value)
+            else:
+                self.misses += 1
+        finally:
+            self._lock.release()
+        return found, value
+
+    def put(self, key, value):
+        self._lock.acquire()
+        try:
+            self._remember(key, value)
+        finally:
+            self._lock.release()
+        self._write_entry(key, value)
+
+    def prune(self):
+        """
+            Removes entries from disk which have not been used for
+            *max_age* days.
+
+            :returns: The number of entries removed.
+
+        """
+
+        if not self._directory:
+            return 0
+        try:
+            filenames = os.listdir(self._directory)
+        except OSError:
+            return 0
+
+        oldest_time = time.time() - self._max_age * 24 * 60 * 60
+        removed = 0
+        for filename in filenames:
+            if not filename.endswith((self._extension, ".tmp")):
+                continue
+            entry_path = os.path.join(self._directory, filename)
+            try:
+                if os.path.getmtime(entry_path) >= oldest_time:
+                    continue
+                os.remove(entry_path)
+                removed += 1
+            except OSError:
+                pass
+        log.debug("Pruned {0} unused entries from grammar cache {1}."
+                  "".format(removed, self._directory))
+        return removed
+
+    #-----------------------------------------------------------------------
+    # Internal methods.
+
+    def _remember(self, key, value):
+        if key not in self._entries:
+            self._order.append(key)
+        self._entries[key] = value
+        while len(self._order) > self._max_memory_entries:
+            del self._entries[self._order.popleft()]
+
+    def _get_entry_path(self, key):
+        return os.path.join(self._directory, key + self._extension)
+
+    def _read_entry(self, key):
+        if not self._directory:
+            return False, None
+        entry_path = self._get_entry_path(key)
+        try:
+            entry_file = open(entry_path, "rb")
+        except IOError:
+            return False, None
+
+        try:
+            try:
+                entry_format, entry_key, value = pickle.load(entry_file)
+            finally:
+                entry_file.close()
+        except Exception, e:
+            log.warning("Invalid grammar cache entry {0}: {1}"
+                        "".format(entry_path, e))
+            return False, None
+        if (entry_format, entry_key) != (self._format, key):
+            return False, None
+
+        # Mark the entry as used, so that it is not pruned.
+        try:
+            os.utime(entry_path, None)
+        except OSError:
+            pass
+        return True, value
+
+    def _write_entry(self, key, value):
+        if not self._directory:
+            return
+        try:
+            data = pickle.dumps((self._format, key, value), 2)
+        except Exception, e:
+            log.debug("Not storing grammar {0} on disk: {1}".format(key, e))
+            return
+        if not self._create_directory():
+            return
+
+        entry_path = self._get_entry_path(key)
+        temp_path = "{0}.{1}.tmp".format(entry_path,
+                                         threading.currentThread().ident)
+        try:
+            entry_file = open(temp_path, "wb")
+            try:
+                entry_file.write(data)
+            finally:
+                entry_file.close()
+            if os.path.exists(entry_path):
+                os.remove(entry_path)
+            os.rename(temp_path, entry_path)
+        except (IOError, OSError), e:
+            log.warning("Failed to write grammar cache entry {0}: {1}"
+                        "".format(entry_path, e))
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def _create_directory(self):
+        if os.path.isdir(self._directory):
+            return True
+        try:
+            os.makedirs(self._directory)
+        except OSError, e:
+            if not os.path.isdir(self._directory):
+                log.warning("Failed to create grammar cache directory"
+                            " {0}: {1}".format(self._directory, e))
+                return False
+        return True
+
+
+#===========================================================================
+# Compiler patching.
+
+# Dragonfly's compilers whose results can be cached, by module and
+#  class name, for the Dragonfly versions which Bumblebee supports.
+#  The SAPI 5 compiler is not included, since it builds COM objects
+#  which belong to one engine connection.
+compiler_classes = [
+    ("dragonfly.engines.compiler_natlink", "NatlinkCompiler"),
+    ("dragonfly.engines.backend_natlink.compiler", "NatlinkCompiler"),
+]
+
+
+def patch_compiler(compiler_class, cache):
+    """
+        Makes *compiler_class* compile grammars through *cache*.  The
+        class must have a ``compile_grammar(grammar)`` method.
+
+    """
+
+    unpatch_compiler(compiler_class)
+    method = compiler_class.compile_grammar
+    original = getattr(method, "im_func", method)
+    namespace = "{0}.{1}".format(compiler_class.__module__,
+                                 compiler_class.__name__)
+
+    def compile_grammar(compiler, grammar):
+        return cache.compile(grammar, lambda: original(compiler, grammar),
+                             namespace)
+    compile_grammar._bumblebee_original = original
+    compiler_class.compile_grammar = compile_grammar
+
+
+def unpatch_compiler(compiler_class):
+    function = getattr(compiler_class.compile_grammar, "im_func",
+                       compiler_class.compile_grammar)
+    original = getattr(function, "_bumblebee_original", None)
+    if original is not None:
+        compiler_class.compile_grammar = original
+
+
+def _get_compiler_classes():
+    classes = []
+    for module_name, class_name in compiler_classes:
+        try:
+            module = __import__(module_name, fromlist=[class_name])
+        except ImportError:
+            continue
+        classes.append(getattr(module, class_name))
+    return classes
+
+
+def install_grammar_cache(cache):
+    """
+        Makes Dragonfly's compilers use *cache*.
+
+        :returns: The number of compilers patched.
+
+    """
+
+    classes = _get_compiler_classes()
+    for compiler_class in classes:
+        patch_compiler(compiler_class, cache)
+    return len(classes)
+
+
+def uninstall_grammar_cache():
+    for compiler_class in _get_compiler_classes():
+        unpatch_compiler(compiler_class)
+
+
+#---------------------------------------------------------------------------
+
+_grammar_cache = None
+
+
+def set_grammar_cache(cache):
+    global _grammar_cache
+    _grammar_cache = cache
+
+
+def get_grammar_cache():
+    """ Returns the grammar cache in use, or None. """
+    return _grammar_cache
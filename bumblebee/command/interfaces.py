@@ -23,6 +23,39 @@ class ICommandSet(Interface):
 
         """
 
+    def get_path(self):
+        """
+            Returns the path of the file from which the command set is
+            loaded, or None if it does not come from a file.
+
+        """
+
+    def get_grammars(self):
+        """
+            Returns a tuple of the Dragonfly grammars which the
+            command set has created, or an empty tuple if it is not
+            loaded.
+
+        """
+
+    def get_load_profile(self):
+        """
+            Returns a LoadProfile with measurements taken while the
+            command set was last loaded, or None if it has not been
+            loaded.
+
+        """
+
+    def get_manifest(self):
+        """
+            Returns a CommandSetManifest describing the context in which
+            the command set is needed, or None if it is always needed.
+
+            This method must be cheap; it may be called before the
+            command set has been loaded.
+
+        """
+
     def load(self):
         """ Loads the command set. """
 
@@ -41,13 +74,27 @@ class ICommandSetLoader(Interface):
 
         """
 
+    def get_watched_paths(self):
+        """
+            Returns a sequence of files and directories whose changes
+            should cause this loader to be updated.
+
+        """
+
 
 #---------------------------------------------------------------------------
 
 class ICommandSetObserver(Interface):
 
-    def loaded_command_set(self, command_set):
-        """ Called when a command set has been loaded. """
+    def command_sets_changed(self, added, removed):
+        """
+            Called when command sets have been loaded and/or unloaded.
+
+            Loaders report all changes made during one update as a
+            single call.
+
+            :param added: Tuple of command sets which have been loaded.
+            :param removed: Tuple of command sets which have been
+                unloaded.
 
-    def unloaded_command_set(self, command_set):
-        """ Called when a command set has been unloaded. """
+        """
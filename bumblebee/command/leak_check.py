@@ -0,0 +1,138 @@
+import gc
+import types
+import weakref
+import logging
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+
+class ModuleNamespace(dict):
+    """
+        Namespace in which a legacy command module is executed.
+
+        This is a plain dict, except that it can be weakly referenced,
+        which allows checking whether it is freed after unloading.
+
+    """
+
+    __slots__ = ("__weakref__",)
+
+
+#===========================================================================
+
+class LeakChecker(object):
+    """
+        Verifies that objects which should have been freed, such as
+        the namespaces and grammars of unloaded command modules, are
+        actually collected.
+
+        Objects are registered with :meth:`watch`, which only keeps a
+        weak reference.  :meth:`check` then runs a single garbage
+        collection for all of them, and logs the objects which are
+        still alive together with the objects which refer to them.
+
+    """
+
+    def __init__(self):
+        self._watched = []
+
+    def watch(self, obj, description):
+        """ Registers *obj*, which is expected to be freed soon. """
+        try:
+            self._watched.append((weakref.ref(obj), description))
+        except TypeError:
+            log.debug("Cannot watch {0}: not weakly referenceable."
+                      "".format(description))
+
+    def has_watched(self):
+        return bool(self._watched)
+
+    def check(self):
+        """
+            Collects garbage and reports watched objects which are
+            still alive.
+
+            :returns: A list of the descriptions of leaked objects.
+
+        """
+
+        if not self._watched:
+            return []
+        watched, self._watched = self._watched, []
+        gc.collect()
+
+        leaked = []
+        for reference, description in watched:
+            obj = reference()
+            if obj is None:
+                continue
+            leaked.append(description)
+            referrers = "".join("\n - {0}".format(referrer)
+                                for referrer in describe_referrers(obj))
+            log.warning("Leak: {0} was not freed after unloading; it is"
+                        " referred to by:{1}".format(description, referrers))
+            del obj
+        return leaked
+
+
+#---------------------------------------------------------------------------
+
+def describe_referrers(obj, limit=10):
+    """
+        Returns descriptions of the objects which refer to *obj*.
+
+        Dicts which are the attribute dicts of instances, and cells of
+        closures, are described by the object that owns them.
+
+    """
+
+    # Frames are skipped, because they include the callers' own frames.
+    descriptions = []
+    for referrer in gc.get_referrers(obj):
+        if isinstance(referrer, types.FrameType):
+            continue
+        descriptions.append(_describe(_find_owner(referrer)))
+        if len(descriptions) >= limit:
+            descriptions.append("...")
+            break
+    return descriptions
+
+
+def _find_owner(referrer):
+    # Instance dicts and closure cells are rarely interesting in
+    #  themselves; report what holds them.
+    if not isinstance(referrer, (dict, _cell_type)):
+        return referrer
+    for owner in gc.get_referrers(referrer):
+        if isinstance(owner, types.FrameType):
+            continue
+        if isinstance(referrer, dict):
+            if getattr(owner, "__dict__", None) is referrer:
+                return owner
+        elif isinstance(owner, tuple):
+            for function in gc.get_referrers(owner):
+                if getattr(function, "func_closure", None) is owner:
+                    return function
+    return referrer
+
+
+def _describe(obj, length=100):
+    try:
+        text = repr(obj)
+    except Exception:
+        text = "<unrepresentable>"
+    if len(text) > length:
+        text = text[:length] + "..."
+    return "{0}: {1}".format(type(obj).__name__, text)
+
+
+def _make_cell():
+    value = None
+    return (lambda: value).func_closure[0]
+
+_cell_type = type(_make_cell())
@@ -1,11 +1,24 @@
 
+import time
+import hashlib
 import logging
+import threading
 import os.path
 from pyutilib.component.core        import (Plugin, SingletonPlugin,
-                                            ExtensionPoint, implements)
+                                            implements)
 from pyutilib.component.config      import declare_option
-from bumblebee.command.interfaces   import (ICommandSetLoader, ICommandSet,
-                                            ICommandSetObserver)
+from pyutilib.component.config.options import IntOption, BoolOption
+from bumblebee.command.interfaces   import ICommandSetLoader, ICommandSet
+from bumblebee.command.changes      import (batched_changes, notify_loaded,
+                                            notify_unloaded)
+from bumblebee.command.pipeline     import LoadPipeline, get_load_gate
+from bumblebee.command.bytecode_cache import BytecodeCache
+from bumblebee.command.manifest     import read_legacy_manifest
+from bumblebee.command.load_profile import (LoadProfile, ObjectSnapshot,
+                                            count_rules)
+from bumblebee.command.leak_check   import ModuleNamespace, LeakChecker
+from bumblebee.command.worker       import WorkerPool, set_worker_pool
+from bumblebee.system.interfaces    import IContextObserver
 
 
 #===========================================================================
@@ -18,12 +31,37 @@ log = logging.getLogger(__name__)
 class LegacyDirectoryLoader(SingletonPlugin):
 
     implements(ICommandSetLoader)
+    implements(IContextObserver)
     declare_option("directories", section="LegacyLoader")
+    declare_option("concurrency", section="LegacyLoader", default=4,
+                   cls=IntOption)
+    declare_option("bytecode_cache", section="LegacyLoader", default=True,
+                   cls=BoolOption)
+    declare_option("lazy", section="LegacyLoader", default=False,
+                   cls=BoolOption)
+    declare_option("profile_memory", section="LegacyLoader", default=False,
+                   cls=BoolOption)
+    declare_option("check_leaks", section="LegacyLoader", default=False,
+                   cls=BoolOption)
+    declare_option("worker_processes", section="LegacyLoader", default=0,
+                   cls=IntOption)
+    declare_option("worker_timeout", section="LegacyLoader", default=10,
+                   cls=IntOption)
 
     def __init__(self):
         self._modules = {}
+        self._pending = set()
+        self._deferred = set()
+        self._activating = set()
+        self._context = (None, None)
+        self._pipeline = None
+        self._bytecode_cache = None
+        self._snapshots = {}
         self._directories = []
         self._directories_config = None
+        self._leak_checker = LeakChecker()
+        self._worker_pool = None
+        self._worker_config = (0, None)
 
     def _parse_directories_config(self):
         # If config has not changed, return immediately.
@@ -55,58 +93,518 @@ class LegacyDirectoryLoader(SingletonPlugin):
             log.debug(" - {0}".format(directory))
         return directories
 
+    def get_watched_paths(self):
+        return tuple(self._directories)
+
     def update(self):
+        # Report all changes made during this update to observers
+        #  as a single delta.
+        with batched_changes():
+            self._update()
+        self._check_leaks()
+
+    def _update(self):
         # Parse directories configuration.
         directories = self._parse_directories_config()
 
-        valid_paths = []
+        # Start or stop worker processes before loading modules, since
+        #  modules may use them while loading.
+        self._update_worker_pool()
+
+        # Determine which paths were added and removed, rescanning
+        #  only directories which have changed since the last update.
+        added, removed = set(), set()
+        for directory in set(self._snapshots) - set(directories):
+            removed.update(self._snapshots.pop(directory).paths)
         for directory in directories:
-            valid_paths.extend(self._get_valid_paths(directory))
+            old_snapshot = self._snapshots.get(directory)
+            snapshot = self._scan_directory(directory, old_snapshot)
+            if snapshot is old_snapshot:
+                continue
+            self._snapshots[directory] = snapshot
+            if old_snapshot:
+                added.update(snapshot.paths - old_snapshot.paths)
+                removed.update(old_snapshot.paths - snapshot.paths)
+            else:
+                added.update(snapshot.paths)
 
         # Remove any deleted modules.
+        for path in removed:
+            self._deferred.discard(path)
+            self._activating.discard(path)
+            module = self._modules.pop(path, None)
+            if module:
+                module.unload(self._get_leak_checker())
+
+        # Load any new modules, and reload any modules which have been
+        #  modified since they were loaded; all other modules are left
+        #  untouched.
+        paths = set()
+        for path in added:
+            if path in self._modules:
+                continue
+            if self.lazy and self._defer(path):
+                continue
+            paths.add(path)
         for path, module in self._modules.items():
-            if path not in valid_paths:
+            if path in self._pending or not module.is_modified():
+                continue
+            if path in self._deferred:
+                # The module's manifest may have changed, so decide
+                #  again whether to defer it.
+                self._deferred.discard(path)
                 del self._modules[path]
-                module.unload()
-
-        # Add any new modules.
-        for path in valid_paths:
-            if path not in self._modules:
-                module = LegacyCommandSet(path)
-                module.load()
-                self._modules[path] = module
-            # Should check module freshness here.
-            #else:
-            #    module = self._modules[path]
+                if self.lazy and self._defer(path):
+                    continue
+            paths.add(path)
+
+        # If lazy loading has been switched off, load deferred modules.
+        if not self.lazy and self._deferred:
+            self._activating.update(self._deferred)
+            paths.update(self._deferred)
+            self._deferred.clear()
+
+        self._submit(paths)
+
+    def _submit(self, paths):
+        paths = set(paths) - self._pending
+        if not paths:
+            return
+
+        # Modules are read and compiled by the pipeline's workers, and
+        #  then executed on the main thread by _load_compiled().
+        self._update_bytecode_cache()
+        self._pending.update(paths)
+        self._get_pipeline().submit(sorted(paths), self._load_compiled)
+
+    def _defer(self, path):
+        """
+            Registers the module at *path* without loading it, if its
+            manifest shows that it is not needed in the current context.
+
+            :returns: True if the module was deferred.
+
+        """
+
+        # The file is stat'ed before its manifest is read, so that a
+        #  change made while reading is detected later.
+        modified_time, size = _stat_source(path)
+        manifest = read_legacy_manifest(path)
+        if not manifest.has_context() or manifest.matches(*self._context):
+            return False
+
+        log.debug("Deferring module {0} until its context {1} is active."
+                  "".format(path, manifest))
+        fingerprint = _ModuleFingerprint(path, modified_time, size, None)
+        self._modules[path] = LegacyCommandSet(path, manifest, fingerprint)
+        self._deferred.add(path)
+        return True
+
+    #-----------------------------------------------------------------------
+    # IContextObserver methods.
+
+    def context_changed(self, executable, title):
+        self._context = (executable, title)
+        if not self._deferred:
+            return
+
+        paths = set()
+        for path in self._deferred:
+            manifest = self._modules[path].get_manifest()
+            if manifest.matches(executable, title):
+                paths.add(path)
+        if not paths:
+            return
+
+        log.info("Activating {0} command modules for {1}."
+                 "".format(len(paths), executable))
+        self._deferred -= paths
+        self._activating.update(paths)
+        self._submit(paths)
+
+    def _get_pipeline(self):
+        if not self._pipeline:
+            self._pipeline = LoadPipeline(self._compile_module,
+                                          self.concurrency,
+                                          name="legacy-loader")
+        else:
+            self._pipeline.set_concurrency(self.concurrency)
+        return self._pipeline
+
+    def _compile_module(self, path):
+        # Called on the pipeline's worker threads.
+        return compile_module(path, self._bytecode_cache)
+
+    def _update_worker_pool(self):
+        # If config has not changed, return immediately.
+        config = (max(0, self.worker_processes), self.worker_timeout)
+        if config == self._worker_config:
+            return
+        self._worker_config = config
+
+        if self._worker_pool:
+            self._worker_pool.close()
+            self._worker_pool = None
+        size, timeout = config
+        if size:
+            log.info("Starting {0} worker processes.".format(size))
+            self._worker_pool = WorkerPool(size, timeout)
+        set_worker_pool(self._worker_pool)
+
+    def _update_bytecode_cache(self):
+        if not self.bytecode_cache:
+            self._bytecode_cache = None
+            return
+        if self._bytecode_cache:
+            return
+
+        # Store the cache in the app data directory next to the config.
+        from bumblebee.config import Config
+        directory = Config().get_data_directory("cache", "bytecode")
+        self._bytecode_cache = BytecodeCache(directory)
+        log.info("Using bytecode cache {0}".format(directory))
+
+        # Prune entries of modules which no longer exist, without
+        #  delaying startup.
+        valid_paths = set()
+        for snapshot in self._snapshots.values():
+            valid_paths.update(snapshot.paths)
+        thread = threading.Thread(target=self._bytecode_cache.prune,
+                                  args=(valid_paths,))
+        thread.setDaemon(True)
+        thread.start()
+
+    def _load_compiled(self, results):
+        # Grammars can only be loaded once the engine is ready, so
+        #  loading may have to wait.
+        gate = get_load_gate()
+        if gate:
+            gate(lambda: self._execute_compiled(results))
+        else:
+            self._execute_compiled(results)
+
+    def _execute_compiled(self, results):
+        with batched_changes():
+            self._load_compiled_modules(results)
+        self._check_leaks()
+
+    def _load_compiled_modules(self, results):
+        loaded = []
+        for path, compiled in sorted(results):
+            self._pending.discard(path)
+            if compiled is None:
+                continue
+
+            # Skip modules which were removed while being compiled.
+            if not self._is_known_path(path):
+                continue
+
+            # Deferred modules are loaded in place.
+            if path in self._activating:
+                self._activating.discard(path)
+                self._modules[path].load(compiled, self.profile_memory)
+                loaded.append(path)
+                continue
+
+            module = self._modules.pop(path, None)
+            if module:
+                log.info("Reloading modified module {0}".format(path))
+                module.unload(self._get_leak_checker())
+
+            module = LegacyCommandSet(path)
+            module.load(compiled, self.profile_memory)
+            self._modules[path] = module
+            loaded.append(path)
+
+        # Updates skip modules which are pending, so a module edited
+        #  while it was being compiled, or while waiting for the load
+        #  gate, is reloaded now.
+        modified = [path for path in loaded
+                    if self._modules[path].is_modified()]
+        if modified:
+            log.info("Modules modified while loading: {0}"
+                     "".format(", ".join(modified)))
+            self._submit(modified)
+
+        if self._bytecode_cache:
+            log.debug("Bytecode cache: {0} hits, {1} misses."
+                      "".format(*self._bytecode_cache.get_statistics()))
+        self._log_slowest_modules([path for path, compiled in results])
+
+    def _log_slowest_modules(self, paths, count=5):
+        profiles = []
+        for path in paths:
+            module = self._modules.get(path)
+            if module and module.get_load_profile():
+                profiles.append((module.get_load_profile().load_time,
+                                 path))
+        if len(profiles) < 2:
+            return
+        profiles.sort(reverse=True)
+        log.debug("Slowest modules loaded: {0}".format(", ".join(
+            "{0} ({1:.1f} ms)".format(os.path.basename(path), load_time * 1000)
+            for load_time, path in profiles[:count])))
+
+    def _get_leak_checker(self):
+        if self.check_leaks:
+            return self._leak_checker
+        return None
+
+    def _check_leaks(self):
+        # Unloaded modules should have been freed by now; check them
+        #  all with a single garbage collection.  This pauses the main
+        #  thread, so it is a diagnostic which is off by default.
+        if self._leak_checker.has_watched():
+            self._leak_checker.check()
+
+    def _is_known_path(self, path):
+        for snapshot in self._snapshots.values():
+            if path in snapshot.paths:
+                return True
+        return False
+
+    def _scan_directory(self, directory, snapshot):
+        """
+            Returns a snapshot of the command modules in *directory*.
+
+            If the directory's modification time shows that it has not
+            changed since *snapshot* was taken, *snapshot* itself is
+            returned, so that an unchanged directory costs a single
+            ``stat()`` call.
+
+        """
+
+        try:
+            modified_time = os.stat(directory).st_mtime
+        except OSError, e:
+            log.error("Cannot access directory {0}: {1}"
+                      "".format(directory, e))
+            return _DirectorySnapshot(None, frozenset(), time.time())
+
+        if snapshot and snapshot.is_fresh(modified_time):
+            return snapshot
+
+        scan_time = time.time()
+        paths = frozenset(self._get_valid_paths(directory))
+        return _DirectorySnapshot(modified_time, paths, scan_time)
 
     def _get_valid_paths(self, directory):
         valid_paths = []
-        for filename in os.listdir(directory):
-            path = os.path.abspath(os.path.join(directory, filename))
-            if not os.path.isfile(path):
+        for filename, is_file in _list_directory(directory):
+            if not os.path.splitext(filename)[1] == ".py":
                 continue
-            if not os.path.splitext(path)[1] == ".py":
+            if not is_file():
                 continue
+            path = os.path.abspath(os.path.join(directory, filename))
             valid_paths.append(path)
         return valid_paths
 
 
+#---------------------------------------------------------------------------
+# Directory scanning helpers.
+
+class _DirectorySnapshot(object):
+    """
+        Set of command module paths found in a directory, together
+        with the directory's modification time when it was scanned.
+
+    """
+
+    # Resolution of directory modification times.  A directory
+    #  modified within this interval of being scanned may change again
+    #  without its modification time changing, so such snapshots are
+    #  not trusted.
+    mtime_resolution = 2.0
+
+    def __init__(self, modified_time, paths, scan_time):
+        self.modified_time = modified_time
+        self.paths = paths
+        self.scan_time = scan_time
+
+    def is_fresh(self, modified_time):
+        if modified_time is None or modified_time != self.modified_time:
+            return False
+        return modified_time < self.scan_time - self.mtime_resolution
+
+
+try:
+    from os import scandir as _scandir
+except ImportError:
+    try:
+        from scandir import scandir as _scandir
+    except ImportError:
+        _scandir = None
+
+
+def _list_directory(directory):
+    """
+        Yields ``(filename, is_file)`` pairs for the entries in
+        *directory*; *is_file* is a callable so that the ``stat()``
+        call is only made for entries that need it.
+
+        ``scandir()`` is used if available, because it usually
+        provides the entry type without a separate ``stat()`` call.
+
+    """
+
+    if _scandir:
+        for entry in _scandir(directory):
+            yield entry.name, entry.is_file
+    else:
+        for filename in os.listdir(directory):
+            path = os.path.join(directory, filename)
+            yield filename, lambda path=path: os.path.isfile(path)
+
+
+#---------------------------------------------------------------------------
+# Module freshness tracking.
+
+class _ModuleFingerprint(object):
+    """
+        Identifies the version of a command module's source which was
+        loaded, by modification time, size and content hash.
+
+        The cheap modification time and size are checked first; the
+        content hash is only recomputed when they differ, so that a
+        file which was touched but not changed is not reloaded.  If
+        *digest* is None, as for modules which have only had their
+        manifest read, any change of the modification time or size
+        counts as a modification.
+
+    """
+
+    def __init__(self, path, modified_time, size, digest):
+        self.path = path
+        self.modified_time = modified_time
+        self.size = size
+        self.digest = digest
+
+    def is_modified(self):
+        modified_time, size = _stat_source(self.path)
+        if modified_time is None:
+            # File has gone; its removal is handled by the loader.
+            return False
+        if (modified_time, size) == (self.modified_time, self.size):
+            return False
+
+        if self.digest is None:
+            return True
+        try:
+            source = _read_source(self.path)
+        except IOError:
+            return False
+        digest = _hash_source(source)
+        if digest == self.digest:
+            # Touched but unchanged; remember the new stat values.
+            self.modified_time, self.size = modified_time, size
+            return False
+        return True
+
+
+class CompiledModule(object):
+    """
+        Result of reading and compiling a command module's source, as
+        produced by :func:`compile_module`.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.code = None
+        self.fingerprint = None
+        self.read_time = 0.0
+        self.compile_time = 0.0
+
+
+def compile_module(path, cache=None):
+    """
+        Reads and compiles the command module at *path*.
+
+        If a :class:`BytecodeCache` is given as *cache*, the module's
+        code is loaded from it if possible; otherwise the compiled
+        code is stored in it.
+
+        This function is thread-safe; it is run on the workers of the
+        legacy loader's pipeline.  If compiling fails, the error is
+        logged and the returned object's ``code`` is None.
+
+    """
+
+    compiled = CompiledModule(path)
+    start_time = time.time()
+    try:
+        # The file is stat'ed before it is read, so that a change
+        #  made while reading is detected by the fingerprint later.
+        modified_time, size = _stat_source(path)
+        if cache and modified_time is not None:
+            entry = cache.load(path, modified_time, size)
+            if entry:
+                compiled.code, digest = entry
+                compiled.fingerprint = _ModuleFingerprint(path,
+                                                          modified_time,
+                                                          size, digest)
+                compiled.read_time = time.time() - start_time
+                return compiled
+
+        source = _read_source(path)
+        digest = _hash_source(source)
+        compiled.fingerprint = _ModuleFingerprint(path, modified_time,
+                                                  size, digest)
+        read_time = time.time()
+        compiled.read_time = read_time - start_time
+        compiled.code = compile(source, path, "exec")
+        compiled.compile_time = time.time() - read_time
+    except Exception, e:
+        log.exception("Error compiling module {0}: {1}".format(path, e))
+        return compiled
+
+    if cache and modified_time is not None:
+        cache.store(path, modified_time, size, digest, compiled.code)
+    return compiled
+
+
+def _stat_source(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None, None
+    return stat.st_mtime, stat.st_size
+
+
+def _hash_source(source):
+    return hashlib.md5(source).hexdigest()
+
+
+def _read_source(path):
+    source_file = open(path, "rU")
+    try:
+        return source_file.read()
+    finally:
+        source_file.close()
+
+
 #---------------------------------------------------------------------------
 # Command set base class.
 
 class CommandSetBase(Plugin):
 
     implements(ICommandSet)
-    observers = ExtensionPoint(ICommandSetObserver)
+
+    # True once observers have been told that the set was loaded.
+    _announced = False
 
     def after_load(self):
-        for observer in self.observers:
-            observer.loaded_command_set(self)
+        self._announced = True
+        notify_loaded(self)
 
     def after_unload(self):
+        # Sets which never loaded, such as deferred ones, were never
+        #  announced, so their unloading is not announced either.
+        if not self._announced:
+            return
+        self._announced = False
         self.deactivate()
-        for observer in self.observers:
-            observer.unloaded_command_set(self)
+        notify_unloaded(self)
 
 
 #---------------------------------------------------------------------------
@@ -114,11 +612,14 @@ class CommandSetBase(Plugin):
 
 class LegacyCommandSet(CommandSetBase):
 
-    def __init__(self, path):
+    def __init__(self, path, manifest=None, fingerprint=None):
         self._path = path
         self._short_path = os.path.basename(self._path)
+        self._manifest = manifest
         self._namespace = None
         self._loaded = False
+        self._fingerprint = fingerprint
+        self._profile = None
 
     def __str__(self):
         return "<{0}({1})>".format(self.__class__.__name__,
@@ -129,42 +630,132 @@ class LegacyCommandSet(CommandSetBase):
 
     def get_name_description(self):
         name = "{0} (legacy)".format(self._short_path)
+        if self._manifest:
+            return (name, self._manifest.description)
         return (name, "")
 
     def get_commands(self):
         return ()
 
-    def load(self):
+    def get_path(self):
+        return self._path
+
+    def get_grammars(self):
+        if not self._namespace:
+            return ()
+        try:
+            from dragonfly import Grammar
+        except ImportError:
+            return ()
+        return tuple(value for value in self._namespace.values()
+                     if isinstance(value, Grammar))
+
+    def get_manifest(self):
+        if self._manifest is None:
+            self._manifest = read_legacy_manifest(self._path)
+        return self._manifest
+
+    def get_load_profile(self):
+        return self._profile
+
+    def load(self, compiled=None, profile_memory=False):
+        """
+            Loads the command module.
+
+            :param compiled: The module's :class:`CompiledModule`, if it
+                has already been compiled; if None, the module is read
+                and compiled here.
+            :param profile_memory: If true, estimate the memory retained
+                by the module; this is slow for large processes.
+
+        """
+
         log.debug("Loading module {0}".format(self._path))
+        if compiled is None:
+            compiled = compile_module(self._path)
+        self._fingerprint = compiled.fingerprint
+        if compiled.code is None:
+            self._loaded = False
+            return
 
         # Prepare namespace in which to execute the command module.
-        namespace = {}
+        namespace = ModuleNamespace()
         namespace["__file__"] = self._path
 
         # Attempt to execute the module; handle any exceptions.
+        snapshot = None
+        if profile_memory:
+            snapshot = ObjectSnapshot()
+        start_time = time.time()
         try:
-            execfile(self._path, namespace)
+            exec compiled.code in namespace
         except Exception, e:
             log.exception("Error loading module: {0}"
                                 "".format(e))
             self._loaded = False
             return
+        execute_time = time.time() - start_time
 
         self._loaded = True
         self._namespace = namespace
 
+        grammars = self.get_grammars()
+        self._profile = LoadProfile(compiled.read_time,
+                                    compiled.compile_time, execute_time,
+                                    len(grammars), count_rules(grammars))
+        if snapshot:
+            self._profile.memory = snapshot.measure_retained()
+        log.debug("Loaded module {0}: {1}".format(self._short_path,
+                                                  self._profile))
+
         self.after_load()
 
-    def unload(self):
-        unload_func = self._namespace.get("unload", None)
-        if callable(unload_func):
-            unload_func()
-            self._namespace = None
-            self._loaded = False
-        else:
-            log.warning("No unload() function in legacy module"
-                              " {0}".format(self._short_path))
-            self._namespace = None
-            self._loaded = False
+    def unload(self, leak_checker=None):
+        """
+            Unloads the command module.
+
+            :param leak_checker: Optional :class:`LeakChecker` with
+                which to verify that the module's namespace and
+                grammars are freed.
+
+        """
+
+        if leak_checker and self._namespace is not None:
+            leak_checker.watch(self._namespace, "namespace of {0}"
+                               "".format(self._short_path))
+            for grammar in self.get_grammars():
+                leak_checker.watch(grammar, "grammar {0} of {1}"
+                                   "".format(grammar, self._short_path))
+
+        if self._loaded:
+            unload_func = self._namespace.get("unload", None)
+            if callable(unload_func):
+                try:
+                    unload_func()
+                except Exception, e:
+                    log.exception("Error unloading module {0}: {1}"
+                                  "".format(self._short_path, e))
+            else:
+                log.warning("No unload() function in legacy module"
+                                  " {0}".format(self._short_path))
+        self._namespace = None
+        self._loaded = False
 
         self.after_unload()
+
+    def is_loaded(self):
+        return self._loaded
+
+    #-----------------------------------------------------------------------
+    # Freshness methods.
+
+    def is_modified(self):
+        """
+            Returns True if the module's source has changed since it
+            was last loaded, including after a failed load.
+
+        """
+
+        if not self._fingerprint:
+            return False
+        return self._fingerprint.is_modified()
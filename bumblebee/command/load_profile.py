@@ -0,0 +1,119 @@
+import gc
+import sys
+import logging
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+
+class LoadProfile(object):
+    """
+        Measurements taken while loading a command set.
+
+        Times are in seconds.  *memory* is an approximate number of
+        bytes retained by the objects the command set created while
+        loading, or None if memory was not measured.
+
+    """
+
+    def __init__(self, read_time=0.0, compile_time=0.0, execute_time=0.0,
+                 grammar_count=0, rule_count=0, memory=None):
+        self.read_time = read_time
+        self.compile_time = compile_time
+        self.execute_time = execute_time
+        self.grammar_count = grammar_count
+        self.rule_count = rule_count
+        self.memory = memory
+
+    def __str__(self):
+        return ("<{0}({1:.1f} ms, {2} grammars, {3} rules, {4})>"
+                "".format(self.__class__.__name__, self.load_time * 1000,
+                          self.grammar_count, self.rule_count,
+                          format_memory(self.memory)))
+
+    @property
+    def load_time(self):
+        return self.read_time + self.compile_time + self.execute_time
+
+    def describe(self):
+        """ Returns a multi-line, human readable description. """
+        return ("Load time: {0:.1f} ms (read {1:.1f} ms, compile {2:.1f} ms,"
+                " execute {3:.1f} ms)\n"
+                "Grammars: {4}, rules: {5}\n"
+                "Retained memory: {6}"
+                "".format(self.load_time * 1000, self.read_time * 1000,
+                          self.compile_time * 1000,
+                          self.execute_time * 1000, self.grammar_count,
+                          self.rule_count, format_memory(self.memory)))
+
+
+def format_memory(memory):
+    if memory is None:
+        return "not measured"
+    if memory < 1024:
+        return "{0} bytes".format(memory)
+    return "{0:.1f} KB".format(memory / 1024.0)
+
+
+#===========================================================================
+# Retained memory estimation.
+
+# Types whose instances the garbage collector does not track.
+_untracked_types = (str, unicode, int, long, float)
+
+
+class ObjectSnapshot(object):
+    """
+        Snapshot of the objects tracked by the garbage collector, used
+        to estimate how much memory an operation retains.
+
+        Take a snapshot before the operation and call
+        :meth:`measure_retained` afterwards: it collects garbage and
+        sums the sizes of tracked objects which did not exist before,
+        plus the untracked objects, such as strings, which they refer
+        to directly.  Objects created by other threads in the meantime
+        are counted too, so the result is an approximation.
+
+        Taking a snapshot costs time proportional to the number of
+        objects in the process, so memory is only measured on request.
+
+    """
+
+    def __init__(self):
+        gc.collect()
+        self._ids = set(id(o) for o in gc.get_objects())
+
+    def measure_retained(self):
+        gc.collect()
+        new_objects = [o for o in gc.get_objects()
+                       if id(o) not in self._ids]
+        seen = set(id(o) for o in new_objects)
+        total = 0
+        for new_object in new_objects:
+            total += sys.getsizeof(new_object, 0)
+            for referent in gc.get_referents(new_object):
+                if not isinstance(referent, _untracked_types):
+                    continue
+                if id(referent) in seen:
+                    continue
+                seen.add(id(referent))
+                total += sys.getsizeof(referent, 0)
+        return total
+
+
+#===========================================================================
+
+def count_rules(grammars):
+    """ Returns the number of rules in the given Dragonfly grammars. """
+    count = 0
+    for grammar in grammars:
+        try:
+            count += len(grammar.rules)
+        except Exception, e:
+            log.warning("Cannot count rules of grammar {0}: {1}"
+                        "".format(grammar, e))
+    return count
@@ -0,0 +1,124 @@
+import re
+import os.path
+import logging
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+
+class CommandSetManifest(object):
+    """
+        Cheap description of a command set, available without loading
+        the command set itself.
+
+        A manifest names the application context in which the command
+        set's grammars are needed: an executable name and/or a window
+        title pattern.  A manifest without a context describes a
+        command set which is needed everywhere.
+
+    """
+
+    def __init__(self, name, description="", executable=None, title=None):
+        self.name = name
+        self.description = description
+        self.executable = executable
+        self.title = title
+        if title:
+            self._title_pattern = re.compile(title, re.IGNORECASE)
+        else:
+            self._title_pattern = None
+
+    def __str__(self):
+        return "<{0}({1}, executable={2!r}, title={3!r})>".format(
+            self.__class__.__name__, self.name, self.executable, self.title)
+
+    def has_context(self):
+        """ Returns True if the command set is only needed in some
+            contexts. """
+        return bool(self.executable or self.title)
+
+    def matches(self, executable, title):
+        """
+            Returns True if this manifest's context matches a window
+            with the given *executable* path and *title*.
+
+        """
+
+        if not self.has_context():
+            return True
+        if self.executable:
+            if not executable:
+                return False
+            # Executable paths may use either separator.
+            filename = re.split(r"[\\/]", executable)[-1]
+            name = os.path.splitext(filename)[0]
+            if name.lower() != self.executable.lower():
+                return False
+        if self._title_pattern:
+            if not title or not self._title_pattern.search(title):
+                return False
+        return True
+
+
+#===========================================================================
+# Legacy command module manifests.
+
+_header_pattern = re.compile(r"^#\s*bumblebee\.(\w+)\s*:\s*(.*?)\s*$")
+_header_lines = 20
+
+
+def read_legacy_manifest(path):
+    """
+        Returns a :class:`CommandSetManifest` for the legacy command
+        module at *path*, without executing it.
+
+        The context is taken from NatLink's naming convention: a
+        module whose name starts with an underscore is global, and
+        any other module is specific to the executable named by the
+        part of its name before the first underscore (for example
+        ``notepad_editing.py`` belongs to ``notepad.exe``).
+
+        Header comments within the first lines of the module override
+        this convention::
+
+            # bumblebee.name: Editing commands
+            # bumblebee.description: Commands for editing text.
+            # bumblebee.executable: notepad
+            # bumblebee.title: .* - Notepad$
+
+        An empty ``bumblebee.executable`` value marks a module as
+        global.
+
+    """
+
+    filename = os.path.splitext(os.path.basename(path))[0]
+    fields = {"name": os.path.basename(path), "description": ""}
+    if not filename.startswith("_"):
+        fields["executable"] = filename.split("_", 1)[0]
+
+    try:
+        module_file = open(path, "rU")
+    except IOError, e:
+        log.warning("Cannot read manifest of {0}: {1}".format(path, e))
+    else:
+        try:
+            for index, line in enumerate(module_file):
+                if index >= _header_lines:
+                    break
+                match = _header_pattern.match(line)
+                if match:
+                    fields[match.group(1)] = match.group(2)
+        finally:
+            module_file.close()
+
+    try:
+        return CommandSetManifest(fields["name"], fields["description"],
+                                  fields.get("executable") or None,
+                                  fields.get("title") or None)
+    except re.error, e:
+        log.error("Invalid title pattern in {0}: {1}".format(path, e))
+        return CommandSetManifest(fields["name"], fields["description"])
@@ -0,0 +1,185 @@
+import Queue
+import logging
+import threading
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+# Main thread dispatching.
+
+_main_thread_dispatcher = None
+
+
+def set_main_thread_dispatcher(dispatcher):
+    """
+        Sets the function used to run callbacks on the main thread.
+
+        *dispatcher* is called with a callable and its arguments, and
+        must arrange for that callable to be called on the main
+        thread; ``wx.CallAfter`` is a suitable dispatcher.  If no
+        dispatcher is set, pipelines deliver their results
+        synchronously on the thread which submitted the work.
+
+    """
+
+    global _main_thread_dispatcher
+    _main_thread_dispatcher = dispatcher
+
+
+def get_main_thread_dispatcher():
+    return _main_thread_dispatcher
+
+
+#---------------------------------------------------------------------------
+# Load gating.
+
+_load_gate = None
+
+
+def set_load_gate(gate):
+    """
+        Sets the function which decides when compiled command modules
+        may be executed.
+
+        *gate* is called on the main thread with a callable, and must
+        call it on the main thread once command modules may be loaded,
+        for example once the speech recognition engine is connected.
+        If no gate is set, modules are loaded as soon as they have been
+        compiled.
+
+    """
+
+    global _load_gate
+    _load_gate = gate
+
+
+def get_load_gate():
+    return _load_gate
+
+
+#===========================================================================
+
+class LoadPipeline(object):
+    """
+        Runs a work function over batches of items on a pool of worker
+        threads, and delivers each batch's results on the main thread.
+
+        This is used to move the reading and compiling of command
+        modules off the GUI thread; only the final step, which
+        registers grammars, runs on the main thread.
+
+    """
+
+    def __init__(self, work_func, concurrency=4, name="pipeline"):
+        self._work_func = work_func
+        self._name = name
+        self._queue = None
+        self._workers = []
+        self.set_concurrency(concurrency)
+
+    def set_concurrency(self, concurrency):
+        """
+            Sets the number of worker threads.  A concurrency of zero
+            or less runs work on the submitting thread.
+
+        """
+
+        concurrency = max(0, int(concurrency))
+        if concurrency == len(self._workers):
+            return
+
+        # Retire existing workers; they exit after finishing any
+        #  work already in their queue.
+        for worker in self._workers:
+            self._queue.put(None)
+        self._workers = []
+
+        self._queue = Queue.Queue()
+        for index in range(concurrency):
+            name = "bumblebee-{0}-{1}".format(self._name, index)
+            worker = threading.Thread(target=self._work_loop,
+                                      args=(self._queue,), name=name)
+            worker.setDaemon(True)
+            worker.start()
+            self._workers.append(worker)
+        log.debug("Pipeline {0} running with {1} workers."
+                  "".format(self._name, concurrency))
+
+    def get_concurrency(self):
+        return len(self._workers)
+
+    def submit(self, items, callback):
+        """
+            Processes *items* and calls *callback* with a list of
+            ``(item, result)`` pairs once all of them are done.
+
+            If a main thread dispatcher has been set, this method
+            returns immediately and *callback* is later called on the
+            main thread.  Otherwise it blocks until all items have been
+            processed and calls *callback* itself.
+
+        """
+
+        items = list(items)
+        batch = _Batch(len(items))
+        dispatcher = _main_thread_dispatcher
+
+        if not items:
+            callback([])
+            return
+        if not self._workers:
+            for item in items:
+                batch.add(item, self._work_func(item))
+            callback(batch.results)
+            return
+
+        if dispatcher:
+            batch.on_complete = lambda: dispatcher(callback, batch.results)
+        for item in items:
+            self._queue.put((batch, item))
+        if not dispatcher:
+            batch.done.wait()
+            callback(batch.results)
+
+    def _work_loop(self, queue):
+        while True:
+            job = queue.get()
+            if job is None:
+                return
+            batch, item = job
+            try:
+                result = self._work_func(item)
+            except Exception, e:
+                log.exception("Pipeline {0} failed on {1}: {2}"
+                              "".format(self._name, item, e))
+                result = None
+            batch.add(item, result)
+
+
+#---------------------------------------------------------------------------
+
+class _Batch(object):
+
+    def __init__(self, size):
+        self._remaining = size
+        self._lock = threading.Lock()
+        self.results = []
+        self.done = threading.Event()
+        self.on_complete = None
+
+    def add(self, item, result):
+        self._lock.acquire()
+        try:
+            self.results.append((item, result))
+            self._remaining -= 1
+            complete = (self._remaining == 0)
+        finally:
+            self._lock.release()
+        if complete:
+            self.done.set()
+            if self.on_complete:
+                self.on_complete()
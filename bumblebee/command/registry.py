@@ -0,0 +1,239 @@
+import re
+import bisect
+import logging
+import os.path
+import threading
+from collections import deque
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+
+class _Entry(object):
+    """ Registry record of a single command set. """
+
+    __slots__ = ("command_set", "name", "path", "executable", "sort_key",
+                 "version")
+
+    def __init__(self, command_set, version):
+        self.command_set = command_set
+        self.name = command_set.get_name_description()[0]
+        self.path = _normalize_path(command_set.get_path())
+        self.executable = None
+        manifest = command_set.get_manifest()
+        if manifest and manifest.executable:
+            self.executable = manifest.executable.lower()
+        self.sort_key = (self.name, id(command_set))
+        self.version = version
+
+
+def _normalize_path(path):
+    if path is None:
+        return None
+    return os.path.normcase(os.path.abspath(path))
+
+
+#===========================================================================
+
+class CommandSetRegistry(object):
+    """
+        Index of all loaded command sets.
+
+        The registry keeps command sets sorted by name, and indexed by
+        path and by the executable named in their manifests, so that
+        lookups cost O(log n) or O(1) instead of enumerating all
+        command set plugins.
+
+        Each change increments the registry's version.  Consumers
+        which keep their own view of the command sets can remember the
+        version they last saw and ask for the changes since then with
+        :meth:`changes_since`; the last *max_changes* changes are
+        retained.
+
+        The registry is updated by :class:`ChangeBatch` before command
+        set observers are notified, so observers see it up to date.
+
+    """
+
+    def __init__(self, max_changes=1000):
+        self._lock = threading.RLock()
+        self._entries = {}         # command set -> entry
+        self._sort_keys = []       # Sorted sort keys of all entries.
+        self._sorted = []          # Entries in the order of _sort_keys.
+        self._by_path = {}         # normalized path -> entry
+        self._by_executable = {}   # executable name or None -> entries
+        self._version = 0
+        self._changes = deque(maxlen=max_changes)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, command_set):
+        return command_set in self._entries
+
+    def get_version(self):
+        return self._version
+
+    #-----------------------------------------------------------------------
+    # Modification.
+
+    def apply_changes(self, added, removed):
+        """ Registers *added* and unregisters *removed* command sets. """
+        self._lock.acquire()
+        try:
+            for command_set in removed:
+                self._remove(command_set)
+            for command_set in added:
+                self._add(command_set)
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self.apply_changes((), list(self._entries))
+
+    def _add(self, command_set):
+        if command_set in self._entries:
+            return
+        self._version += 1
+        entry = _Entry(command_set, self._version)
+        self._entries[command_set] = entry
+
+        index = bisect.bisect(self._sort_keys, entry.sort_key)
+        self._sort_keys.insert(index, entry.sort_key)
+        self._sorted.insert(index, entry)
+        if entry.path:
+            self._by_path[entry.path] = entry
+        self._by_executable.setdefault(entry.executable, []).append(entry)
+        self._changes.append((self._version, "added", command_set))
+
+    def _remove(self, command_set):
+        entry = self._entries.pop(command_set, None)
+        if entry is None:
+            return
+        self._version += 1
+
+        index = bisect.bisect_left(self._sort_keys, entry.sort_key)
+        del self._sort_keys[index]
+        del self._sorted[index]
+        if entry.path and self._by_path.get(entry.path) is entry:
+            del self._by_path[entry.path]
+        entries = self._by_executable[entry.executable]
+        entries.remove(entry)
+        if not entries:
+            del self._by_executable[entry.executable]
+        self._changes.append((self._version, "removed", command_set))
+
+    #-----------------------------------------------------------------------
+    # Lookups.
+
+    def get_command_sets(self):
+        """ Returns a tuple of all command sets, sorted by name. """
+        self._lock.acquire()
+        try:
+            return tuple(entry.command_set for entry in self._sorted)
+        finally:
+            self._lock.release()
+
+    def find_by_name(self, name):
+        """ Returns a tuple of the command sets named *name*. """
+        self._lock.acquire()
+        try:
+            start = bisect.bisect_left(self._sort_keys, (name,))
+            result = []
+            for entry in self._sorted[start:]:
+                if entry.name != name:
+                    break
+                result.append(entry.command_set)
+            return tuple(result)
+        finally:
+            self._lock.release()
+
+    def find_by_path(self, path):
+        """ Returns the command set loaded from *path*, or None. """
+        path = _normalize_path(path)
+        self._lock.acquire()
+        try:
+            entry = self._by_path.get(path)
+        finally:
+            self._lock.release()
+        if entry is None:
+            return None
+        return entry.command_set
+
+    def find_for_context(self, executable, title):
+        """
+            Returns a tuple of the command sets whose manifests match
+            a window with the given *executable* path and *title*,
+            including all command sets which are needed everywhere.
+
+        """
+
+        name = None
+        if executable:
+            filename = re.split(r"[\\/]", executable)[-1]
+            name = os.path.splitext(filename)[0].lower()
+
+        self._lock.acquire()
+        try:
+            candidates = list(self._by_executable.get(None, ()))
+            if name is not None:
+                candidates.extend(self._by_executable.get(name, ()))
+        finally:
+            self._lock.release()
+
+        result = []
+        for entry in candidates:
+            manifest = entry.command_set.get_manifest()
+            if not manifest or manifest.matches(executable, title):
+                result.append(entry.command_set)
+        return tuple(result)
+
+    def get_position(self, command_set):
+        """ Returns the index of *command_set* in name order. """
+        self._lock.acquire()
+        try:
+            entry = self._entries[command_set]
+            return bisect.bisect_left(self._sort_keys, entry.sort_key)
+        finally:
+            self._lock.release()
+
+    #-----------------------------------------------------------------------
+    # Change tracking.
+
+    def changes_since(self, version):
+        """
+            Returns an iterator over the changes made after *version*,
+            as ``(version, kind, command_set)`` 3-tuples where *kind*
+            is ``"added"`` or ``"removed"``.
+
+            Returns None if some of those changes are no longer
+            retained; the caller should then start over from
+            :meth:`get_command_sets` and :meth:`get_version`.
+
+        """
+
+        self._lock.acquire()
+        try:
+            if version >= self._version:
+                return iter(())
+            if not self._changes or self._changes[0][0] > version + 1:
+                return None
+            changes = [change for change in self._changes
+                       if change[0] > version]
+        finally:
+            self._lock.release()
+        return iter(changes)
+
+
+#---------------------------------------------------------------------------
+
+command_set_registry = CommandSetRegistry()
+
+
+def get_command_set_registry():
+    """ Returns the registry of all loaded command sets. """
+    return command_set_registry
@@ -0,0 +1,393 @@
+import os
+import sys
+import time
+import Queue
+import logging
+import threading
+import traceback
+import multiprocessing
+from bumblebee.command.pipeline     import get_main_thread_dispatcher
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+
+class WorkerError(Exception):
+    """ Raised when a function called in a worker process fails. """
+
+
+class WorkerTimeout(WorkerError):
+    """ Raised when a worker call does not finish in time. """
+
+
+class WorkerCrashed(WorkerError):
+    """ Raised when a worker process exits during a call. """
+
+
+#===========================================================================
+# Worker process side.
+
+def _worker_main(connection):
+    """
+        Main loop of a worker process: receives requests, each naming
+        a function by module and name, calls them and sends back
+        their results.
+
+    """
+
+    namespaces = {}
+    while True:
+        try:
+            request = connection.recv()
+        except (EOFError, IOError):
+            break
+        if request is None:
+            break
+
+        module, name, args, kwargs = request
+        try:
+            function = _resolve_function(namespaces, module, name)
+            response = (True, function(*args, **kwargs))
+        except Exception:
+            # Send the traceback as text, since not every exception
+            #  can be pickled.
+            response = (False, "".join(traceback.format_exception(
+                                                        *sys.exc_info())))
+        try:
+            connection.send(response)
+        except Exception, e:
+            connection.send((False, "Cannot send result of {0}: {1}"
+                                    "".format(name, e)))
+
+
+def _resolve_function(namespaces, module, name):
+    # Modules given as file paths, such as command modules, are
+    #  executed in a namespace of their own, and re-executed when
+    #  their file changes.
+    if not module.endswith(".py"):
+        __import__(module)
+        return getattr(sys.modules[module], name)
+
+    modified_time = os.path.getmtime(module)
+    namespace_time, namespace = namespaces.get(module, (None, None))
+    if namespace_time != modified_time:
+        namespace = {"__file__": module, "__name__": "__bumblebee_worker__"}
+        execfile(module, namespace)
+        namespaces[module] = (modified_time, namespace)
+    return namespace[name]
+
+
+#===========================================================================
+# Main process side.
+
+class _WorkerProcess(object):
+    """ A single worker process and the pipe connected to it. """
+
+    def __init__(self, name):
+        self._name = name
+        self._connection = None
+        self._process = None
+        self.restarts = -1
+        self._closed = False
+        # Held while starting or stopping, since the pool may close a
+        #  worker while its thread restarts it.
+        self._lock = threading.RLock()
+        self.start()
+
+    def start(self):
+        self._lock.acquire()
+        try:
+            self.stop()
+            if self._closed:
+                return
+            connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_worker_main,
+                                              args=(child_connection,),
+                                              name=self._name)
+            process.daemon = True
+            process.start()
+            child_connection.close()
+            self._connection, self._process = connection, process
+            self.restarts += 1
+        finally:
+            self._lock.release()
+
+    def stop(self, timeout=1.0):
+        self._lock.acquire()
+        try:
+            if self._process is None:
+                return
+            try:
+                self._connection.send(None)
+            except Exception:
+                pass
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join(timeout)
+            self._connection.close()
+            self._connection, self._process = None, None
+        finally:
+            self._lock.release()
+
+    def close(self, timeout=1.0):
+        """ Stops the worker for good; it is no longer restarted. """
+        self._closed = True
+        self.stop(timeout)
+
+    def call(self, request, timeout):
+        """
+            Sends *request* to the worker and returns its result.
+
+            The worker is restarted if it crashes or times out, since
+            its state is then unknown.
+
+        """
+
+        connection, process = self._connection, self._process
+        if connection is None:
+            raise WorkerError("Worker {0} is closed.".format(self._name))
+        try:
+            connection.send(request)
+            if not connection.poll(timeout):
+                log.warning("Worker {0} timed out after {1} seconds;"
+                            " restarting it.".format(self._name, timeout))
+                process.terminate()
+                self.start()
+                raise WorkerTimeout("Call to {0} timed out after {1}"
+                                    " seconds.".format(request[1], timeout))
+            success, value = connection.recv()
+        except (EOFError, IOError):
+            if self._closed:
+                raise WorkerError("Worker {0} closed during call to {1}."
+                                  "".format(self._name, request[1]))
+            log.warning("Worker {0} crashed; restarting it."
+                        "".format(self._name))
+            self.start()
+            raise WorkerCrashed("Worker crashed during call to {0}."
+                                "".format(request[1]))
+        if not success:
+            raise WorkerError(value)
+        return value
+
+
+#---------------------------------------------------------------------------
+
+class WorkerCall(object):
+    """ Handle for a call submitted to a :class:`WorkerPool`. """
+
+    def __init__(self, request, timeout, callback):
+        self.request = request
+        self.timeout = timeout
+        self.callback = callback
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+
+    def is_done(self):
+        return self._done.isSet()
+
+    def wait(self, timeout=None):
+        """
+            Waits for the call to finish and returns its result.
+
+            :raises WorkerError: if the call failed.
+
+        """
+
+        self._done.wait(timeout)
+        if not self._done.isSet():
+            raise WorkerTimeout("Call to {0} has not finished."
+                                "".format(self.request[1]))
+        if self.error:
+            raise self.error
+        return self.result
+
+    def _finish(self, result, error):
+        self.result, self.error = result, error
+        self._done.set()
+        if not self.callback:
+            return
+        dispatcher = get_main_thread_dispatcher()
+        if dispatcher:
+            dispatcher(self.callback, self)
+        else:
+            self.callback(self)
+
+
+class WorkerPool(object):
+    """
+        Pool of worker processes for running slow or unreliable code
+        outside of Bumblebee's own process.
+
+        Each worker process is served by a thread in this process,
+        which sends it calls from a shared queue, so submitting a call
+        never blocks.  A call which takes longer than its timeout, or
+        which crashes its worker, fails with :class:`WorkerTimeout` or
+        :class:`WorkerCrashed`, and the worker is restarted.
+
+        Functions are named by module and name, because functions
+        cannot be sent to another process.  The module may be a dotted
+        module name or the path of a Python file.  Files are executed
+        in the worker with ``__name__`` set to
+        ``"__bumblebee_worker__"``; since grammars can only be loaded
+        in the engine's process, a command module which is executed in
+        a worker must not create grammars there.
+
+    """
+
+    def __init__(self, size=2, timeout=10.0, name="worker"):
+        self._timeout = timeout
+        self._queue = Queue.Queue()
+        self._workers = []
+        self._threads = []
+        for index in range(max(1, size)):
+            worker_name = "bumblebee-{0}-{1}".format(name, index)
+            worker = _WorkerProcess(worker_name)
+            thread = threading.Thread(target=self._serve, args=(worker,),
+                                      name=worker_name)
+            thread.setDaemon(True)
+            thread.start()
+            self._workers.append(worker)
+            self._threads.append(thread)
+
+    def get_size(self):
+        return len(self._workers)
+
+    def get_restart_count(self):
+        return sum(worker.restarts for worker in self._workers)
+
+    def submit(self, module, name, args=(), kwargs=None, callback=None,
+               timeout=None):
+        """
+            Calls the function *name* of *module* in a worker process.
+
+            :param callback: Optional callable which is passed the
+                :class:`WorkerCall` when it has finished; it is called
+                on the main thread if a main thread dispatcher is set.
+            :param timeout: Seconds after which the call is abandoned;
+                defaults to the pool's timeout.
+            :returns: A :class:`WorkerCall`.
+
+        """
+
+        request = (module, name, tuple(args), dict(kwargs or {}))
+        call = WorkerCall(request, timeout or self._timeout, callback)
+        self._queue.put(call)
+        return call
+
+    def call(self, module, name, *args, **kwargs):
+        """ Calls a function in a worker process and waits for it. """
+        return self.submit(module, name, args, kwargs).wait()
+
+    def close(self, timeout=None):
+        """
+            Stops the pool's workers.
+
+            Calls which have not started yet fail with
+            :class:`WorkerError`.  All workers are signalled at once
+            and given *timeout* seconds in total, defaulting to the
+            pool's timeout, to finish their current calls; workers
+            still busy after that are terminated.
+
+        """
+
+        if timeout is None:
+            timeout = self._timeout
+        deadline = time.time() + timeout
+
+        while True:
+            try:
+                call = self._queue.get_nowait()
+            except Queue.Empty:
+                break
+            if call is not None:
+                call._finish(None, WorkerError("Worker pool closed before"
+                                               " call to {0}."
+                                               "".format(call.request[1])))
+
+        for thread in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(max(0, deadline - time.time()))
+        for worker in self._workers:
+            worker.close(max(0.1, deadline - time.time()))
+        self._workers, self._threads = [], []
+
+    def _serve(self, worker):
+        while True:
+            call = self._queue.get()
+            if call is None:
+                break
+            try:
+                result = worker.call(call.request, call.timeout)
+            except WorkerError, e:
+                call._finish(None, e)
+            except Exception, e:
+                log.exception("Worker call failed: {0}".format(e))
+                call._finish(None, WorkerError(str(e)))
+            else:
+                call._finish(result, None)
+
+
+#---------------------------------------------------------------------------
+
+class RemoteFunction(object):
+    """
+        Proxy for a function which runs in a worker process.
+
+        Calling the proxy submits a call to the worker pool and returns
+        at once with a :class:`WorkerCall`, so it can be used as the
+        body of an action without blocking recognition processing.
+        Failures are logged.
+
+    """
+
+    def __init__(self, module, name, pool=None, timeout=None):
+        self._module = module
+        self._name = name
+        self._pool = pool
+        self._timeout = timeout
+
+    def __str__(self):
+        return "<{0}({1}:{2})>".format(self.__class__.__name__,
+                                       os.path.basename(self._module),
+                                       self._name)
+
+    def __call__(self, *args, **kwargs):
+        pool = self._pool or get_worker_pool()
+        if pool is None:
+            raise WorkerError("No worker pool available for {0}."
+                              "".format(self))
+        return pool.submit(self._module, self._name, args, kwargs,
+                           callback=self._report, timeout=self._timeout)
+
+    def _report(self, call):
+        if call.error:
+            log.error("Remote call {0} failed: {1}".format(self, call.error))
+
+
+#===========================================================================
+# Shared worker pool.
+
+_worker_pool = None
+
+
+def set_worker_pool(pool):
+    """ Sets the worker pool used by command modules. """
+    global _worker_pool
+    _worker_pool = pool
+
+
+def get_worker_pool():
+    """
+        Returns the worker pool shared by command modules, or None if
+        worker processes are disabled.
+
+    """
+
+    return _worker_pool
@@ -1,10 +1,16 @@
 
 import sys
+import errno
 import logging
 import os.path
 from pyutilib.component.core        import PluginGlobals, PluginEnvironment
 from pyutilib.component.config      import Configuration
-from win32com.shell                 import shell, shellcon
+
+try:
+    from win32com.shell             import shell, shellcon
+except ImportError:
+    # Not on Windows, or pywin32 is not installed.
+    shell = shellcon = None
 
 
 #===========================================================================
@@ -48,13 +54,25 @@ class Config(object):
 
         # Second, look for a config file in the system local
         #  app data directory.
-        folder_id = shellcon.CSIDL_LOCAL_APPDATA
-        system_directory = shell.SHGetFolderPath(0, folder_id, 0, 0)
+        system_directory = _get_local_app_data_directory()
         system_path = os.path.join(system_directory,
                                    "Bumblebee", "Bumblebee.ini")
         self._found_config_path = system_path
         return system_path
 
+    def get_data_directory(self, *names):
+        """
+            Returns absolute path to a directory for Bumblebee's data
+            files, such as caches.
+
+            The directory is located next to the configuration file;
+            it is not created by this method.
+
+        """
+
+        directory = os.path.dirname(self.get_config_path())
+        return os.path.join(directory, *names)
+
     def load_default(self):
         """ Loads a built-in, default configuration. """
         log.debug("Loading default config.")
@@ -171,8 +189,8 @@ class Config(object):
         config_path = self.get_config_path()
         try:
             modified_time = os.path.getmtime(config_path)
-        except WindowsError, e:
-            if e.errno != 2:
+        except OSError, e:
+            if e.errno != errno.ENOENT:
                 raise
         else:
             if self._load_time == modified_time:
@@ -185,3 +203,20 @@ class Config(object):
 #                              " file not found."
 #                              "".format(self.get_config_path()))
         return True
+
+
+#---------------------------------------------------------------------------
+
+def _get_local_app_data_directory():
+    if shell:
+        folder_id = shellcon.CSIDL_LOCAL_APPDATA
+        return shell.SHGetFolderPath(0, folder_id, 0, 0)
+
+    # Without pywin32, fall back to the environment; on other
+    #  platforms, use the XDG data directory.
+    directory = os.environ.get("LOCALAPPDATA")
+    if not directory:
+        directory = os.environ.get("XDG_DATA_HOME")
+    if not directory:
+        directory = os.path.expanduser(os.path.join("~", ".local", "share"))
+    return directory
@@ -0,0 +1,207 @@
+import logging
+from bumblebee.timeline             import get_startup_timeline
+from pyutilib.component.core        import ExtensionPoint
+from bumblebee.config               import Config
+from bumblebee.watcher              import create_watcher
+from bumblebee.log_handlers         import (AsyncLogHandler,
+                                            RotatingLogFileHandler,
+                                            register_sink)
+from bumblebee.command.interfaces   import ICommandSetLoader
+from bumblebee.command.pipeline     import (set_main_thread_dispatcher,
+                                            set_load_gate)
+from bumblebee.engine_connection    import get_engine_connection
+from bumblebee.scheduler            import Scheduler, set_scheduler
+
+# The system participants, which are slower to import, are imported
+#  during startup; see BumblebeeCore.initialize_logging().
+from bumblebee.system.interfaces    import ISystemParticipant, ITaskProvider
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+
+class BumblebeeCore(object):
+    """
+        Lifecycle of Bumblebee's config, command set loaders and system
+        participants, independent of any GUI toolkit.
+
+        The host application drives this class from its own event
+        loop: :class:`bumblebee.application.BumblebeeApp` from wx's,
+        and :func:`bumblebee.headless.run_headless` from a lightweight
+        loop without any GUI.  The host's loop must call, in order:
+         - :meth:`initialize_logging`
+         - :meth:`initialize`
+         - :meth:`startup_participants`
+         - :meth:`shutdown`, when the application exits
+
+        Once initialized, config reloads, participants' reactions to
+        config changes and loader updates run as separate tasks of a
+        :class:`bumblebee.scheduler.Scheduler`, so that a slow loader
+        or participant only delays itself.  The scheduler triggers the
+        following events:
+         - ``"files_changed"`` -- the config file or a watched command
+           directory has changed; the config is then reloaded.
+         - ``"config_changed"`` -- the config has been reloaded;
+           participants' ``config_changed()`` methods are then called.
+         - ``"update_loaders"`` -- loaders should be updated; this
+           follows every config reload.
+
+        :param call_soon: Callable which runs the callable passed to
+            it, with the given arguments, on the host's main thread;
+            for example ``wx.CallAfter``.
+
+    """
+
+    def __init__(self, call_soon):
+        self._call_soon = call_soon
+        self._config = Config()
+        self._watcher = None
+        self._scheduler = Scheduler(call_soon)
+
+    def get_config(self):
+        return self._config
+
+    def get_scheduler(self):
+        return self._scheduler
+
+    #-----------------------------------------------------------------------
+    # Lifecycle methods.
+
+    def initialize_logging(self):
+        log.debug("initialize_logging()")
+
+        # Import system participants so that they are registered in
+        #  the PCA.
+        with get_startup_timeline().phase("Importing system participants"):
+            import bumblebee.system
+        from bumblebee.system.log_levels import apply_default_levels
+
+        # Use the default levels until the config has been loaded; the
+        #  log level participant then applies the configured ones.
+        apply_default_levels()
+
+    def initialize(self):
+        log.debug("initialize()")
+        timeline = get_startup_timeline()
+
+        with timeline.phase("Initializing loaders"):
+            self._initialize_loaders()
+
+        with timeline.phase("Loading config"):
+            self._config = Config()
+            self._config.load_or_create()
+
+        # Bring loaders up to date with the freshly loaded config, and
+        #  start watching for further changes.
+        with timeline.phase("Updating loaders"):
+            for loader in ExtensionPoint(ICommandSetLoader):
+                loader.update()
+            self._update_watched_paths()
+            self._register_tasks()
+            self._watcher.start()
+
+    def startup_participants(self):
+        timeline = get_startup_timeline()
+        with timeline.phase("Starting system participants"):
+            self._scheduler.start()
+            for participant in ExtensionPoint(ISystemParticipant):
+                participant.startup()
+        timeline.mark("Startup complete")
+        timeline.log_summary()
+
+    def shutdown(self):
+        if self._watcher:
+            self._watcher.stop()
+        self._scheduler.stop()
+        for participant in ExtensionPoint(ISystemParticipant):
+            participant.shutdown()
+
+    #-----------------------------------------------------------------------
+    # Internal methods.
+
+    def _initialize_loaders(self):
+        log.debug("_initialize_loaders()")
+
+        # Import loaders so that they are registered in the PCA.
+        import bumblebee.command.legacy_loader
+
+        # Loaders compile command modules on worker threads and hand
+        #  them back to the main thread for execution, once the engine
+        #  is connected.  Until then, the engine connection reports
+        #  how many loads are waiting.
+        set_main_thread_dispatcher(self._call_soon)
+        set_load_gate(get_engine_connection().when_connected)
+
+        # Setup infrastructure for updating loaders when the config
+        #  file or a watched command directory changes.  The watcher
+        #  calls back from its own thread; the scheduler runs the
+        #  resulting tasks on the main thread.
+        def on_changes(changed_paths):
+            log.debug("Detected changes: {0}"
+                      "".format(sorted(changed_paths)))
+            self._scheduler.trigger("files_changed")
+        self._watcher = create_watcher(on_changes)
+
+    def _register_tasks(self):
+        scheduler = self._scheduler
+        set_scheduler(scheduler)
+        scheduler.add_task("config", self._reload_config,
+                           triggers=["files_changed"])
+        for participant in ExtensionPoint(ISystemParticipant):
+            scheduler.add_task(_get_task_name("participant", participant),
+                               participant.config_changed,
+                               triggers=["config_changed"])
+        for loader in ExtensionPoint(ICommandSetLoader):
+            scheduler.add_task(_get_task_name("loader", loader),
+                               self._create_loader_task(loader),
+                               triggers=["update_loaders"])
+        for provider in ExtensionPoint(ITaskProvider):
+            provider.register_tasks(scheduler)
+
+    def _reload_config(self):
+        if self._config.reload_if_modified():
+            self._scheduler.trigger("config_changed")
+        self._scheduler.trigger("update_loaders")
+
+    def _create_loader_task(self, loader):
+        def update_loader():
+            loader.update()
+            # The set of watched directories may have changed along
+            #  with the config.
+            self._update_watched_paths()
+        return update_loader
+
+    def _update_watched_paths(self):
+        watched_paths = [self._config.get_config_path()]
+        for loader in ExtensionPoint(ICommandSetLoader):
+            watched_paths.extend(loader.get_watched_paths())
+        self._watcher.set_paths(watched_paths)
+
+
+def _get_task_name(kind, plugin):
+    return "{0}:{1}".format(kind, plugin.__class__.__name__)
+
+
+#===========================================================================
+
+def setup_logging(log_path):
+    """ Set up the Python logging infrastructure to log to a file. """
+
+    # Set root log level.
+    log = logging.getLogger("")
+    log.setLevel(logging.DEBUG)
+
+    # Register a log file handler.  The file is written on a separate
+    #  thread, so that logging never blocks on disk I/O, and rotated
+    #  so that it does not grow without bounds.
+    file_handler = RotatingLogFileHandler(log_path, max_bytes=1024 * 1024,
+                                          interval=24 * 60 * 60,
+                                          backup_count=5, compress=True)
+    file_handler.setLevel(logging.DEBUG)
+    async_handler = AsyncLogHandler(file_handler)
+    log.addHandler(async_handler)
+    register_sink("file", async_handler)
@@ -0,0 +1,304 @@
+import time
+import logging
+import threading
+from bumblebee.timeline             import get_startup_timeline
+from bumblebee.command.pipeline     import get_main_thread_dispatcher
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+DISCONNECTED = "disconnected"
+CONNECTING = "connecting"
+CONNECTED = "connected"
+FAILED = "failed"
+
+
+#===========================================================================
+
+class EngineConnection(object):
+    """
+        Connection to the speech recognition engine, established in
+        the background.
+
+        The connection is a state machine with the states
+        ``DISCONNECTED``, ``CONNECTING``, ``CONNECTED`` and ``FAILED``.
+        :meth:`connect` moves to ``CONNECTING`` and returns at once;
+        the engine is then located on a background thread, which
+        includes importing the engine's libraries, and connected on
+        the main thread, since engines are used from the thread which
+        connected them.  The engine's own ``connect()`` call therefore
+        still blocks the main thread while it runs.  If either step
+        fails, the connection moves to ``FAILED`` and tries again
+        after a delay which grows with each failed attempt, up to
+        *max_attempts* attempts; after that, it stays ``FAILED`` until
+        :meth:`connect` is called again.
+
+        Callbacks which need the engine, such as loading grammars, can
+        be queued with :meth:`when_connected` until it is ready.  They
+        stay queued while the connection fails, and a warning says how
+        many are waiting.
+
+        State changes, and queued callbacks, happen on the main thread
+        as given by the main thread dispatcher, and observers are told
+        about every state change.
+
+    """
+
+    retry_delays = (1, 2, 5, 10, 30, 60)  # Seconds.
+    max_attempts = 10
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._state = DISCONNECTED
+        self._engine = None
+        self._description = None
+        self._error = None
+        self._attempts = 0
+        self._connect_time = None
+        self._retry_delay = None
+        self._retry_timer = None
+        self._generation = 0
+        self._observers = []
+        self._queued = []
+        self._warned = False
+
+    def get_state(self):
+        return self._state
+
+    def get_engine(self):
+        """ Returns the connected engine, or None. """
+        return self._engine
+
+    def get_status_text(self):
+        """ Returns a description of the state for display. """
+        if self._state == CONNECTED:
+            return "Engine: connected to {0}".format(self._engine)
+        if self._state == CONNECTING:
+            return "Engine: connecting to {0}".format(self._description)
+        if self._state == FAILED:
+            if self._retry_delay is None:
+                text = ("Engine: connection failed ({0}); gave up after"
+                        " {1} attempts".format(self._error, self._attempts))
+            else:
+                text = ("Engine: connection failed ({0}); retrying in"
+                        " {1} s".format(self._error, self._retry_delay))
+        else:
+            text = "Engine: disconnected"
+        if self._queued:
+            text += "; {0} waiting".format(len(self._queued))
+        return text
+
+    def get_waiting_count(self):
+        """ Returns the number of callbacks waiting for the engine. """
+        return len(self._queued)
+
+    #-----------------------------------------------------------------------
+    # Observers and queued callbacks.
+
+    def add_observer(self, observer):
+        """
+            Registers *observer*, which is called with the connection's
+            new state after each state change.
+
+        """
+
+        self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        if observer in self._observers:
+            self._observers.remove(observer)
+
+    def when_connected(self, callback):
+        """
+            Calls *callback* now if the engine is connected, and
+            otherwise once it is.
+
+        """
+
+        if self._state == CONNECTED:
+            callback()
+            return
+        self._queued.append(callback)
+
+        # Waiting is expected while connecting, but otherwise nothing
+        #  may ever run the callback, so say so once.
+        if self._state in (DISCONNECTED, FAILED) and not self._warned:
+            self._warned = True
+            log.warning("Waiting for the SR engine, which is {0}, before"
+                        " loading command modules.".format(self._state))
+
+    #-----------------------------------------------------------------------
+    # Connecting and disconnecting.
+
+    def connect(self, locate_engine, description):
+        """
+            Starts connecting to an engine in the background.
+
+            :param locate_engine: Callable which returns the engine,
+                not yet connected.  It is called on a background
+                thread, and called again for each retry.
+            :param description: Description of the engine, for
+                display.
+
+        """
+
+        self.disconnect()
+        self._lock.acquire()
+        try:
+            self._description = description
+            self._attempts = 0
+            self._connect_time = time.time()
+            generation = self._generation
+        finally:
+            self._lock.release()
+        self._start_attempt(generation, locate_engine)
+
+    def disconnect(self):
+        """ Disconnects from the engine, or stops connecting to it. """
+        self._lock.acquire()
+        try:
+            # Attempts started before now are ignored when they finish.
+            self._generation += 1
+            if self._retry_timer:
+                self._retry_timer.cancel()
+                self._retry_timer = None
+            engine, self._engine = self._engine, None
+        finally:
+            self._lock.release()
+
+        if engine:
+            try:
+                engine.disconnect()
+            except Exception, e:
+                log.exception("Error disconnecting from {0}: {1}"
+                              "".format(engine, e))
+        if self._state != DISCONNECTED:
+            self._set_state(DISCONNECTED)
+
+    #-----------------------------------------------------------------------
+    # Internal methods.
+
+    def _start_attempt(self, generation, locate_engine):
+        self._attempts += 1
+        self._set_state(CONNECTING)
+        thread = threading.Thread(target=self._locate,
+                                  args=(generation, locate_engine),
+                                  name="bumblebee-engine-connect")
+        thread.setDaemon(True)
+        thread.start()
+
+    def _locate(self, generation, locate_engine):
+        # Runs on a background thread.
+        try:
+            engine = locate_engine()
+        except Exception, e:
+            log.exception("Error locating SR engine: {0}".format(e))
+            self._dispatch(self._failed, generation, locate_engine, e)
+            return
+        self._dispatch(self._connect_engine, generation, locate_engine,
+                       engine)
+
+    def _connect_engine(self, generation, locate_engine, engine):
+        if generation != self._generation:
+            return
+        try:
+            log.info("Connecting to SR engine {0}.".format(engine))
+            engine.connect()
+        except Exception, e:
+            log.exception("Error connecting to SR engine {0}: {1}"
+                          "".format(engine, e))
+            self._failed(generation, locate_engine, e)
+            return
+
+        self._engine = engine
+        self._error = None
+        self._warned = False
+        self._record_connection()
+        self._set_state(CONNECTED)
+
+        queued, self._queued = self._queued, []
+        for callback in queued:
+            try:
+                callback()
+            except Exception, e:
+                log.exception("Error in callback waiting for the SR"
+                              " engine: {0}".format(e))
+
+    def _record_connection(self):
+        # One phase is recorded per connection, however many attempts
+        #  it took, so that the timeline does not grow while the engine
+        #  is unavailable.
+        name = "Connecting to SR engine"
+        if self._attempts > 1:
+            name += " ({0} attempts)".format(self._attempts)
+        get_startup_timeline().add_phase(name, self._connect_time,
+                                         time.time() - self._connect_time)
+
+    def _failed(self, generation, locate_engine, error):
+        if generation != self._generation:
+            return
+        self._error = error
+        waiting = ""
+        if self._queued:
+            waiting = ("; {0} callbacks, such as command module loads,"
+                       " are waiting for it".format(len(self._queued)))
+
+        if self._attempts >= self.max_attempts:
+            self._retry_delay = None
+            log.warning("Connecting to SR engine {0} failed; giving up"
+                        " after {1} attempts{2}.".format(
+                            self._description, self._attempts, waiting))
+            self._set_state(FAILED)
+            return
+
+        index = min(self._attempts, len(self.retry_delays)) - 1
+        self._retry_delay = self.retry_delays[index]
+        log.warning("Connecting to SR engine {0} failed; retrying in"
+                    " {1} seconds{2}.".format(self._description,
+                                              self._retry_delay, waiting))
+
+        self._lock.acquire()
+        try:
+            self._retry_timer = threading.Timer(
+                self._retry_delay, self._dispatch,
+                args=(self._retry, generation, locate_engine))
+            self._retry_timer.setDaemon(True)
+            self._retry_timer.start()
+        finally:
+            self._lock.release()
+        self._set_state(FAILED)
+
+    def _retry(self, generation, locate_engine):
+        if generation != self._generation:
+            return
+        self._retry_timer = None
+        self._start_attempt(generation, locate_engine)
+
+    def _set_state(self, state):
+        self._state = state
+        log.info(self.get_status_text())
+        for observer in list(self._observers):
+            try:
+                observer(state)
+            except Exception, e:
+                log.exception("Error notifying engine connection observer"
+                              " {0}: {1}".format(observer, e))
+
+    def _dispatch(self, function, *args):
+        dispatcher = get_main_thread_dispatcher()
+        if dispatcher:
+            dispatcher(function, *args)
+        else:
+            function(*args)
+
+
+#---------------------------------------------------------------------------
+
+engine_connection = EngineConnection()
+
+
+def get_engine_connection():
+    """ Returns the :class:`EngineConnection` of the application. """
+    return engine_connection
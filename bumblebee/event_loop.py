@@ -0,0 +1,281 @@
+import sys
+import errno
+import heapq
+import signal
+import select
+import socket
+import logging
+import itertools
+import threading
+from timeit import default_timer as timer
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+
+class _TimerHandle(object):
+    """ Handle of a callback scheduled on an :class:`EventLoop`. """
+
+    __slots__ = ("callback", "args", "cancelled")
+
+    def __init__(self, callback, args):
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class _Waker(object):
+    """
+        Pair of connected sockets, with which other threads wake up a
+        loop blocked in ``select()``.
+
+    """
+
+    def __init__(self):
+        if hasattr(socket, "socketpair"):
+            reader, writer = socket.socketpair()
+        else:
+            # Windows has no socketpair(), so connect over loopback.
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            try:
+                listener.bind(("127.0.0.1", 0))
+                listener.listen(1)
+                writer = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                writer.connect(listener.getsockname())
+                reader, address = listener.accept()
+            finally:
+                listener.close()
+        reader.setblocking(False)
+        writer.setblocking(False)
+        self._reader, self._writer = reader, writer
+
+    def fileno(self):
+        return self._reader.fileno()
+
+    def get_write_fileno(self):
+        return self._writer.fileno()
+
+    def wake(self):
+        try:
+            self._writer.send(b"x")
+        except socket.error:
+            # The buffer is full, so the loop will wake up anyway.
+            pass
+
+    def wait(self, timeout):
+        """ Waits until woken up, or for *timeout* seconds if given. """
+        try:
+            readable = select.select([self], [], [], timeout)[0]
+        except select.error, e:
+            if e.args[0] != errno.EINTR:
+                raise
+            return
+        if readable:
+            self._drain()
+
+    def close(self):
+        self._reader.close()
+        self._writer.close()
+
+    def _drain(self):
+        try:
+            while self._reader.recv(4096):
+                pass
+        except socket.error:
+            pass
+
+
+class _MessageWaker(object):
+    """
+        Win32 event with which other threads wake up a loop, which
+        meanwhile dispatches the window messages of its thread.
+
+        COM-based engines and window event hooks deliver their
+        callbacks as window messages to the thread which set them up,
+        so a loop running them has to dispatch messages while it
+        waits.  This needs pywin32.
+
+    """
+
+    def __init__(self):
+        import win32event
+        self._event = win32event.CreateEvent(None, False, False, None)
+
+    def get_write_fileno(self):
+        return None
+
+    def wake(self):
+        import win32event
+        win32event.SetEvent(self._event)
+
+    def wait(self, timeout):
+        """ Waits until woken up, or for *timeout* seconds if given. """
+        import win32event
+        import pythoncom
+        if timeout is None:
+            milliseconds = win32event.INFINITE
+        else:
+            milliseconds = int(timeout * 1000)
+        result = win32event.MsgWaitForMultipleObjects(
+            [self._event], False, milliseconds, win32event.QS_ALLINPUT)
+        if result == win32event.WAIT_OBJECT_0 + 1:
+            pythoncom.PumpWaitingMessages()
+
+    def close(self):
+        self._event.Close()
+
+
+class EventLoop(object):
+    """
+        Minimal event loop, which runs callbacks on the thread which
+        calls :meth:`run`.
+
+        Callbacks are kept in a heap ordered by their due time, and
+        may be scheduled from any thread; the loop blocks in
+        ``select()`` until the next callback is due, or until another
+        thread schedules an earlier one, so an idle loop does not wake
+        up at all.  This is all that Bumblebee's core needs from wx's
+        event loop.
+
+        On the main thread, signals such as Ctrl-C also wake the loop
+        up.  Windows cannot wake ``select()`` on a signal, so there the
+        main thread's loop wakes up every *signal_interval* seconds to
+        let Python handle signals.
+
+        If *pump_messages* is true, on Windows the loop waits with
+        ``MsgWaitForMultipleObjects()`` instead of ``select()``, and
+        dispatches its thread's window messages as they arrive, as
+        COM-based engines and window event hooks need.
+
+        An exception raised by a callback is logged, and does not stop
+        the loop.
+
+    """
+
+    signal_interval = 1.0  # Seconds.
+
+    def __init__(self, pump_messages=False):
+        self._heap = []
+        self._sequence = itertools.count()
+        self._lock = threading.RLock()
+        self._waker = _create_waker(pump_messages)
+        self._wait_limit = None
+        self._running = False
+
+    def call_soon(self, callback, *args):
+        """ Schedules *callback* to be called as soon as possible. """
+        return self.call_later(0, callback, *args)
+
+    def call_later(self, delay, callback, *args):
+        """
+            Schedules *callback* to be called after *delay* seconds.
+
+            Callbacks which are due at the same time are called in the
+            order in which they were scheduled.
+
+            :returns: A handle whose ``cancel()`` method unschedules
+                the callback.
+
+        """
+
+        handle = _TimerHandle(callback, args)
+        entry = (timer() + delay, next(self._sequence), handle)
+        self._lock.acquire()
+        try:
+            heapq.heappush(self._heap, entry)
+            earliest = self._heap[0] is entry
+        finally:
+            self._lock.release()
+        if earliest:
+            # The loop may be waiting for a later callback.
+            self._waker.wake()
+        return handle
+
+    def is_running(self):
+        return self._running
+
+    def run(self):
+        """ Runs callbacks until :meth:`stop` is called. """
+        self._running = True
+        previous_wakeup_fd = self._begin_signal_wakeup()
+        try:
+            while self._running:
+                handle = self._next_due()
+                if handle is None or handle.cancelled:
+                    continue
+                try:
+                    handle.callback(*handle.args)
+                except Exception, e:
+                    log.exception("Callback {0} failed: {1}"
+                                  "".format(handle.callback, e))
+        finally:
+            self._end_signal_wakeup(previous_wakeup_fd)
+
+    def stop(self):
+        """ Makes :meth:`run` return, after the current callback. """
+        self._running = False
+        self._waker.wake()
+
+    def close(self):
+        """ Releases the loop's sockets; the loop cannot run again. """
+        self._waker.close()
+
+    #-----------------------------------------------------------------------
+    # Internal methods.
+
+    def _next_due(self):
+        # Waits until the earliest callback is due, and removes it from
+        #  the heap.  Returns None if woken up without a due callback,
+        #  so that the caller checks whether to stop and the deadline
+        #  is computed again.
+        self._lock.acquire()
+        try:
+            timeout = None
+            if self._heap:
+                timeout = self._heap[0][0] - timer()
+                if timeout <= 0:
+                    return heapq.heappop(self._heap)[2]
+        finally:
+            self._lock.release()
+
+        limit = self._wait_limit
+        if limit is not None and (timeout is None or timeout > limit):
+            timeout = limit
+        self._waker.wait(timeout)
+        return None
+
+    def _begin_signal_wakeup(self):
+        # Lets signals wake up a loop running on the main thread.
+        #  Returns the wakeup fd to restore afterwards, or None.
+        if threading.currentThread().getName() != "MainThread":
+            self._wait_limit = None
+            return None
+        fileno = self._waker.get_write_fileno()
+        if sys.platform.startswith("win") or fileno is None \
+                or not hasattr(signal, "set_wakeup_fd"):
+            self._wait_limit = self.signal_interval
+            return None
+        self._wait_limit = None
+        return signal.set_wakeup_fd(fileno)
+
+    def _end_signal_wakeup(self, previous_wakeup_fd):
+        if previous_wakeup_fd is not None:
+            signal.set_wakeup_fd(previous_wakeup_fd)
+
+
+def _create_waker(pump_messages):
+    if pump_messages and sys.platform.startswith("win"):
+        try:
+            return _MessageWaker()
+        except ImportError:
+            log.warning("pywin32 is not installed, so window messages are"
+                        " not dispatched; COM-based engines and context"
+                        " tracking will not receive callbacks.")
+    return _Waker()
@@ -3,11 +3,9 @@ import sys
 import time
 import math
 import logging
-import ast
 import wx
 import dragonfly
 from wx.lib.mixins.listctrl import ListCtrlAutoWidthMixin
-import codegen
 
 
 #===========================================================================
@@ -2,10 +2,10 @@
 import sys
 import logging
 import wx
-import dragonfly
-import pyutilib.component.core
 from pyutilib.component.core        import Plugin, implements
-from bumblebee.command.interfaces   import ICommandSet, ICommandSetObserver
+from bumblebee.command.interfaces   import ICommandSetObserver
+from bumblebee.command.registry     import get_command_set_registry
+from bumblebee.command.load_profile import format_memory
 
 
 #===========================================================================
@@ -30,37 +30,90 @@ class GrammarPanel(wx.Panel):
 #---------------------------------------------------------------------------
 
 class GrammarTree(wx.TreeCtrl):
+    """
+        Tree control listing command sets and their commands.
+
+        Changes are applied by inserting and deleting only the affected
+        command set nodes, at the positions given by the command set
+        registry, which is up to date before observers are notified.
+        Other nodes are left untouched, which preserves their expansion
+        and selection state.
+
+    """
 
     def __init__(self, parent, id):
         wx.TreeCtrl.__init__(self, parent, id)
-        self._command_sets = None
+        self._root = self.AddRoot("No command sets loaded")
+        self._items = {}       # command set -> tree item
+        self.Bind(wx.EVT_TREE_ITEM_GETTOOLTIP, self.on_get_tooltip)
         GrammarTreeUpdater(self).update()
 
+    def on_get_tooltip(self, event):
+        # Show a command set's load profile when hovering over it.
+        command_set = self.GetPyData(event.GetItem())
+        if command_set is None:
+            return
+        name, description = command_set.get_name_description()
+        profile = command_set.get_load_profile()
+        if profile:
+            event.SetToolTip("{0}\n{1}".format(name, profile.describe()))
+        else:
+            event.SetToolTip(name)
+
     def update(self, command_sets=None):
+        """ Synchronizes the tree with the given command sets. """
         log.debug("update({0})".format(command_sets))
-        if command_sets != None and self._command_sets == command_sets:
+        command_sets = set(command_sets or ())
+        current = set(self._items)
+        self.apply_changes(command_sets - current, current - command_sets)
+
+    def apply_changes(self, added, removed):
+        """ Inserts nodes for *added* and deletes nodes for *removed*
+            command sets. """
+        added = [c for c in added if c not in self._items]
+        removed = [c for c in removed if c in self._items]
+        if not added and not removed:
             # If nothing has changed, return immediately.
             return
-        self._command_sets = command_sets
-
-        self.DeleteAllItems()
-
-        # If no command sets are available, report so clearly.
-        if not self._command_sets:
-            root = self.AddRoot("No command sets loaded")
-            return
-
-        sorting_func = lambda cmds: cmds.get_name_description()[0]
-        sorted_command_sets = sorted(self._command_sets, key=sorting_func)
 
-        root = self.AddRoot("Command sets")
-        for command_set in sorted_command_sets:
-            name, description = command_set.get_name_description()
-            node = self.AppendItem(root, name)
-            for command in command_set.get_commands():
-                self.AppendItem(node, command.name)
-
-        self.Expand(root)
+        self.Freeze()
+        try:
+            was_empty = not self._items
+            for command_set in removed:
+                self.Delete(self._items.pop(command_set))
+
+            # Inserting in name order puts each node at its position in
+            #  the registry, since all nodes before it are present.
+            registry = get_command_set_registry()
+            positions = sorted((registry.get_position(command_set),
+                                command_set) for command_set in added)
+            for position, command_set in positions:
+                self._insert_command_set(command_set, position)
+
+            # If no command sets are available, report so clearly.
+            if not self._items:
+                self.SetItemText(self._root, "No command sets loaded")
+            elif was_empty:
+                self.SetItemText(self._root, "Command sets")
+                self.Expand(self._root)
+        finally:
+            self.Thaw()
+
+    def _insert_command_set(self, command_set, position):
+        name, description = command_set.get_name_description()
+        node = self.InsertItemBefore(self._root, position, name)
+        self.SetPyData(node, command_set)
+        profile = command_set.get_load_profile()
+        if profile:
+            details = ["{0:.0f} ms".format(profile.load_time * 1000),
+                       "{0} rules".format(profile.rule_count)]
+            if profile.memory is not None:
+                details.append(format_memory(profile.memory))
+            self.SetItemText(node, "{0} ({1})".format(name,
+                                                      ", ".join(details)))
+        for command in command_set.get_commands():
+            self.AppendItem(node, command.name)
+        self._items[command_set] = node
 
 
 #---------------------------------------------------------------------------
@@ -72,12 +125,9 @@ class GrammarTreeUpdater(Plugin):
     def __init__(self, grammar_tree):
         self._grammar_tree = grammar_tree
 
-    def loaded_command_set(self, command_set):
-        self.update()
-
-    def unloaded_command_set(self, command_set):
-        self.update()
+    def command_sets_changed(self, added, removed):
+        self._grammar_tree.apply_changes(added, removed)
 
     def update(self):
-        command_sets = pyutilib.component.core.ExtensionPoint(ICommandSet)
-        self._grammar_tree.update(tuple(command_sets))
+        registry = get_command_set_registry()
+        self._grammar_tree.update(registry.get_command_sets())
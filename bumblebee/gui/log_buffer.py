@@ -0,0 +1,155 @@
+import time
+import threading
+
+
+#===========================================================================
+
+class LogRecordBuffer(object):
+    """
+        Fixed-capacity ring buffer of compact log entries.
+
+        Each entry is a ``(created, levelname, name, message)`` tuple,
+        so that the buffer does not keep log records, their arguments
+        or their exception information alive.  Once the buffer is
+        full, each new entry replaces the oldest one; appending is
+        O(1) and memory use is bounded by the capacity.
+
+        Entries are indexed from oldest (0) to newest (``len - 1``).
+        Each entry also has a sequence number, which counts all entries
+        ever appended; sequence numbers stay valid while entries are
+        evicted, so that readers on other threads can walk through the
+        buffer in chunks with :meth:`get_chunk`.
+
+        Modifications and :meth:`get_chunk` are thread-safe; indexing
+        and iteration are meant for the thread which owns the buffer.
+
+    """
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("Invalid capacity: {0!r}".format(capacity))
+        self._capacity = capacity
+        self._entries = []
+        self._start = 0
+        self._lock = threading.Lock()
+        self.appended = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self._entries)
+        if not 0 <= index < len(self._entries):
+            raise IndexError(index)
+        return self._entries[(self._start + index) % self._capacity]
+
+    def __iter__(self):
+        for index in xrange(len(self._entries)):
+            yield self[index]
+
+    def get_capacity(self):
+        return self._capacity
+
+    def set_capacity(self, capacity):
+        """ Changes the capacity, keeping the newest entries. """
+        if capacity < 1:
+            raise ValueError("Invalid capacity: {0!r}".format(capacity))
+        if capacity == self._capacity:
+            return
+        self._lock.acquire()
+        try:
+            entries = list(self)[-capacity:]
+            self._capacity = capacity
+            self._entries = entries
+            self._start = 0
+        finally:
+            self._lock.release()
+
+    def append(self, entry):
+        """
+            Appends *entry*, and returns True if the oldest entry was
+            evicted to make room for it.
+
+        """
+
+        return self.extend((entry,)) > 0
+
+    def extend(self, entries):
+        """
+            Appends all *entries*, and returns the number of old
+            entries evicted to make room for them.
+
+        """
+
+        evicted = 0
+        self._lock.acquire()
+        try:
+            for entry in entries:
+                self.appended += 1
+                if len(self._entries) < self._capacity:
+                    self._entries.append(entry)
+                    continue
+                self._entries[self._start] = entry
+                self._start = (self._start + 1) % self._capacity
+                evicted += 1
+        finally:
+            self._lock.release()
+        return evicted
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._entries = []
+            self._start = 0
+        finally:
+            self._lock.release()
+
+    def get_sequence_range(self):
+        """
+            Returns a ``(first, end)`` 2-tuple of the sequence numbers
+            of the oldest entry and one past the newest entry.
+
+        """
+
+        self._lock.acquire()
+        try:
+            return self.appended - len(self._entries), self.appended
+        finally:
+            self._lock.release()
+
+    def get_chunk(self, sequence, size):
+        """
+            Returns up to *size* entries starting at *sequence*.
+
+            The return value is a ``(entries, next_sequence, skipped)``
+            3-tuple, where *skipped* is the number of requested entries
+            which had already been evicted.
+
+        """
+
+        self._lock.acquire()
+        try:
+            first = self.appended - len(self._entries)
+            skipped = max(0, first - sequence)
+            sequence += skipped
+            count = max(0, min(size, self.appended - sequence))
+            offset = self._start + sequence - first
+            entries = [self._entries[(offset + i) % self._capacity]
+                       for i in xrange(count)]
+        finally:
+            self._lock.release()
+        return entries, sequence + count, skipped
+
+
+#---------------------------------------------------------------------------
+
+def make_entry(record):
+    """ Returns the compact buffer entry for a logging record. """
+    return (record.created, record.levelname, record.name,
+            record.getMessage())
+
+
+def format_timestamp(created):
+    time_structure = time.localtime(created)
+    return time.strftime("%Y-%m-%d %H:%M:%S", time_structure)
@@ -3,8 +3,12 @@ import sys
 import time
 import math
 import logging
+from collections                import deque
 import wx
 from wx.lib.mixins.listctrl import ListCtrlAutoWidthMixin
+from bumblebee.log_handlers     import register_sink, StreamLogger
+from .log_buffer                import (LogRecordBuffer, make_entry,
+                                        format_timestamp)
 
 
 #===========================================================================
@@ -16,11 +20,22 @@ class LogListCtrl(wx.ListCtrl, ListCtrlAutoWidthMixin):
         Log messages are inserted into this class by a
         :class:`LogListHandler` instance.
 
+        This is a virtual list control: messages are stored in a
+        fixed-capacity :class:`LogRecordBuffer`, and the control only
+        asks for the text of the rows it displays.  Once *capacity*
+        messages have been stored, each new message replaces the
+        oldest one.
+
     """
 
-    def __init__(self, parent):
-        wx.ListCtrl.__init__(self, parent, -1, style=wx.LC_REPORT)
+    default_capacity = 10000
+
+    def __init__(self, parent, capacity=None):
+        style = wx.LC_REPORT | wx.LC_VIRTUAL
+        wx.ListCtrl.__init__(self, parent, -1, style=style)
         ListCtrlAutoWidthMixin.__init__(self)
+        self._records = LogRecordBuffer(capacity or self.default_capacity)
+        self._visible = True
 
         # Create columns appropriate for log messages.
         self.InsertColumn(0, "Time", wx.LIST_FORMAT_RIGHT, width=120)
@@ -43,6 +58,7 @@ class LogListCtrl(wx.ListCtrl, ListCtrlAutoWidthMixin):
         log_list_handler = LogListHandler(self)
         log_list_handler.setLevel(logging.DEBUG)
         log.addHandler(log_list_handler)
+        register_sink("view", log_list_handler)
 
     def restore_logging(self):
         if hasattr(self, "_old_stdout"):
@@ -50,98 +66,148 @@ class LogListCtrl(wx.ListCtrl, ListCtrlAutoWidthMixin):
         if hasattr(self, "_old_stderr"):
             sys.stderr = self._old_stderr
 
-    def append_record(self, record):
-        time_structure = time.localtime(record.created)
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time_structure)
-        index = self.InsertStringItem(sys.maxint, timestamp)
-        self.SetStringItem(index, 1, record.levelname)
-        self.SetStringItem(index, 2, record.name)
-        self.SetStringItem(index, 3, record.getMessage())
+    def get_capacity(self):
+        return self._records.get_capacity()
 
-        # Automatically scrawled down, except if items are selected.
-        if self.GetSelectedItemCount() == 0:
-            self.EnsureVisible(index)
+    def set_capacity(self, capacity):
+        """ Sets the maximum number of messages retained. """
+        self._records.set_capacity(capacity)
+        self.SetItemCount(len(self._records))
+        self.Refresh()
 
-        # Attributes and methods of a record instance:
-        #  args, created, exc_info, exc_text, filename, funcName,
-        #  getMessage, levelname, levelno, lineno, module, msecs,
-        #  msg, name, pathname, process, processName, relativeCreated,
-        #  thread, threadName
+    def append_record(self, record):
+        self.append_entries([make_entry(record)])
 
-    def get_messages(self):
+    def append_entries(self, entries):
         """
-            Return a list of tuples, each containing the fields of
-            a message in the log list control.
+            Appends a batch of log entries, as created by
+            :func:`make_entry`, with a single update of the control.
 
         """
 
-        messages = []
-        column_count = self.GetColumnCount()
-        for row in range(self.GetItemCount()):
-            message = tuple(self.GetItem(row, column).GetText()
-                            for column in range(column_count))
-            messages.append(message)
-        return messages
+        evicted = self._records.extend(entries)
+        if self._visible:
+            self._update_view(evicted)
 
+    def set_visible(self, visible):
+        """
+            Sets whether the control is visible.  While it is hidden,
+            appended messages are stored but not displayed.
 
-#===========================================================================
+        """
 
-class StreamLogger(object):
-    """
-        Behaves like a standard Python stream object and passes all
-        data written to it to a given function.
+        self._visible = visible
+        if visible:
+            self._update_view(True)
 
-    """
+    def _update_view(self, evicted):
+        count = len(self._records)
+        self.SetItemCount(count)
+        if not count:
+            return
 
-    def __init__(self, logger_func):
-        """
-            Create a new StreamLogger instance.
+        # If old messages were evicted, all rows have moved up; only
+        #  the visible ones need repainting.
+        if evicted:
+            top = self.GetTopItem()
+            bottom = min(top + self.GetCountPerPage(), count - 1)
+            self.RefreshItems(top, bottom)
 
-            :param logger_func: Callable which will be called for each
-                block of data written to this StreamLogger instance.
-                It is passed a single argument: the data written.
+        # Automatically scrawled down, except if items are selected.
+        if self.GetSelectedItemCount() == 0:
+            self.EnsureVisible(count - 1)
 
-        """
-        self._logger_func = logger_func
-        self._incomplete_line = None
+        # Attributes and methods of a record instance:
+        #  args, created, exc_info, exc_text, filename, funcName,
+        #  getMessage, levelname, levelno, lineno, module, msecs,
+        #  msg, name, pathname, process, processName, relativeCreated,
+        #  thread, threadName
 
-    def write(self, data):
-        if self._incomplete_line:
-            data = self._incomplete_line + data
-            self._incomplete_line = None
-        lines = data.splitlines(True)
-        for line in lines[1:]:
-            self._logger_func(line[:-1])
-        line = lines[-1]
-        if "\n" in line:
-            self._logger_func(line[:-1])
-        else:
-            self._incomplete_line = line
+    def OnGetItemText(self, item, column):
+        # Called by wx for each visible cell of the virtual list.
+        try:
+            entry = self._records[item]
+        except IndexError:
+            return ""
+        if column == 0:
+            return format_timestamp(entry[0])
+        return entry[column]
 
-    def flush(self):
-        pass
+    def get_records(self):
+        """ Returns the :class:`LogRecordBuffer` backing this control. """
+        return self._records
 
 
-#---------------------------------------------------------------------------
+#===========================================================================
 
 class LogListHandler(logging.Handler):
     """
         Handler for Python's standard library logging framework which
         inserts log messages into wxPython list control.
 
+        Records may be emitted from any thread.  They are converted
+        into compact entries and queued, and the GUI thread drains the
+        queue at most once every *interval* seconds, inserting all
+        queued entries with a single update of the control.
+
+        At most *max_pending* entries are queued; if a burst exceeds
+        that, the oldest queued entries are discarded, since the list
+        control could not retain them anyway, and a message reporting
+        how many were discarded is inserted in their place.
+
     """
 
-    def __init__(self, list_control, *args, **kwargs):
+    def __init__(self, list_control, interval=0.05, max_pending=None,
+                 *args, **kwargs):
         logging.Handler.__init__(self, *args, **kwargs)
         self._list_control = list_control
+        self._interval = interval
+        self._max_pending = max_pending or list_control.get_capacity()
+        self._pending = deque()
+        self._discarded = 0
+        self._drain_scheduled = False
+        self._last_drain = 0.0
 
     def emit(self, record):
+        # This method is called with the handler's lock held, which
+        #  also protects the pending queue.
+        try:
+            self._pending.append(make_entry(record))
+        except Exception:
+            self.handleError(record)
+            return
+        if len(self._pending) > self._max_pending:
+            self._pending.popleft()
+            self._discarded += 1
+
         # Use wx.CallAfter() to make this operation thread safe.
-        wx.CallAfter(self._emit, record)
+        if not self._drain_scheduled:
+            self._drain_scheduled = True
+            wx.CallAfter(self._drain)
+
+    def _drain(self):
+        # Coalesce deliveries into frames of at least the interval.
+        remaining = self._last_drain + self._interval - time.time()
+        if remaining > 0:
+            wx.CallLater(max(1, int(remaining * 1000)), self._drain)
+            return
+        self._last_drain = time.time()
+
+        self.acquire()
+        try:
+            entries, self._pending = list(self._pending), deque()
+            discarded, self._discarded = self._discarded, 0
+            self._drain_scheduled = False
+        finally:
+            self.release()
+
+        if discarded:
+            message = ("{0} log messages were discarded during a burst"
+                       " of logging.".format(discarded))
+            entries.insert(0, (time.time(), "WARNING", __name__, message))
 
-    def _emit(self, record):
         # Test for truth value of control, because during shutdown
         #  the control can sometimes be destroyed before
         #  this method is called for the last time.
-        if self._list_control:
-            self._list_control.append_record(record)
+        if self._list_control and entries:
+            self._list_control.append_entries(entries)
@@ -0,0 +1,122 @@
+import csv
+import json
+import logging
+from .log_buffer                import format_timestamp
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+# Entry writers.
+
+class CsvEntryWriter(object):
+
+    name = "csv"
+
+    def __init__(self, destination_file):
+        self._writer = csv.writer(destination_file)
+
+    def write(self, entries):
+        rows = [(format_timestamp(created), levelname, name,
+                 self._encode(message))
+                for created, levelname, name, message in entries]
+        self._writer.writerows(rows)
+
+    def _encode(self, message):
+        # The csv module in Python 2 cannot write unicode objects.
+        if isinstance(message, unicode):
+            return message.encode("utf-8")
+        return message
+
+
+class JsonLinesEntryWriter(object):
+    """ Writes one JSON object per line (newline-delimited JSON). """
+
+    name = "ndjson"
+
+    def __init__(self, destination_file):
+        self._file = destination_file
+
+    def write(self, entries):
+        lines = []
+        for created, levelname, name, message in entries:
+            data = {
+                    "time":     format_timestamp(created),
+                    "created":  created,
+                    "level":    levelname,
+                    "logger":   name,
+                    "message":  self._decode(message),
+                   }
+            lines.append(json.dumps(data) + "\n")
+        self._file.writelines(lines)
+
+    def _decode(self, message):
+        # Byte strings, such as output captured from stdout, need not
+        #  be UTF-8; json.dumps() fails on them unless decoded first.
+        if isinstance(message, str):
+            return message.decode("utf-8", "replace")
+        return message
+
+
+writers = {
+           CsvEntryWriter.name:        CsvEntryWriter,
+           JsonLinesEntryWriter.name:  JsonLinesEntryWriter,
+          }
+
+
+#===========================================================================
+
+def export_entries(records, destination_file, format="csv",
+                   chunk_size=1000, progress=None, cancelled=None):
+    """
+        Writes the entries of a :class:`LogRecordBuffer` to a file.
+
+        Entries are copied out of the buffer in chunks of *chunk_size*,
+        so memory use does not depend on the number of entries, and
+        the buffer may keep receiving entries on another thread.
+        Only entries present when the export starts are written;
+        entries evicted before they could be written are counted as
+        skipped.
+
+        :param format: Name of the output format, a key of *writers*.
+        :param progress: Optional callable which is passed the number
+            of entries processed so far and the total, after each chunk.
+        :param cancelled: Optional callable which returns True if the
+            export should stop early.
+        :returns: A ``(written, skipped)`` 2-tuple.
+
+    """
+
+    writer = writers[format](destination_file)
+    sequence, end = records.get_sequence_range()
+    total = end - sequence
+    written = skipped = 0
+
+    while sequence < end:
+        if cancelled and cancelled():
+            log.info("Export canceled after {0} entries.".format(written))
+            break
+        start = sequence
+        size = min(chunk_size, end - sequence)
+        entries, sequence, chunk_skipped = records.get_chunk(sequence, size)
+
+        # If entries were evicted, the chunk may reach past the entries
+        #  present when the export started; leave those out.
+        if sequence > end:
+            overshoot = sequence - end
+            entries = entries[:max(0, len(entries) - overshoot)]
+            chunk_skipped = min(chunk_skipped, end - start)
+            sequence = end
+
+        skipped += chunk_skipped
+        writer.write(entries)
+        written += len(entries)
+        if progress:
+            progress(written + skipped, total)
+        if not entries and not chunk_skipped:
+            break
+
+    return written, skipped
@@ -1,16 +1,24 @@
 
 import sys
+import os.path
 import logging
-import csv
+import threading
 import wx
-import dragonfly
 
 from .log_control import LogListCtrl
+from .log_export  import export_entries
 
 
 #===========================================================================
 
 class LogPanel(wx.Panel):
+    """
+        Panel showing log messages, with a button to export them.
+
+        While the panel is hidden, messages are still stored, but the
+        list control is not repainted until the panel is shown again.
+
+    """
 
     _log = logging.getLogger("LogPanel")
 
@@ -31,12 +39,27 @@ class LogPanel(wx.Panel):
         button_sizer = wx.BoxSizer(wx.HORIZONTAL)
         sizer.Add(button_sizer, 0, flag=wx.ALIGN_RIGHT)
 
-        export_button = wx.Button(self, -1, "Export")
-        button_sizer.Add(export_button, 0, flag=wx.TOP | wx.RIGHT, border=2)
-        self.Bind(wx.EVT_BUTTON, self.on_export, export_button)
+        self._export_gauge = wx.Gauge(self, -1, 100, size=(150, -1))
+        self._export_gauge.Hide()
+        button_sizer.Add(self._export_gauge, 0,
+                         flag=wx.TOP | wx.RIGHT | wx.ALIGN_CENTER_VERTICAL,
+                         border=2)
+
+        self._export_button = wx.Button(self, -1, "Export")
+        button_sizer.Add(self._export_button, 0,
+                         flag=wx.TOP | wx.RIGHT, border=2)
+        self.Bind(wx.EVT_BUTTON, self.on_export, self._export_button)
+        self._export_cancelled = False
+        self.Bind(wx.EVT_WINDOW_DESTROY, self.on_destroy)
+        self.Bind(wx.EVT_SHOW, self.on_show)
+
+    # Export formats, in the order of the export dialog's wildcard.
+    _export_formats = ("csv", "ndjson", "csv", "csv")
+    _export_extensions = {".jsonl": "ndjson", ".ndjson": "ndjson"}
 
     def on_export(self, event):
         wildcard = ("CSV files (*.csv)|*.csv"
+                    "|JSON lines (*.jsonl)|*.jsonl"
                     "|Text files (*.txt)|*.txt"
                     "|All files|*.*")
         dialog = wx.FileDialog(self, "Export destination",
@@ -48,6 +71,10 @@ class LogPanel(wx.Panel):
             return
 
         destination_path = dialog.GetPath()
+        format = self._export_formats[dialog.GetFilterIndex()]
+        dialog.Destroy()
+        extension = os.path.splitext(destination_path)[1].lower()
+        format = self._export_extensions.get(extension, format)
 
         try:
             destination_file = open(destination_path, "wb")
@@ -56,13 +83,72 @@ class LogPanel(wx.Panel):
                                 "".format(destination_path, e))
             return
 
+        # Write the file on a background thread, so that the GUI stays
+        #  responsive while large logs are exported.
+        self._export_button.Disable()
+        self._export_gauge.SetValue(0)
+        self._export_gauge.Show()
+        self.Layout()
+        self._export_cancelled = False
+        thread = threading.Thread(target=self._export,
+                                  args=(destination_file, format),
+                                  name="LogExport")
+        thread.setDaemon(True)
+        thread.start()
+
+    def on_show(self, event):
+        # Called when the notebook switches to or away from this page.
+        self._log_control.set_visible(event.GetShow())
+        event.Skip()
+
+    def on_destroy(self, event):
+        self._export_cancelled = True
+        event.Skip()
+
+    #-----------------------------------------------------------------------
+    # Export thread methods.
+
+    def _export(self, destination_file, format):
+        destination_path = destination_file.name
+        result = None
         try:
-            writer = csv.writer(destination_file)
-            messages = self._log_control.get_messages()
-            writer.writerows(messages)
+            try:
+                result = export_entries(self._log_control.get_records(),
+                                        destination_file, format,
+                                        progress=self._report_progress,
+                                        cancelled=self._is_export_cancelled)
+            finally:
+                destination_file.close()
         except Exception, e:
             self._log.exception("Failed to export to file {0}: {1}."
                                 "".format(destination_path, e))
+        wx.CallAfter(self._export_finished, destination_path, result)
+
+    def _is_export_cancelled(self):
+        return self._export_cancelled
+
+    def _report_progress(self, done, total):
+        wx.CallAfter(self._update_progress, done, total)
+
+    #-----------------------------------------------------------------------
+    # GUI thread methods.
+
+    def _update_progress(self, done, total):
+        if self._export_cancelled or not total:
+            return
+        self._export_gauge.SetValue(min(100, done * 100 // total))
+
+    def _export_finished(self, destination_path, result):
+        if self._export_cancelled:
+            return
+        self._export_gauge.Hide()
+        self._export_button.Enable()
+        self.Layout()
+        if result is None:
             return
 
+        written, skipped = result
+        if skipped:
+            self._log.warning("{0} log messages were discarded during"
+                              " export.".format(skipped))
         self._log.error("Log exported to {0}".format(destination_path))
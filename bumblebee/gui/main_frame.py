@@ -2,10 +2,12 @@
 import sys
 import logging
 import wx
-import dragonfly
+from bumblebee.timeline         import get_startup_timeline
+from bumblebee.engine_connection import get_engine_connection
 
 from .log_panel                 import LogPanel
 from .grammar_panel             import GrammarPanel
+from .performance_panel         import PerformancePanel
 
 
 #===========================================================================
@@ -28,18 +30,42 @@ class MainFrame(wx.Frame):
 
         menu = wx.Menu()
         menubar.Append(menu, "&Help")
+        mi_timeline = menu.Append(-1, "Startup timeline",
+                                  "Show how long each startup step took.")
+        self.Bind(wx.EVT_MENU, self.on_timeline, mi_timeline)
         mi_about = menu.Append(-1, "About",
                                "Show information about Bumblebee.")
         self.Bind(wx.EVT_MENU, self.on_about, mi_about)
 
         self._panel = MainPanel(self, -1)
 
+        # Show the state of the engine connection in the status bar.
+        self.CreateStatusBar()
+        self._engine_connection = get_engine_connection()
+        self._engine_connection.add_observer(self.on_engine_state)
+        self.Bind(wx.EVT_WINDOW_DESTROY, self.on_destroy)
+        self.on_engine_state(self._engine_connection.get_state())
+
         self.Centre()
         self.Show(True)
 
     def on_close(self, event):
         self.Destroy()
 
+    def on_destroy(self, event):
+        if event.GetEventObject() is self:
+            self._engine_connection.remove_observer(self.on_engine_state)
+        event.Skip()
+
+    def on_engine_state(self, state):
+        # Called on the GUI thread whenever the connection's state
+        #  changes.
+        self.SetStatusText(self._engine_connection.get_status_text())
+
+    def on_timeline(self, event):
+        wx.MessageBox(get_startup_timeline().format(), "Startup timeline",
+                      wx.OK | wx.ICON_INFORMATION, self)
+
     def on_about(self, event):
         something
 
@@ -61,3 +87,6 @@ class MainPanel(wx.Panel):
 
         grammar_page = GrammarPanel(notebook, -1)
         notebook.AddPage(grammar_page, "Grammars")
+
+        performance_page = PerformancePanel(notebook, -1)
+        notebook.AddPage(performance_page, "Performance")
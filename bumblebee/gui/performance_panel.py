@@ -0,0 +1,231 @@
+
+import logging
+import wx
+from wx.lib.mixins.listctrl import ListCtrlAutoWidthMixin
+from bumblebee.metrics          import (get_recognition_metrics,
+                                        export_metrics, format_duration)
+from bumblebee.scheduler        import get_scheduler
+from bumblebee.command.grammar_cache import get_grammar_cache
+
+
+#===========================================================================
+
+class PerformancePanel(wx.Panel):
+    """
+        Panel showing recognition and action timings per grammar and
+        rule, as collected by the recognition metrics, the timings and
+        overruns of the scheduler's tasks, and the grammar cache's hit
+        rate.
+
+        The lists are refreshed periodically, but only while the panel
+        is shown, so that the metrics cost nothing to display while
+        nobody is looking at them.
+
+    """
+
+    _log = logging.getLogger("PerformancePanel")
+    refresh_interval = 1000  # Milliseconds.
+    percentiles = (50, 90, 99)
+
+    def __init__(self, parent, id, metrics=None):
+        wx.Panel.__init__(self, parent, id)
+        self._metrics = metrics or get_recognition_metrics()
+        self._summary = None
+        self._task_statistics = None
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        self.SetSizer(sizer)
+
+        self._list_control = MetricsListCtrl(self, self.percentiles)
+        sizer.Add(self._list_control, 2, wx.EXPAND)
+
+        self._task_list_control = TaskListCtrl(self)
+        sizer.Add(self._task_list_control, 1, wx.EXPAND | wx.TOP, border=4)
+
+        # Create controls for working with the metrics.
+        button_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        sizer.Add(button_sizer, 0, flag=wx.EXPAND)
+
+        self._failures_text = wx.StaticText(self, -1, "")
+        button_sizer.Add(self._failures_text, 1,
+                         flag=wx.LEFT | wx.ALIGN_CENTER_VERTICAL, border=4)
+
+        self._cache_text = wx.StaticText(self, -1, "")
+        button_sizer.Add(self._cache_text, 1,
+                         flag=wx.LEFT | wx.ALIGN_CENTER_VERTICAL, border=4)
+
+        reset_button = wx.Button(self, -1, "Reset")
+        button_sizer.Add(reset_button, 0, flag=wx.TOP | wx.RIGHT, border=2)
+        self.Bind(wx.EVT_BUTTON, self.on_reset, reset_button)
+
+        export_button = wx.Button(self, -1, "Export")
+        button_sizer.Add(export_button, 0, flag=wx.TOP | wx.RIGHT, border=2)
+        self.Bind(wx.EVT_BUTTON, self.on_export, export_button)
+
+        self._timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_timer, self._timer)
+        self._timer.Start(self.refresh_interval)
+
+    def on_timer(self, event):
+        if self.IsShownOnScreen():
+            self.refresh()
+
+    def refresh(self):
+        self._refresh_tasks()
+        self._refresh_grammar_cache()
+        summary = self._metrics.get_summary(self.percentiles)
+        if summary == self._summary:
+            # If nothing has changed, return immediately.
+            return
+        self._summary = summary
+        self._list_control.set_summary(summary)
+        self._failures_text.SetLabel("Failed recognitions: {0}"
+                                     "".format(self._metrics.failures))
+
+    def _refresh_tasks(self):
+        scheduler = get_scheduler()
+        if not scheduler:
+            return
+        statistics = scheduler.get_statistics()
+        if statistics == self._task_statistics:
+            return
+        self._task_statistics = statistics
+        self._task_list_control.set_statistics(statistics)
+
+    def _refresh_grammar_cache(self):
+        cache = get_grammar_cache()
+        if not cache:
+            label = "Grammar cache: off"
+        else:
+            memory_hits, disk_hits, misses = cache.get_statistics()
+            hit_rate = cache.get_hit_rate()
+            label = ("Grammar cache: {0} hits ({1} from disk), {2} misses"
+                     "".format(memory_hits + disk_hits, disk_hits, misses))
+            if hit_rate is not None:
+                label += ", {0:.0%} hit rate".format(hit_rate)
+        if label != self._cache_text.GetLabel():
+            self._cache_text.SetLabel(label)
+
+    def on_reset(self, event):
+        self._metrics.reset()
+        scheduler = get_scheduler()
+        if scheduler:
+            scheduler.reset_statistics()
+        cache = get_grammar_cache()
+        if cache:
+            cache.reset_statistics()
+        self.refresh()
+
+    def on_export(self, event):
+        wildcard = ("CSV files (*.csv)|*.csv"
+                    "|All files|*.*")
+        dialog = wx.FileDialog(self, "Export destination",
+                               style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT,
+                               wildcard=wildcard)
+        if dialog.ShowModal() != wx.ID_OK:
+            dialog.Destroy()
+            self._log.debug("Export canceled by user.")
+            return
+
+        destination_path = dialog.GetPath()
+        dialog.Destroy()
+
+        try:
+            destination_file = open(destination_path, "wb")
+        except Exception, e:
+            self._log.exception("Failed to open export file {0}: {1}."
+                                "".format(destination_path, e))
+            return
+
+        try:
+            try:
+                export_metrics(self._metrics, destination_file,
+                               self.percentiles)
+            finally:
+                destination_file.close()
+        except Exception, e:
+            self._log.exception("Failed to export to file {0}: {1}."
+                                "".format(destination_path, e))
+            return
+
+        self._log.error("Metrics exported to {0}".format(destination_path))
+
+
+#---------------------------------------------------------------------------
+
+class MetricsListCtrl(wx.ListCtrl, ListCtrlAutoWidthMixin):
+    """ List control showing a metrics summary, one row per histogram. """
+
+    def __init__(self, parent, percentiles):
+        style = wx.LC_REPORT | wx.LC_VIRTUAL
+        wx.ListCtrl.__init__(self, parent, -1, style=style)
+        ListCtrlAutoWidthMixin.__init__(self)
+        self._rows = []
+
+        self.InsertColumn(0, "Grammar", width=120)
+        self.InsertColumn(1, "Rule", width=120)
+        self.InsertColumn(2, "Phase", width=80)
+        self.InsertColumn(3, "Count", wx.LIST_FORMAT_RIGHT, width=60)
+        self.InsertColumn(4, "Mean ms", wx.LIST_FORMAT_RIGHT, width=70)
+        for index, percentile in enumerate(percentiles):
+            self.InsertColumn(5 + index, "p{0} ms".format(percentile),
+                              wx.LIST_FORMAT_RIGHT, width=70)
+        self.InsertColumn(5 + len(percentiles), "Max ms",
+                          wx.LIST_FORMAT_RIGHT, width=70)
+
+    def set_summary(self, summary):
+        rows = []
+        for (grammar, rule, phase, count, mean, maximum,
+             values) in summary:
+            row = [grammar, rule, phase, str(count), format_duration(mean)]
+            row.extend(format_duration(value) for value in values)
+            row.append(format_duration(maximum))
+            rows.append(row)
+        self._rows = rows
+        self.SetItemCount(len(rows))
+        self.Refresh()
+
+    def OnGetItemText(self, item, column):
+        # Called by wx for each visible cell of the virtual list.
+        try:
+            return self._rows[item][column]
+        except IndexError:
+            return ""
+
+
+#---------------------------------------------------------------------------
+
+class TaskListCtrl(wx.ListCtrl, ListCtrlAutoWidthMixin):
+    """ List control showing the statistics of the scheduler's tasks. """
+
+    def __init__(self, parent):
+        style = wx.LC_REPORT | wx.LC_VIRTUAL
+        wx.ListCtrl.__init__(self, parent, -1, style=style)
+        ListCtrlAutoWidthMixin.__init__(self)
+        self._rows = []
+
+        self.InsertColumn(0, "Task", width=200)
+        self.InsertColumn(1, "Runs", wx.LIST_FORMAT_RIGHT, width=60)
+        self.InsertColumn(2, "Failures", wx.LIST_FORMAT_RIGHT, width=60)
+        self.InsertColumn(3, "Overruns", wx.LIST_FORMAT_RIGHT, width=60)
+        self.InsertColumn(4, "Last ms", wx.LIST_FORMAT_RIGHT, width=70)
+        self.InsertColumn(5, "Mean ms", wx.LIST_FORMAT_RIGHT, width=70)
+        self.InsertColumn(6, "Max ms", wx.LIST_FORMAT_RIGHT, width=70)
+
+    def set_statistics(self, statistics):
+        rows = []
+        for (name, runs, failures, overruns, last, mean,
+             maximum) in statistics:
+            rows.append([name, str(runs), str(failures), str(overruns),
+                         format_duration(last), format_duration(mean),
+                         format_duration(maximum)])
+        self._rows = rows
+        self.SetItemCount(len(rows))
+        self.Refresh()
+
+    def OnGetItemText(self, item, column):
+        # Called by wx for each visible cell of the virtual list.
+        try:
+            return self._rows[item][column]
+        except IndexError:
+            return ""
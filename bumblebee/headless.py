@@ -0,0 +1,55 @@
+import signal
+import logging
+from bumblebee.timeline             import get_startup_timeline
+from bumblebee.event_loop           import EventLoop
+from bumblebee.core                 import BumblebeeCore, setup_logging
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+get_startup_timeline().mark("Imported headless runner")
+
+
+#===========================================================================
+
+def run_headless():
+    """
+        Runs Bumblebee without a GUI, with file-based logging.
+
+        The config, command set loaders and system participants are
+        driven by an :class:`EventLoop` instead of wx's, so wx is
+        never imported; on Windows the loop dispatches window
+        messages, like wx's.  The runner stops on Ctrl-C or SIGTERM.
+
+    """
+
+    setup_logging(__file__ + "-log.txt")
+    # Engines and context tracking receive their callbacks as window
+    #  messages, which wx would otherwise dispatch.
+    loop = EventLoop(pump_messages=True)
+    core = BumblebeeCore(loop.call_soon)
+
+    def on_signal(signal_number, frame):
+        log.info("Received signal {0}; stopping.".format(signal_number))
+        loop.stop()
+    signal.signal(signal.SIGTERM, on_signal)
+
+    try:
+        get_startup_timeline().mark("Application initialization")
+        core.initialize_logging()
+        loop.call_soon(core.initialize)
+        loop.call_soon(core.startup_participants)
+        loop.run()
+    except KeyboardInterrupt:
+        log.info("Interrupted; stopping.")
+    except Exception, e:
+        log.exception("Exception: %s", e)
+        raise
+    finally:
+        core.shutdown()
+        loop.close()
+
+
+if __name__ == "__main__":
+    run_headless()
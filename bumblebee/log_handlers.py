@@ -0,0 +1,483 @@
+import os
+import os.path
+import time
+import gzip
+import Queue
+import shutil
+import logging
+import threading
+from logging.handlers import BaseRotatingHandler
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+_formatter = logging.Formatter()
+
+
+#===========================================================================
+
+class AsyncLogHandler(logging.Handler):
+    """
+        Log handler which passes records to another handler on a
+        dedicated writer thread.
+
+        :meth:`emit` only prepares the record and puts it on a queue,
+        so that the thread which logs, such as the recognition
+        callbacks, never waits for disk I/O.  If the queue is full,
+        records are dropped rather than blocking the caller; the writer
+        thread reports the number of dropped records once it catches up.
+
+    """
+
+    _stop = object()
+
+    def __init__(self, target, max_queued=10000):
+        logging.Handler.__init__(self, target.level)
+        self._target = target
+        self._queue = Queue.Queue(max_queued)
+        self._dropped_lock = threading.Lock()
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._thread = threading.Thread(target=self._run,
+                                        name="AsyncLogHandler")
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def get_target(self):
+        return self._target
+
+    #-----------------------------------------------------------------------
+    # Overridden logging.Handler methods.
+
+    def emit(self, record):
+        try:
+            self._prepare(record)
+            self._queue.put_nowait(record)
+        except Queue.Full:
+            self._dropped_lock.acquire()
+            try:
+                self.dropped += 1
+            finally:
+                self._dropped_lock.release()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self, timeout=None):
+        """ Waits until all queued records have been written. """
+        if not self._thread.isAlive():
+            return
+        done = threading.Event()
+        self._put_control(done.set)
+        done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """ Writes all queued records and stops the writer thread. """
+        if self._thread.isAlive():
+            self._put_control(self._stop)
+            self._thread.join(timeout)
+        self._target.close()
+        logging.Handler.close(self)
+
+    #-----------------------------------------------------------------------
+    # Internal methods.
+
+    def _prepare(self, record):
+        # Merge the message arguments and render the traceback now:
+        #  the arguments may change before the writer thread gets to
+        #  the record, and tracebacks keep whole frames alive.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _formatter.formatException(record.exc_info)
+            record.exc_info = None
+
+    def _put_control(self, item):
+        # Control items must not be dropped, so wait for room.
+        self._queue.put(item)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._stop:
+                self._report_dropped()
+                break
+            elif callable(item):
+                self._report_dropped()
+                self._flush_target()
+                item()
+                continue
+            try:
+                self._target.handle(item)
+            except Exception:
+                self._target.handleError(item)
+
+            # Records are dropped after the queue filled up, so report
+            #  them once the queue has been worked off.
+            if self._queue.empty():
+                self._report_dropped()
+                self._flush_target()
+
+    def _flush_target(self):
+        try:
+            self._target.flush()
+        except Exception:
+            pass
+
+    def _report_dropped(self):
+        dropped = self.dropped
+        if dropped == self._reported_dropped:
+            return
+        count = dropped - self._reported_dropped
+        self._reported_dropped = dropped
+        record = logging.LogRecord(log.name, logging.WARNING, __file__, 0,
+                                   "Log queue full; dropped {0} records."
+                                   "".format(count), None, None)
+        self._target.handle(record)
+
+
+#===========================================================================
+
+class RotatingLogFileHandler(BaseRotatingHandler):
+    """
+        Log file handler which rotates its file by size and by age.
+
+        The file is rotated when it has grown to *max_bytes*, or once
+        *interval* seconds have passed since it was started.  Rotated
+        files are named ``<file>.1`` (newest) to ``<file>.<backup_count>``
+        (oldest); if *compress* is true they are compressed with gzip
+        and get a ``.gz`` suffix.
+
+        A value of 0 for *max_bytes* or *interval* disables that
+        kind of rotation.
+
+    """
+
+    def __init__(self, filename, max_bytes=1024 * 1024, interval=86400,
+                 backup_count=5, compress=True, delay=False):
+        BaseRotatingHandler.__init__(self, filename, "a", None, delay)
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backup_count = backup_count
+        self.compress = compress
+        self._rollover_time = self._compute_rollover_time()
+
+    def get_backup_path(self, index):
+        """ Returns the path of the *index*'th rotated file. """
+        path = "{0}.{1}".format(self.baseFilename, index)
+        if self.compress:
+            path += ".gz"
+        return path
+
+    #-----------------------------------------------------------------------
+    # Overridden BaseRotatingHandler methods.
+
+    def shouldRollover(self, record):
+        if self._rollover_time is not None:
+            if time.time() >= self._rollover_time:
+                return True
+        if not self.max_bytes:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        # Checking the current size only, rather than formatting the
+        #  record twice, lets the file exceed max_bytes by one record.
+        self.stream.seek(0, 2)
+        return self.stream.tell() >= self.max_bytes
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = self.get_backup_path(index)
+                if os.path.exists(source):
+                    self._replace(source, self.get_backup_path(index + 1))
+            if os.path.exists(self.baseFilename):
+                self._rotate(self.baseFilename, self.get_backup_path(1))
+        else:
+            self._remove(self.baseFilename)
+
+        self.stream = self._open()
+        self._rollover_time = self._compute_rollover_time()
+
+    #-----------------------------------------------------------------------
+    # Internal methods.
+
+    def _compute_rollover_time(self):
+        if not self.interval:
+            return None
+        return time.time() + self.interval
+
+    def _rotate(self, source, destination):
+        if not self.compress:
+            self._replace(source, destination)
+            return
+
+        # Compress into a temporary file first, so that an interrupted
+        #  rotation never leaves a truncated backup behind.
+        temp_path = destination + ".tmp"
+        try:
+            source_file = open(source, "rb")
+            try:
+                compressed_file = gzip.open(temp_path, "wb")
+                try:
+                    shutil.copyfileobj(source_file, compressed_file)
+                finally:
+                    compressed_file.close()
+            finally:
+                source_file.close()
+            self._replace(temp_path, destination)
+            os.remove(source)
+        except (IOError, OSError):
+            # Keep the log uncompressed rather than losing it.
+            self._remove(temp_path)
+            self._replace(source, destination[:-len(".gz")])
+
+    def _replace(self, source, destination):
+        self._remove(destination)
+        os.rename(source, destination)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        return True
+
+
+#===========================================================================
+
+class StreamLogger(object):
+    """
+        Behaves like a standard Python stream object and passes all
+        data written to it to a given function.
+
+        Data is passed on line by line: partial lines are buffered
+        until their newline is written, and all complete lines of a
+        single write are passed on together, as one block.  Lines
+        longer than *max_line_length* are truncated.
+
+        Repeated identical lines, such as those printed by a command
+        module in a loop, are passed on at most *repeat_limit* times
+        in a row; further repetitions are counted, and reported once a
+        different line is written or the stream is flushed.
+
+    """
+
+    def __init__(self, logger_func, max_line_length=4096, repeat_limit=3):
+        """
+            Create a new StreamLogger instance.
+
+            :param logger_func: Callable which will be called for each
+                block of data written to this StreamLogger instance.
+                It is passed a single argument: the data written.
+
+        """
+        self._logger_func = logger_func
+        self._max_line_length = max_line_length
+        self._repeat_limit = repeat_limit
+        self._parts = []
+        self._length = 0
+        self._last_line = None
+        self._repeats = 0
+
+    def write(self, data):
+        if "\n" not in data:
+            self._buffer(data)
+            return
+
+        lines = data.split("\n")
+        partial = lines.pop()
+        maximum = self._max_line_length
+        for index, line in enumerate(lines):
+            if len(line) > maximum:
+                lines[index] = self._cap(line, len(line))
+
+        # Complete the buffered partial line, if any.
+        if self._parts:
+            self._buffer(data[:data.index("\n")])
+            lines[0] = self._cap("".join(self._parts), self._length)
+            self._parts = []
+            self._length = 0
+        if partial:
+            self._buffer(partial)
+
+        block = []
+        for line in lines:
+            if line != self._last_line:
+                if self._repeats >= self._repeat_limit:
+                    self._report_repeats(block)
+                self._last_line = line
+                self._repeats = 0
+            else:
+                self._repeats += 1
+                if self._repeats >= self._repeat_limit:
+                    continue
+            block.append(line)
+        if block:
+            self._logger_func("\n".join(block))
+
+    def flush(self):
+        block = []
+        self._report_repeats(block)
+        if block:
+            self._logger_func(block[0])
+
+    def _buffer(self, data):
+        # Store at most max_line_length characters of a partial line,
+        #  but remember how long it really is.
+        if self._length < self._max_line_length:
+            self._parts.append(data[:self._max_line_length - self._length])
+        self._length += len(data)
+
+    def _cap(self, line, length):
+        if length <= self._max_line_length:
+            return line
+        return "{0}... [{1} characters truncated]".format(
+            line[:self._max_line_length], length - self._max_line_length)
+
+    def _report_repeats(self, block):
+        suppressed = self._repeats - self._repeat_limit + 1
+        if suppressed > 0:
+            block.append("[Previous line repeated {0} more times]"
+                         "".format(suppressed))
+        self._repeats = 0
+
+
+#===========================================================================
+# Log sinks and levels.
+
+OFF = logging.CRITICAL + 10
+logging.addLevelName(OFF, "OFF")
+
+_sinks = {}
+_configured_loggers = set()
+_configured_levels = None   # Arguments of the last configure_levels().
+
+
+def register_sink(name, handler):
+    """
+        Registers *handler* as a log sink, whose level is controlled
+        by :func:`configure_levels`.
+
+    """
+
+    _sinks[name] = [handler, True]
+
+
+def unregister_sink(name):
+    _sinks.pop(name, None)
+
+
+def get_sink_names():
+    return sorted(_sinks.keys())
+
+
+def set_sink_enabled(name, enabled):
+    """
+        Enables or disables a sink, for example while nobody is
+        viewing it.  A disabled sink receives no records, and does not
+        count towards the levels at which records are created.
+
+        The levels last given to :func:`configure_levels` are applied
+        again, so the change takes effect at once.
+
+    """
+
+    if name not in _sinks or _sinks[name][1] == enabled:
+        return
+    _sinks[name][1] = enabled
+    if _configured_levels is not None:
+        configure_levels(*_configured_levels)
+
+
+def parse_level(value):
+    """
+        Returns the numeric logging level for *value*, which may be a
+        level name such as ``"INFO"`` or ``"OFF"``, or a number.
+
+        :raises ValueError: if *value* is not a valid level.
+
+    """
+
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    level = logging.getLevelName(value.upper())
+    if not isinstance(level, int):
+        raise ValueError("Invalid log level: {0!r}".format(value))
+    return level
+
+
+def parse_levels(text):
+    """
+        Parses lines of the form ``<name>: <level>`` into a dict
+        mapping names to numeric levels.  Blank lines and comments are
+        skipped, and invalid lines are reported and ignored.
+
+    """
+
+    levels = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        name, separator, value = line.partition(":")
+        if not separator:
+            name, separator, value = line.partition("=")
+        try:
+            if not separator or not name.strip():
+                raise ValueError("Expected <name>: <level>")
+            levels[name.strip()] = parse_level(value)
+        except ValueError, e:
+            log.warning("Invalid log level configuration {0!r}: {1}"
+                        "".format(line, e))
+    return levels
+
+
+def configure_levels(logger_levels, sink_levels):
+    """
+        Sets the levels of loggers and of registered sinks.
+
+        :param logger_levels: Dict mapping logger names to levels;
+            the name ``"root"`` stands for the root logger.  Loggers
+            configured by an earlier call and missing from this dict
+            are reset.
+        :param sink_levels: Dict mapping sink names to levels.  Sinks
+            not named are set to DEBUG.
+
+        No logger is set to a level below the lowest level of any
+        enabled sink: records which no sink would accept are then
+        rejected by the logger's level check, before a record is even
+        created, and so cost almost nothing.
+
+    """
+
+    global _configured_levels
+    _configured_levels = (dict(logger_levels), dict(sink_levels))
+
+    lowest = OFF
+    for name, (handler, enabled) in _sinks.items():
+        level = sink_levels.get(name, logging.DEBUG)
+        if not enabled:
+            level = OFF
+        handler.setLevel(level)
+        lowest = min(lowest, level)
+    if not _sinks:
+        lowest = logging.NOTSET
+
+    for name in _configured_loggers - set(logger_levels):
+        logging.getLogger(name).setLevel(logging.NOTSET)
+    _configured_loggers.clear()
+
+    root_level = max(logger_levels.get("root", logging.NOTSET), lowest)
+    logging.getLogger("").setLevel(root_level)
+    for name, level in logger_levels.items():
+        if name == "root":
+            continue
+        logging.getLogger(name).setLevel(max(level, lowest))
+        _configured_loggers.add(name)
@@ -0,0 +1,182 @@
+import csv
+import bisect
+import logging
+import threading
+from timeit import default_timer as timer
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+
+class Histogram(object):
+    """
+        Fixed-size histogram of durations, in seconds.
+
+        Durations are counted in buckets whose bounds grow by a factor
+        of sqrt(2), from 0.1 ms up to about two minutes.  Recording a
+        value therefore costs a binary search and an increment, memory
+        use does not depend on the number of values recorded, and
+        percentiles are accurate to within one bucket (about 40%).
+
+    """
+
+    bounds = tuple(0.0001 * 2 ** (index / 2.0) for index in range(41))
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def record(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def get_mean(self):
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def get_percentile(self, percentile):
+        """
+            Returns an upper estimate of the given *percentile* (0-100)
+            of the recorded values, or None if none were recorded.
+
+        """
+
+        if not self.count:
+            return None
+        threshold = self.count * percentile / 100.0
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= threshold and cumulative > 0:
+                if index < len(self.bounds):
+                    return min(self.bounds[index], self.maximum)
+                return self.maximum
+        return self.maximum
+
+
+#===========================================================================
+
+class LatencyMetrics(object):
+    """
+        Collection of duration histograms, keyed by a grammar name,
+        a rule name and a phase.
+
+        The phases recorded by the recognition instrumentation are:
+         - ``"recognition"`` -- from the start of an utterance until
+           the rule begins processing its recognition.
+         - ``"action"`` -- the time taken by the rule to process its
+           recognition, which includes executing its action.
+         - ``"total"`` -- from the start of an utterance until the
+           rule has finished processing it.
+
+        Recording is thread-safe.
+
+    """
+
+    phases = ("recognition", "action", "total")
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self.failures = 0
+
+    def record(self, grammar, rule, phase, value):
+        key = (grammar, rule, phase)
+        self._lock.acquire()
+        try:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.record(value)
+        finally:
+            self._lock.release()
+
+    def record_failure(self):
+        self._lock.acquire()
+        try:
+            self.failures += 1
+        finally:
+            self._lock.release()
+
+    def reset(self):
+        self._lock.acquire()
+        try:
+            self._histograms = {}
+            self.failures = 0
+        finally:
+            self._lock.release()
+
+    def get_summary(self, percentiles=(50, 90, 99)):
+        """
+            Returns a sorted list of ``(grammar, rule, phase, count,
+            mean, maximum, percentile_values)`` tuples, one for each
+            histogram.  Durations are in seconds.
+
+        """
+
+        self._lock.acquire()
+        try:
+            items = sorted(self._histograms.items())
+            summary = []
+            for (grammar, rule, phase), histogram in items:
+                values = tuple(histogram.get_percentile(p)
+                               for p in percentiles)
+                summary.append((grammar, rule, phase, histogram.count,
+                                histogram.get_mean(), histogram.maximum,
+                                values))
+        finally:
+            self._lock.release()
+        return summary
+
+
+#---------------------------------------------------------------------------
+
+recognition_metrics = LatencyMetrics()
+
+
+def get_recognition_metrics():
+    """ Returns the :class:`LatencyMetrics` of recognition timings. """
+    return recognition_metrics
+
+
+#===========================================================================
+
+def export_metrics(metrics, destination_file, percentiles=(50, 90, 99)):
+    """
+        Writes a summary of *metrics* to *destination_file* as CSV,
+        with durations in milliseconds.
+
+    """
+
+    writer = csv.writer(destination_file)
+    writer.writerow(["grammar", "rule", "phase", "count", "mean_ms",
+                     "max_ms"] +
+                    ["p{0}_ms".format(p) for p in percentiles])
+    for (grammar, rule, phase, count, mean, maximum,
+         values) in metrics.get_summary(percentiles):
+        writer.writerow([grammar, rule, phase, count,
+                         format_duration(mean), format_duration(maximum)] +
+                        [format_duration(value) for value in values])
+
+
+def format_duration(value):
+    """ Formats a duration in seconds as milliseconds. """
+    if value is None:
+        return ""
+    return "{0:.1f}".format(value * 1000)
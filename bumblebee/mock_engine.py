@@ -0,0 +1,366 @@
+import logging
+import threading
+from timeit import default_timer as timer
+from bumblebee.command.pipeline     import get_main_thread_dispatcher
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+# Rule id with which speech engines tag dictated words.
+DICTATION_RULE_ID = 1000000
+
+
+#===========================================================================
+# Recordings.
+
+def parse_utterance(text):
+    """
+        Parses one recorded utterance into a list of ``(word,
+        dictated)`` 2-tuples.
+
+        Words are separated by whitespace.  Words which were dictated,
+        and should be matched by dictation elements, are enclosed in
+        angle brackets: ``"say <hello world>"``.
+
+    """
+
+    words = []
+    dictated = False
+    for token in text.split():
+        if token.startswith("<"):
+            dictated = True
+            token = token[1:]
+        closed = token.endswith(">")
+        if closed:
+            token = token[:-1]
+        if token:
+            words.append((token, dictated))
+        if closed:
+            dictated = False
+    return words
+
+
+def read_recording(path):
+    """
+        Reads a recording of utterances, one per line.  Empty lines and
+        lines starting with ``#`` are ignored.
+
+    """
+
+    recording = open(path, "r")
+    try:
+        utterances = []
+        for line in recording:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                utterances.append(parse_utterance(line))
+        return utterances
+    finally:
+        recording.close()
+
+
+#===========================================================================
+
+class MockDictationContainer(object):
+    """
+        Words recognized by a dictation element.
+
+        Dragonfly's dictation elements ask the engine which recognized
+        them for a container of their words, through the engine's
+        ``DictationContainer`` attribute; this one formats the words by
+        joining them with spaces.
+
+    """
+
+    def __init__(self, words):
+        self._words = tuple(words)
+
+    def __repr__(self):
+        return "{0}({1!r})".format(self.__class__.__name__, self._words)
+
+    def __unicode__(self):
+        text = self.format()
+        if isinstance(text, str):
+            text = text.decode("utf-8", "replace")
+        return text
+
+    def __str__(self):
+        text = self.format()
+        if isinstance(text, unicode):
+            text = text.encode("utf-8")
+        return text
+
+    words = property(lambda self: self._words)
+
+    def format(self):
+        return " ".join(self._words)
+
+
+#===========================================================================
+
+class MockEngine(object):
+    """
+        Stand-in speech recognition engine, which recognizes text
+        instead of speech.
+
+        This engine provides the part of the Dragonfly engine interface
+        which grammars and recognition observers use, so that command
+        modules can be loaded on machines without a speech engine.
+        :meth:`recognize` matches an utterance against the rules of the
+        loaded grammars, in the order in which they were loaded, using
+        Dragonfly's own decoding, and processes the first match as an
+        engine would.
+
+        While connected, this engine is Dragonfly's default engine, so
+        that grammars created by command modules use it.
+
+    """
+
+    name = "mock"
+    DictationContainer = MockDictationContainer
+
+    def __init__(self, executable="", title="", handle=0):
+        self._grammars = []
+        self._exclusive = []
+        self._observers = []
+        self._previous_engine = None
+        self._connected = False
+        self.context = (executable, title, handle)
+
+    def __str__(self):
+        return "<{0}>".format(self.__class__.__name__)
+
+    #-----------------------------------------------------------------------
+    # Connection.
+
+    def connect(self):
+        import dragonfly.engines
+        self._previous_engine = dragonfly.engines._default_engine
+        dragonfly.engines._default_engine = self
+        self._connected = True
+
+    def disconnect(self):
+        import dragonfly.engines
+        if dragonfly.engines._default_engine is self:
+            dragonfly.engines._default_engine = self._previous_engine
+        self._previous_engine = None
+        self._connected = False
+
+    #-----------------------------------------------------------------------
+    # Engine interface used by grammars.
+
+    def load_grammar(self, grammar):
+        if grammar not in self._grammars:
+            self._grammars.append(grammar)
+
+    def unload_grammar(self, grammar):
+        if grammar in self._grammars:
+            self._grammars.remove(grammar)
+        self.set_exclusiveness(grammar, False)
+
+    def activate_grammar(self, grammar):
+        pass
+
+    def deactivate_grammar(self, grammar):
+        pass
+
+    def activate_rule(self, rule, grammar):
+        pass
+
+    def deactivate_rule(self, rule, grammar):
+        pass
+
+    def update_list(self, lst, grammar):
+        # Lists are read directly when decoding.
+        pass
+
+    def set_exclusiveness(self, grammar, exclusive):
+        if exclusive and grammar not in self._exclusive:
+            self._exclusive.append(grammar)
+        elif not exclusive and grammar in self._exclusive:
+            self._exclusive.remove(grammar)
+
+    def register_recognition_observer(self, observer):
+        self._observers.append(observer)
+
+    def unregister_recognition_observer(self, observer):
+        if observer in self._observers:
+            self._observers.remove(observer)
+
+    def speak(self, text):
+        log.info("Speak: {0}".format(text))
+
+    def mimic(self, words):
+        """ Recognizes *words*, a string or a sequence of words. """
+        if not isinstance(words, basestring):
+            words = " ".join(words)
+        if not self.recognize(parse_utterance(words)):
+            raise ValueError("No rule matches {0!r}.".format(words))
+
+    #-----------------------------------------------------------------------
+    # Recognition.
+
+    def get_grammars(self):
+        return list(self._grammars)
+
+    def recognize(self, utterance):
+        """
+            Processes a recognition of *utterance*, a list of ``(word,
+            dictated)`` 2-tuples as returned by :func:`parse_utterance`.
+
+            :returns: True if a rule matched the utterance.
+
+        """
+
+        for observer in list(self._observers):
+            observer.on_begin()
+
+        grammars = list(self._exclusive or self._grammars)
+        executable, title, handle = self.context
+        for grammar in grammars:
+            grammar.process_begin(executable, title, handle)
+
+        words = [word for word, dictated in utterance]
+        for grammar in grammars:
+            if not getattr(grammar, "enabled", True):
+                continue
+            rules = [rule for rule in grammar.rules if rule.exported]
+            rule_names = [rule.name for rule in rules]
+            for rule_id, rule in enumerate(rules):
+                if not rule.active:
+                    continue
+
+                # Words are tagged as an engine would: dictated words
+                #  with the dictation rule id, and all others with the
+                #  id of the top-level rule being decoded.
+                results = [(word, DICTATION_RULE_ID if dictated else rule_id)
+                           for word, dictated in utterance]
+                state = self._create_state(results, rule_names)
+                state.initialize_decoding()
+                for result in rule.decode(state):
+                    if state.finished():
+                        root = state.build_parse_tree()
+                        rule.process_recognition(root)
+                        for observer in list(self._observers):
+                            observer.on_recognition(words)
+                        return True
+
+        for observer in list(self._observers):
+            observer.on_failure()
+        return False
+
+    def _create_state(self, results, rule_names):
+        # Returns the decoding state of one recognition.
+        from dragonfly.grammar.state import State
+        return State(results, rule_names, self)
+
+
+#===========================================================================
+
+class Replayer(object):
+    """
+        Replays recorded utterances against an engine, at a fixed rate
+        or as fast as possible.
+
+        Pacing happens on a background thread, which hands utterances
+        to the main thread, as given by the main thread dispatcher, in
+        batches; recognitions are processed there, like those of a real
+        engine.
+
+        :param rate: Utterances per second, or 0 to replay as fast as
+            the main thread can process them.
+        :param repeat: Number of times to replay the recording.
+
+    """
+
+    def __init__(self, engine, utterances, rate=0, repeat=1, batch_size=100):
+        self._engine = engine
+        self._utterances = list(utterances)
+        self._rate = rate
+        self._repeat = repeat
+        self._batch_size = batch_size
+        self._stopped = threading.Event()
+        self._finished = threading.Event()
+        self._thread = None
+        self.replayed = 0
+        self.recognized = 0
+        self.elapsed = None
+
+    def start(self, delay=0):
+        """ Starts replaying after *delay* seconds. """
+        self._thread = threading.Thread(target=self._run, args=(delay,),
+                                        name="bumblebee-replay")
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def wait(self, timeout=None):
+        """ Waits for the replay to finish; returns True if it has. """
+        self._finished.wait(timeout)
+        return self._finished.isSet()
+
+    def get_throughput(self):
+        """ Returns the number of utterances replayed per second. """
+        if not self.elapsed:
+            return None
+        return self.replayed / self.elapsed
+
+    def _run(self, delay):
+        if delay:
+            self._stopped.wait(delay)
+        total = len(self._utterances) * self._repeat
+        start_time = timer()
+        index = 0
+        try:
+            while index < total and not self._stopped.isSet():
+                count = self._batch_size
+                if self._rate:
+                    # Wait until the next utterance is due, then send
+                    #  all utterances which are due.
+                    delay = start_time + index / float(self._rate) - timer()
+                    if delay > 0:
+                        self._stopped.wait(delay)
+                    due = int((timer() - start_time) * self._rate) + 1
+                    count = max(1, min(count, due - index))
+                count = min(count, total - index)
+                batch = [self._utterances[i % len(self._utterances)]
+                         for i in range(index, index + count)]
+                index += count
+
+                done = threading.Event()
+                self._dispatch(self._process, batch, done)
+                done.wait()
+        except Exception, e:
+            log.exception("Replay failed: {0}".format(e))
+        self.elapsed = timer() - start_time
+        log.info("Replayed {0} utterances in {1:.2f} seconds ({2:.0f} per"
+                 " second); {3} recognized.".format(
+                     self.replayed, self.elapsed,
+                     self.get_throughput() or 0, self.recognized))
+        self._finished.set()
+
+    def _process(self, batch, done):
+        try:
+            for utterance in batch:
+                if self._stopped.isSet():
+                    break
+                self.replayed += 1
+                try:
+                    if self._engine.recognize(utterance):
+                        self.recognized += 1
+                except Exception, e:
+                    log.exception("Error processing utterance {0}: {1}"
+                                  "".format(utterance, e))
+        finally:
+            done.set()
+
+    def _dispatch(self, function, *args):
+        dispatcher = get_main_thread_dispatcher()
+        if dispatcher:
+            dispatcher(function, *args)
+        else:
+            function(*args)
@@ -0,0 +1,295 @@
+import logging
+import threading
+from bumblebee.event_loop           import EventLoop
+from bumblebee.metrics              import Histogram, timer
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+
+class _Task(object):
+    """ State and statistics of a task registered with a scheduler. """
+
+    __slots__ = ("name", "function", "interval", "triggers", "main_thread",
+                 "running", "pending", "removed", "handle", "runs",
+                 "failures", "overruns", "last_duration", "histogram")
+
+    def __init__(self, name, function, interval, triggers, main_thread):
+        self.name = name
+        self.function = function
+        self.interval = interval
+        self.triggers = frozenset(triggers)
+        self.main_thread = main_thread
+        self.running = False        # Queued or running.
+        self.pending = False        # Requested again while running.
+        self.removed = False
+        self.handle = None          # Handle of the next interval tick.
+        self.reset()
+
+    def reset(self):
+        self.runs = 0
+        self.failures = 0
+        self.overruns = 0
+        self.last_duration = None
+        self.histogram = Histogram()
+
+
+#===========================================================================
+
+class Scheduler(object):
+    """
+        Runs tasks at their own intervals and/or when named events are
+        triggered, and keeps timing statistics for each task.
+
+        Each task runs independently of the others: a task which is
+        requested while a previous run is still queued or running is
+        not started a second time, but counted as an overrun and run
+        once more afterwards.  A slow task therefore never queues up
+        work, and only delays itself.
+
+        Tasks run on the main thread by default, through the
+        *call_soon* callable given by the host, each as a separate
+        call so that the host's other events are processed between
+        them.  Tasks which are safe to run on another thread can ask
+        for a thread of their own with ``main_thread=False``, so that
+        they do not delay the main thread at all.
+
+        Intervals are timed on a thread of the scheduler's own, which
+        runs while the scheduler is started and has tasks with
+        intervals; it sleeps until the next task is due.
+
+    """
+
+    def __init__(self, call_soon):
+        self._call_soon = call_soon
+        self._tasks = {}
+        self._lock = threading.RLock()
+        self._started = False
+        self._loop = None
+        self._thread = None
+
+    #-----------------------------------------------------------------------
+    # Task registration.
+
+    def add_task(self, name, function, interval=None, triggers=(),
+                 main_thread=True):
+        """
+            Registers a task, replacing any task of the same *name*.
+
+            :param function: Callable run, without arguments, for each
+                run of the task.
+            :param interval: Seconds between runs, or None if the task
+                only runs when triggered.
+            :param triggers: Names of the events which run the task.
+            :param main_thread: False if the task may run on a thread
+                of its own.
+
+        """
+
+        task = _Task(name, function, interval, triggers, main_thread)
+        self._lock.acquire()
+        try:
+            self.remove_task(name)
+            self._tasks[name] = task
+            if self._loop:
+                self._schedule_tick(task)
+            elif self._started and interval:
+                self._start_loop()
+        finally:
+            self._lock.release()
+
+    def remove_task(self, name):
+        self._lock.acquire()
+        try:
+            task = self._tasks.pop(name, None)
+            if task:
+                task.removed = True
+                if task.handle:
+                    task.handle.cancel()
+        finally:
+            self._lock.release()
+
+    def get_task_names(self):
+        return sorted(self._tasks.keys())
+
+    #-----------------------------------------------------------------------
+    # Running tasks.
+
+    def start(self):
+        """ Starts running tasks at their intervals. """
+        self._lock.acquire()
+        try:
+            self._started = True
+            for task in self._tasks.values():
+                if task.interval:
+                    self._start_loop()
+                    break
+        finally:
+            self._lock.release()
+
+    def stop(self, timeout=5.0):
+        """ Stops running tasks at their intervals. """
+        self._lock.acquire()
+        try:
+            self._started = False
+            loop, thread = self._loop, self._thread
+            self._loop, self._thread = None, None
+            for task in self._tasks.values():
+                task.handle = None
+        finally:
+            self._lock.release()
+        if loop:
+            loop.stop()
+            thread.join(timeout)
+            if not thread.isAlive():
+                loop.close()
+
+    def is_timing(self):
+        """ Returns True if the interval timing thread is running. """
+        return self._thread is not None
+
+    def trigger(self, event):
+        """
+            Runs all tasks which are triggered by *event*.  This may be
+            called from any thread.
+
+        """
+
+        self._lock.acquire()
+        try:
+            tasks = [task for task in self._tasks.values()
+                     if event in task.triggers]
+        finally:
+            self._lock.release()
+        for task in sorted(tasks, key=lambda task: task.name):
+            self._request(task)
+
+    def run_task(self, name):
+        """ Runs the task *name* as soon as possible. """
+        self._request(self._tasks[name])
+
+    def _start_loop(self):
+        # Called with the lock held.
+        if self._loop:
+            return
+        self._loop = EventLoop()
+        for task in self._tasks.values():
+            self._schedule_tick(task)
+        self._thread = threading.Thread(target=self._loop.run,
+                                        name="bumblebee-scheduler")
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def _schedule_tick(self, task):
+        if task.interval:
+            task.handle = self._loop.call_later(task.interval, self._tick,
+                                                task)
+
+    def _tick(self, task):
+        self._lock.acquire()
+        try:
+            if task.removed or not self._loop:
+                return
+            self._schedule_tick(task)
+        finally:
+            self._lock.release()
+        self._request(task)
+
+    def _request(self, task):
+        self._lock.acquire()
+        try:
+            if task.removed:
+                return
+            if task.running:
+                task.overruns += 1
+                task.pending = True
+                return
+            task.running = True
+        finally:
+            self._lock.release()
+
+        if task.main_thread:
+            self._call_soon(self._run, task)
+        else:
+            thread = threading.Thread(target=self._run, args=(task,),
+                                      name="bumblebee-task-" + task.name)
+            thread.setDaemon(True)
+            thread.start()
+
+    def _run(self, task):
+        start_time = timer()
+        failed = False
+        try:
+            task.function()
+        except Exception, e:
+            failed = True
+            log.exception("Task {0} failed: {1}".format(task.name, e))
+        duration = timer() - start_time
+
+        self._lock.acquire()
+        try:
+            task.runs += 1
+            if failed:
+                task.failures += 1
+            task.last_duration = duration
+            task.histogram.record(duration)
+            task.running = False
+            rerun, task.pending = task.pending, False
+        finally:
+            self._lock.release()
+        if rerun:
+            self._request(task)
+
+    #-----------------------------------------------------------------------
+    # Statistics.
+
+    def get_statistics(self):
+        """
+            Returns a list of ``(name, runs, failures, overruns, last,
+            mean, maximum)`` tuples, one for each task, sorted by name.
+            Durations are in seconds.
+
+        """
+
+        self._lock.acquire()
+        try:
+            return [(task.name, task.runs, task.failures, task.overruns,
+                     task.last_duration, task.histogram.get_mean(),
+                     task.histogram.maximum)
+                    for task in sorted(self._tasks.values(),
+                                       key=lambda task: task.name)]
+        finally:
+            self._lock.release()
+
+    def reset_statistics(self):
+        self._lock.acquire()
+        try:
+            for task in self._tasks.values():
+                task.reset()
+        finally:
+            self._lock.release()
+
+
+#---------------------------------------------------------------------------
+
+_scheduler = None
+
+
+def set_scheduler(scheduler):
+    """ Sets the scheduler used by the running application. """
+    global _scheduler
+    _scheduler = scheduler
+
+
+def get_scheduler():
+    """
+        Returns the scheduler of the running application, or None if
+        it has not been set up.
+
+    """
+
+    return _scheduler
@@ -1,3 +1,8 @@
 
 from bumblebee.system.interfaces import *
 from bumblebee.system.dragonfly import *
+from bumblebee.system.context import *
+from bumblebee.system.log_levels import *
+from bumblebee.system.recognition_metrics import *
+from bumblebee.system.replay import *
+from bumblebee.system.grammar_cache import *
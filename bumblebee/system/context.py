@@ -0,0 +1,127 @@
+from __future__ import absolute_import
+
+import sys
+import logging
+from pyutilib.component.core        import (SingletonPlugin, ExtensionPoint,
+                                            implements)
+from bumblebee.system.interfaces    import (ISystemParticipant,
+                                            IContextObserver)
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+
+class ForegroundContextParticipant(SingletonPlugin):
+    """
+        System participant which tells context observers when the
+        foreground window changes.
+
+        On Windows this uses a ``SetWinEventHook()`` hook, which is
+        called from the GUI thread's message loop only when the
+        foreground window or its title changes, instead of polling.
+        On other platforms no notifications are sent.
+
+    """
+
+    implements(ISystemParticipant)
+    observers = ExtensionPoint(IContextObserver)
+
+    EVENT_SYSTEM_FOREGROUND  = 0x0003
+    EVENT_OBJECT_NAMECHANGE  = 0x800C
+    WINEVENT_OUTOFCONTEXT    = 0x0000
+    OBJID_WINDOW             = 0
+
+    def __init__(self):
+        self._hooks = []
+        self._hook_callback = None
+        self._context = (None, None)
+
+    #-----------------------------------------------------------------------
+    # ISystemParticipant methods.
+
+    def startup(self):
+        self.shutdown()
+        if sys.platform != "win32":
+            log.info("Foreground context monitoring is not available"
+                     " on this platform.")
+            return
+
+        try:
+            self._install_hooks()
+        except Exception, e:
+            log.exception("Failed to install foreground window hook: {0}"
+                          "".format(e))
+            return
+        self._update_context()
+
+    def shutdown(self):
+        if self._hooks:
+            import ctypes
+            for hook in self._hooks:
+                ctypes.windll.user32.UnhookWinEvent(hook)
+        self._hooks = []
+        self._hook_callback = None
+
+    def config_changed(self):
+        pass
+
+    #-----------------------------------------------------------------------
+    # Context access.
+
+    def get_context(self):
+        """ Returns the current (executable, title) 2-tuple. """
+        return self._context
+
+    #-----------------------------------------------------------------------
+    # Internal methods.
+
+    def _install_hooks(self):
+        import ctypes
+        from ctypes import wintypes
+
+        user32 = ctypes.windll.user32
+        callback_type = ctypes.WINFUNCTYPE(None, wintypes.HANDLE,
+                                           wintypes.DWORD, wintypes.HWND,
+                                           wintypes.LONG, wintypes.LONG,
+                                           wintypes.DWORD, wintypes.DWORD)
+
+        def callback(hook, event, window, object_id, child_id,
+                     thread_id, event_time):
+            if event == self.EVENT_OBJECT_NAMECHANGE:
+                if object_id != self.OBJID_WINDOW:
+                    return
+                if window != user32.GetForegroundWindow():
+                    return
+            try:
+                self._update_context()
+            except Exception, e:
+                log.exception("Error handling foreground change: {0}"
+                              "".format(e))
+
+        # The callback must be referenced for as long as the hooks
+        #  exist, because otherwise it would be garbage collected.
+        self._hook_callback = callback_type(callback)
+        for event in (self.EVENT_SYSTEM_FOREGROUND,
+                      self.EVENT_OBJECT_NAMECHANGE):
+            hook = user32.SetWinEventHook(event, event, 0,
+                                          self._hook_callback, 0, 0,
+                                          self.WINEVENT_OUTOFCONTEXT)
+            if not hook:
+                raise ctypes.WinError()
+            self._hooks.append(hook)
+
+    def _update_context(self):
+        from dragonfly import Window
+        window = Window.get_foreground()
+        context = (window.executable, window.title)
+        if context == self._context:
+            return
+        self._context = context
+
+        executable, title = context
+        for observer in self.observers:
+            observer.context_changed(executable, title)
@@ -6,6 +6,8 @@ from pyutilib.component.core        import (Plugin, SingletonPlugin,
                                             ExtensionPoint, implements)
 from pyutilib.component.config      import declare_option
 from bumblebee.system.interfaces    import ISystemParticipant
+from bumblebee.timeline             import get_startup_timeline
+from bumblebee.engine_connection    import get_engine_connection
 
 
 #===========================================================================
@@ -16,12 +18,21 @@ log = logging.getLogger(__name__)
 #===========================================================================
 
 class DragonflySystemParticipant(SingletonPlugin):
+    """
+        System participant which connects to the SR engine named by
+        the ``engine`` option, through Dragonfly.  The engine ``mock``
+        is a stand-in which recognizes text instead of speech; see
+        :class:`bumblebee.mock_engine.MockEngine`.
+
+        Connecting happens in the background; see
+        :class:`bumblebee.engine_connection.EngineConnection`.
+
+    """
 
     implements(ISystemParticipant)
     declare_option("engine", section="Dragonfly", default="auto")
 
     def __init__(self):
-        self._engine = None
         self._loaded_engine_name = None
 
     #-----------------------------------------------------------------------
@@ -32,9 +43,7 @@ class DragonflySystemParticipant(SingletonPlugin):
         self._connect_engine()
 
     def shutdown(self):
-        if self._engine:
-            self._engine.disconnect()
-        self._engine = None
+        get_engine_connection().disconnect()
         self._loaded_engine_name = None
 
     def config_changed(self):
@@ -56,19 +65,19 @@ class DragonflySystemParticipant(SingletonPlugin):
 
     def _connect_engine(self):
         engine_name = self._resolve_engine_name(self.engine)
+        description = engine_name or "(automatic selection)"
 
-        try:
+        def locate_engine():
+            # Called on a background thread.
             log.info("Importing Dragonfly library.")
-            import dragonfly
-
-            log.info("Locating SR engine {0}."
-                     "".format(engine_name or "(automatic selection)"))
-            self._engine = dragonfly.get_engine(engine_name)
+            with get_startup_timeline().phase("Importing Dragonfly"):
+                import dragonfly
 
-            log.info("Connecting to SR engine {0}.".format(self._engine))
-            self._engine.connect()
-        except Exception, e:
-            log.exception("Error during Dragonfly setup: {0}".format(e))
-            raise
+            log.info("Locating SR engine {0}.".format(description))
+            if engine_name == "mock":
+                from bumblebee.mock_engine import MockEngine
+                return MockEngine()
+            return dragonfly.get_engine(engine_name)
 
+        get_engine_connection().connect(locate_engine, description)
         self._loaded_engine_name = self.engine
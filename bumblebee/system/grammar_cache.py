@@ -0,0 +1,93 @@
+from __future__ import absolute_import
+
+import logging
+import threading
+from pyutilib.component.core        import SingletonPlugin, implements
+from pyutilib.component.config      import declare_option
+from pyutilib.component.config.options import BoolOption
+from bumblebee.system.interfaces    import ISystemParticipant
+from bumblebee.engine_connection    import get_engine_connection, CONNECTED
+from bumblebee.command.grammar_cache import (GrammarCache,
+                                             install_grammar_cache,
+                                             uninstall_grammar_cache,
+                                             set_grammar_cache)
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+
+class GrammarCacheParticipant(SingletonPlugin):
+    """
+        System participant which caches compiled grammars, so that
+        unchanged grammars are not compiled again when their command
+        module is reloaded or when Bumblebee restarts.
+
+        The cache is installed into Dragonfly's grammar compilers when
+        the engine connects, before any grammars are loaded.  It can be
+        switched off with the ``enabled`` option of the
+        ``[GrammarCache]`` config section.
+
+    """
+
+    implements(ISystemParticipant)
+    declare_option("enabled", section="GrammarCache", default=True,
+                   cls=BoolOption)
+
+    def __init__(self):
+        self._cache = None
+
+    #-----------------------------------------------------------------------
+    # ISystemParticipant methods.
+
+    def startup(self):
+        self.shutdown()
+        if not self.enabled:
+            return
+
+        # Store the cache in the app data directory next to the config.
+        from bumblebee.config import Config
+        directory = Config().get_data_directory("cache", "grammars")
+        self._cache = GrammarCache(directory)
+        set_grammar_cache(self._cache)
+
+        # Remove unused entries without delaying startup.
+        thread = threading.Thread(target=self._cache.prune)
+        thread.setDaemon(True)
+        thread.start()
+
+        connection = get_engine_connection()
+        connection.add_observer(self._engine_state_changed)
+        if connection.get_state() == CONNECTED:
+            self._install()
+
+    def shutdown(self):
+        get_engine_connection().remove_observer(self._engine_state_changed)
+        if self._cache:
+            uninstall_grammar_cache()
+            set_grammar_cache(None)
+        self._cache = None
+
+    def config_changed(self):
+        if bool(self.enabled) != bool(self._cache):
+            self.startup()
+
+    #-----------------------------------------------------------------------
+    # Internal methods.
+
+    def _engine_state_changed(self, state):
+        # Called before callbacks waiting for the engine, such as
+        #  grammar loading, are run.
+        if state == CONNECTED:
+            self._install()
+
+    def _install(self):
+        count = install_grammar_cache(self._cache)
+        if count:
+            log.info("Using grammar cache {0}".format(self._cache))
+        else:
+            log.info("Grammar cache not used: the SR engine's grammars"
+                     " are not compiled by a supported compiler.")
@@ -30,3 +30,37 @@ class ISystemParticipant(Interface):
             modified.
 
         """
+
+
+#---------------------------------------------------------------------------
+
+class ITaskProvider(Interface):
+
+    def register_tasks(self, scheduler):
+        """
+            Registers the tasks which should run at their own
+            intervals, or when events are triggered.
+
+            This method is called on system startup, before system
+            participants are started.
+
+            :param scheduler: The :class:`bumblebee.scheduler.Scheduler`
+                with which to register tasks.
+
+        """
+
+
+#---------------------------------------------------------------------------
+
+class IContextObserver(Interface):
+
+    def context_changed(self, executable, title):
+        """
+            Called when the foreground window has changed.
+
+            :param executable: Path of the foreground window's
+                executable, or None if not known.
+            :param title: Title of the foreground window, or None if
+                not known.
+
+        """
@@ -0,0 +1,89 @@
+from __future__ import absolute_import
+
+import logging
+from pyutilib.component.core        import SingletonPlugin, implements
+from pyutilib.component.config      import declare_option
+from bumblebee.system.interfaces    import ISystemParticipant
+from bumblebee.log_handlers         import parse_levels, configure_levels
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+
+default_levels = """
+    compound.parse:         INFO
+    engine:                 INFO
+    grammar.begin:          INFO
+    grammar.decode:         INFO
+    dictation.formatter:    INFO
+    context.match:          INFO
+    grammar.load:           INFO
+    action.exec:            INFO
+"""
+
+default_sinks = """
+    file:                   DEBUG
+    view:                   DEBUG
+"""
+
+
+def apply_default_levels():
+    """ Sets the default levels, before the config has been loaded. """
+    configure_levels(parse_levels(default_levels),
+                     parse_levels(default_sinks))
+
+
+#===========================================================================
+
+class LogLevelParticipant(SingletonPlugin):
+    """
+        System participant which sets logger and sink levels from the
+        ``[Logging]`` config section.
+
+        The ``levels`` option lists ``<logger>: <level>`` lines; the
+        name ``root`` stands for the root logger.  The ``sinks``
+        option lists ``<sink>: <level>`` lines for the log file
+        (``file``) and the log view (``view``); a sink's level may be
+        ``OFF``.  Changes take effect when the config file is saved.
+
+    """
+
+    implements(ISystemParticipant)
+    declare_option("levels", section="Logging", default=default_levels)
+    declare_option("sinks", section="Logging", default=default_sinks)
+
+    def __init__(self):
+        self._applied_config = None
+
+    #-----------------------------------------------------------------------
+    # ISystemParticipant methods.
+
+    def startup(self):
+        self._applied_config = None
+        self._apply_config()
+
+    def shutdown(self):
+        pass
+
+    def config_changed(self):
+        self._apply_config()
+
+    #-----------------------------------------------------------------------
+    # Internal methods.
+
+    def _apply_config(self):
+        # If config has not changed, return immediately.
+        config = (self.levels, self.sinks)
+        if config == self._applied_config:
+            return
+        self._applied_config = config
+
+        logger_levels = parse_levels(self.levels)
+        sink_levels = parse_levels(self.sinks)
+        configure_levels(logger_levels, sink_levels)
+        log.info("Applied log levels: {0} loggers, sinks {1}."
+                 "".format(len(logger_levels), sink_levels))
@@ -0,0 +1,148 @@
+from __future__ import absolute_import
+
+import weakref
+import logging
+from pyutilib.component.core        import SingletonPlugin, implements
+from bumblebee.system.interfaces    import ISystemParticipant
+from bumblebee.command.interfaces   import ICommandSetObserver
+from bumblebee.metrics              import get_recognition_metrics, timer
+from bumblebee.engine_connection    import get_engine_connection
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+
+class RecognitionMetricsParticipant(SingletonPlugin):
+    """
+        System participant which times recognitions and the actions
+        they trigger, per grammar and rule.
+
+        A Dragonfly recognition observer notes the start of each
+        utterance.  The rules of each loaded command set's grammars are
+        wrapped, so that the time until a rule starts processing its
+        recognition and the time the processing takes are recorded in
+        the recognition :class:`LatencyMetrics`.
+
+    """
+
+    implements(ISystemParticipant)
+    implements(ICommandSetObserver)
+
+    def __init__(self):
+        self._metrics = get_recognition_metrics()
+        self._observer = None
+        self._begin_time = None
+        self._started = False
+
+    #-----------------------------------------------------------------------
+    # ISystemParticipant methods.
+
+    def startup(self):
+        self.shutdown()
+        self._started = True
+
+        # The observer is registered with the engine, so it has to
+        #  wait until the engine is connected.
+        get_engine_connection().when_connected(self._register_observer)
+
+    def shutdown(self):
+        if self._observer:
+            self._observer.unregister()
+        self._observer = None
+        self._begin_time = None
+        self._started = False
+
+    def config_changed(self):
+        pass
+
+    #-----------------------------------------------------------------------
+    # ICommandSetObserver methods.
+
+    def command_sets_changed(self, added, removed):
+        # Removed command sets need no attention; their wrapped rules
+        #  go away with them.
+        for command_set in added:
+            for grammar in command_set.get_grammars():
+                self.instrument_grammar(grammar)
+
+    #-----------------------------------------------------------------------
+    # Instrumentation.
+
+    def instrument_grammar(self, grammar):
+        """ Wraps the rules of *grammar* to record their timings. """
+        for rule in grammar.rules:
+            if not getattr(rule, "_bumblebee_timed", False):
+                self._instrument_rule(grammar.name, rule)
+
+    def utterance_begun(self):
+        self._begin_time = timer()
+
+    def utterance_failed(self):
+        self._begin_time = None
+        self._metrics.record_failure()
+
+    def _register_observer(self):
+        if not self._started or self._observer:
+            return
+        try:
+            self._observer = _create_observer(self)
+            self._observer.register()
+        except Exception, e:
+            log.exception("Failed to register recognition observer: {0}"
+                          "".format(e))
+            self._observer = None
+
+    def _instrument_rule(self, grammar_name, rule):
+        # The wrapper is stored on the rule, so it must only refer to
+        #  the rule weakly; otherwise the rule and its grammar would be
+        #  kept alive in a cycle, and only freed by the garbage
+        #  collector.  The class's method is called with the rule.
+        original = type(rule).process_recognition
+        rule_reference = weakref.ref(rule)
+        rule_name = rule.name
+        metrics = self._metrics
+        participant = self
+
+        def process_recognition(*args, **kwargs):
+            rule = rule_reference()
+            if rule is None:
+                return None
+            start = timer()
+            try:
+                return original(rule, *args, **kwargs)
+            finally:
+                end = timer()
+                metrics.record(grammar_name, rule_name, "action",
+                               end - start)
+                begin = participant._begin_time
+                if begin is not None:
+                    metrics.record(grammar_name, rule_name, "recognition",
+                                   start - begin)
+                    metrics.record(grammar_name, rule_name, "total",
+                                   end - begin)
+
+        rule.process_recognition = process_recognition
+        rule._bumblebee_timed = True
+
+
+#---------------------------------------------------------------------------
+
+def _create_observer(participant):
+    import dragonfly
+
+    class MetricsObserver(dragonfly.RecognitionObserver):
+
+        def on_begin(self):
+            participant.utterance_begun()
+
+        def on_recognition(self, words):
+            pass
+
+        def on_failure(self):
+            participant.utterance_failed()
+
+    return MetricsObserver()
@@ -0,0 +1,100 @@
+from __future__ import absolute_import
+
+import logging
+from pyutilib.component.core        import SingletonPlugin, implements
+from pyutilib.component.config      import declare_option
+from pyutilib.component.config.options import IntOption
+from bumblebee.system.interfaces    import ISystemParticipant
+from bumblebee.engine_connection    import get_engine_connection
+from bumblebee.mock_engine          import (MockEngine, Replayer,
+                                            read_recording)
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+
+class ReplayParticipant(SingletonPlugin):
+    """
+        System participant which replays a recording of utterances
+        against the mock engine, for load testing.
+
+        Replaying is configured in the ``[MockEngine]`` config section,
+        and only happens while the ``engine`` option of the
+        ``[Dragonfly]`` section is ``mock``:
+         - ``replay_file`` -- path of the recording; see
+           :func:`bumblebee.mock_engine.read_recording`.
+         - ``replay_rate`` -- utterances per second, or 0 to replay as
+           fast as possible.
+         - ``replay_repeat`` -- number of times to replay the recording.
+         - ``replay_delay`` -- seconds to wait after connecting, so that
+           command modules can finish loading.
+
+    """
+
+    implements(ISystemParticipant)
+    declare_option("replay_file", section="MockEngine", default="")
+    declare_option("replay_rate", section="MockEngine", default=0,
+                   cls=IntOption)
+    declare_option("replay_repeat", section="MockEngine", default=1,
+                   cls=IntOption)
+    declare_option("replay_delay", section="MockEngine", default=2,
+                   cls=IntOption)
+
+    def __init__(self):
+        self._replayer = None
+        self._started = False
+        self._applied_config = None
+
+    #-----------------------------------------------------------------------
+    # ISystemParticipant methods.
+
+    def startup(self):
+        self.shutdown()
+        self._started = True
+        self._applied_config = self._get_config()
+        get_engine_connection().when_connected(self._start_replay)
+
+    def shutdown(self):
+        if self._replayer:
+            self._replayer.stop()
+        self._replayer = None
+        self._started = False
+
+    def config_changed(self):
+        # If config has not changed, return immediately.
+        if self._get_config() == self._applied_config:
+            return
+        self.startup()
+
+    #-----------------------------------------------------------------------
+    # Internal methods.
+
+    def _get_config(self):
+        return (self.replay_file, self.replay_rate, self.replay_repeat,
+                self.replay_delay)
+
+    def _start_replay(self):
+        if not self._started or self._replayer or not self.replay_file:
+            return
+        engine = get_engine_connection().get_engine()
+        if not isinstance(engine, MockEngine):
+            log.info("Not replaying {0}: the SR engine is not the mock"
+                     " engine.".format(self.replay_file))
+            return
+
+        try:
+            utterances = read_recording(self.replay_file)
+        except Exception, e:
+            log.exception("Failed to read recording {0}: {1}"
+                          "".format(self.replay_file, e))
+            return
+
+        log.info("Replaying {0} utterances from {1}.".format(
+                 len(utterances), self.replay_file))
+        self._replayer = Replayer(engine, utterances, self.replay_rate,
+                                  self.replay_repeat)
+        self._replayer.start(self.replay_delay)
@@ -0,0 +1,123 @@
+"""
+    Benchmark of per-call logging latency for the application log.
+
+    Compares the plain ``logging.FileHandler`` which Bumblebee used
+    for its log file with the asynchronous, rotating handler.  For
+    each handler it measures how long a single ``log.debug()`` call
+    takes in the calling thread, which is the delay a recognition
+    callback sees.
+
+    Local disks with a warm cache rarely block, so the benchmark also
+    runs each handler on a simulated slow disk, which stalls for
+    *stall* milliseconds on every 100th flush.
+
+    Usage: python -m bumblebee.test.bench_logging [calls [stall]]
+
+"""
+
+import os.path
+import sys
+import time
+import shutil
+import logging
+import tempfile
+from bumblebee.log_handlers import AsyncLogHandler, RotatingLogFileHandler
+
+
+#===========================================================================
+
+class SlowDisk(object):
+    """ Makes a file handler stall on every 100th flush. """
+
+    def __init__(self, handler, stall):
+        self._flush = handler.flush
+        self._stall = stall
+        self._count = 0
+        handler.flush = self.flush
+
+    def flush(self):
+        self._flush()
+        self._count += 1
+        if self._stall and self._count % 100 == 0:
+            time.sleep(self._stall)
+
+
+def create_file_handler(path, stall):
+    handler = logging.FileHandler(path)
+    SlowDisk(handler, stall)
+    return handler
+
+
+def create_async_handler(path, stall):
+    target = RotatingLogFileHandler(path, max_bytes=1024 * 1024,
+                                    interval=0, backup_count=5,
+                                    compress=True)
+    SlowDisk(target, stall)
+    return AsyncLogHandler(target)
+
+
+strategies = [
+              ("FileHandler",           create_file_handler),
+              ("AsyncLogHandler",       create_async_handler),
+             ]
+
+
+#===========================================================================
+
+def measure(create_handler, calls, stall):
+    directory = tempfile.mkdtemp()
+    handler = create_handler(os.path.join(directory, "bench-log.txt"),
+                             stall)
+    log = logging.getLogger("bench_logging")
+    log.propagate = False
+    log.setLevel(logging.DEBUG)
+    log.addHandler(handler)
+
+    latencies = []
+    try:
+        for index in xrange(calls):
+            start = time.time()
+            log.debug("Recognition %d: %r", index, ("some", "words"))
+            latencies.append(time.time() - start)
+        close_start = time.time()
+        log.removeHandler(handler)
+        handler.close()
+        close_time = time.time() - close_start
+    finally:
+        shutil.rmtree(directory)
+
+    latencies.sort()
+    return {
+            "mean":     sum(latencies) / len(latencies),
+            "median":   latencies[len(latencies) // 2],
+            "p99":      latencies[int(len(latencies) * 0.99)],
+            "max":      latencies[-1],
+            "close":    close_time,
+           }
+
+
+def main():
+    calls = 20000
+    stall = 0.005
+    if len(sys.argv) > 1:
+        calls = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        stall = float(sys.argv[2]) / 1000
+
+    print "Logging {0} records per handler.".format(calls)
+    row = "{0:<28} {1:>9} {2:>9} {3:>9} {4:>9} {5:>9}"
+    print row.format("handler", "mean us", "median us", "p99 us",
+                     "max us", "close ms")
+    for disk, disk_stall in (("fast disk", 0), ("slow disk", stall)):
+        for name, create_handler in strategies:
+            result = measure(create_handler, calls, disk_stall)
+            print row.format("{0} ({1})".format(name, disk),
+                             "{0:.1f}".format(result["mean"] * 1e6),
+                             "{0:.1f}".format(result["median"] * 1e6),
+                             "{0:.1f}".format(result["p99"] * 1e6),
+                             "{0:.1f}".format(result["max"] * 1e6),
+                             "{0:.1f}".format(result["close"] * 1e3))
+
+
+if __name__ == "__main__":
+    main()
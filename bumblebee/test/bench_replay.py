@@ -0,0 +1,79 @@
+"""
+    Benchmark of grammar matching and action throughput, using the
+    mock engine.
+
+    Loads the command modules in a directory with the mock engine as
+    Dragonfly's engine, then replays a recording of utterances against
+    them as fast as possible, and reports the throughput and the time
+    taken by each rule's actions.  This needs Dragonfly, but no speech
+    engine.
+
+    Usage: python -m bumblebee.test.bench_replay <command directory>
+           <recording> [repetitions]
+
+"""
+
+import sys
+from bumblebee.mock_engine import MockEngine, Replayer, read_recording
+from bumblebee.metrics import get_recognition_metrics, format_duration
+from bumblebee.command.legacy_loader import LegacyDirectoryLoader
+from bumblebee.system.recognition_metrics import RecognitionMetricsParticipant
+
+
+#===========================================================================
+
+def main(argv):
+    if len(argv) < 3:
+        print __doc__
+        return
+    directory, recording_path = argv[1], argv[2]
+    repeat = 1
+    if len(argv) > 3:
+        repeat = int(argv[3])
+
+    engine = MockEngine()
+    engine.connect()
+
+    # Command modules are loaded synchronously, since no main thread
+    #  dispatcher is set.
+    loader = LegacyDirectoryLoader()
+    loader.directories = directory
+    loader.bytecode_cache = False
+    loader.lazy = False
+    loader.profile_memory = False
+    loader.update()
+    grammars = engine.get_grammars()
+    print "Loaded {0} grammars.".format(len(grammars))
+
+    # Time each rule's actions.
+    metrics = get_recognition_metrics()
+    instrumentation = RecognitionMetricsParticipant()
+    for grammar in grammars:
+        instrumentation.instrument_grammar(grammar)
+
+    utterances = read_recording(recording_path)
+    replayer = Replayer(engine, utterances, rate=0, repeat=repeat)
+    replayer.start()
+    replayer.wait()
+    print "Replayed {0} utterances in {1:.2f} s: {2:.0f} per second," \
+          " {3} recognized.".format(replayer.replayed, replayer.elapsed,
+                                    replayer.get_throughput() or 0,
+                                    replayer.recognized)
+
+    print "{0:<20} {1:<20} {2:>8} {3:>10} {4:>10}".format(
+        "grammar", "rule", "count", "mean ms", "p99 ms")
+    for (grammar, rule, phase, count, mean, maximum,
+         values) in metrics.get_summary((99,)):
+        if phase != "action":
+            continue
+        print "{0:<20} {1:<20} {2:>8} {3:>10} {4:>10}".format(
+            grammar, rule, count, format_duration(mean),
+            format_duration(values[0]))
+
+    loader.directories = ""
+    loader.update()
+    engine.disconnect()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,127 @@
+"""
+    Benchmark of startup cost of the wx application and the headless
+    runner.
+
+    Each mode is measured in a fresh process: the time taken to import
+    its entry point and everything needed before the shared lifecycle
+    starts (the GUI's main frame, or the headless event loop, and the
+    system participants), and the peak memory use of the process
+    afterwards.  Modes whose dependencies are missing are reported as
+    unavailable.
+
+    Usage: python -m bumblebee.test.bench_startup [repetitions]
+
+"""
+
+import sys
+import subprocess
+from timeit import default_timer as timer
+
+
+#===========================================================================
+
+def start_wx():
+    import wx
+    import bumblebee.application
+    import bumblebee.gui.main_frame
+    import bumblebee.system
+
+
+def start_headless():
+    import bumblebee.headless
+    import bumblebee.system
+    bumblebee.headless.EventLoop()
+
+modes = [("wx", start_wx), ("headless", start_headless)]
+
+
+#---------------------------------------------------------------------------
+
+def get_peak_rss():
+    """ Returns the peak memory use of this process, in bytes. """
+    try:
+        import resource
+    except ImportError:
+        return _get_peak_rss_win32()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak
+    return peak * 1024
+
+
+def _get_peak_rss_win32():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters),
+                                             counters.cb)
+    return counters.PeakWorkingSetSize
+
+
+#---------------------------------------------------------------------------
+
+def run_child(mode):
+    start = dict(modes)[mode]
+    start_time = timer()
+    try:
+        start()
+    except ImportError, e:
+        print "unavailable {0}".format(e)
+        return
+    print "{0} {1}".format(timer() - start_time, get_peak_rss())
+
+
+def measure(mode):
+    process = subprocess.Popen([sys.executable, "-m",
+                                "bumblebee.test.bench_startup", "--child",
+                                mode],
+                               stdout=subprocess.PIPE)
+    output = process.communicate()[0].strip()
+    if output.startswith("unavailable"):
+        return None
+    elapsed, peak_rss = output.split()
+    return float(elapsed), int(peak_rss)
+
+
+#===========================================================================
+
+def main(argv):
+    if len(argv) > 2 and argv[1] == "--child":
+        run_child(argv[2])
+        return
+
+    repetitions = 5
+    if len(argv) > 1:
+        repetitions = int(argv[1])
+
+    print "{0:<10} {1:>14} {2:>14} {3:>14}".format(
+        "mode", "min import ms", "mean import ms", "peak RSS MB")
+    for name, start in modes:
+        results = [measure(name) for index in range(repetitions)]
+        if None in results:
+            print "{0:<10} {1:>14}".format(name, "unavailable")
+            continue
+        times = [elapsed for elapsed, peak_rss in results]
+        peak_rss = max(peak_rss for elapsed, peak_rss in results)
+        print "{0:<10} {1:>14.1f} {2:>14.1f} {3:>14.1f}".format(
+            name, min(times) * 1000, sum(times) / len(times) * 1000,
+            peak_rss / (1024.0 * 1024.0))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,131 @@
+"""
+    Benchmark of StreamLogger throughput for redirected stdout.
+
+    Compares the former StreamLogger, which concatenated and split the
+    pending partial line on every write and logged each line as its
+    own record, with the buffered implementation.  Output is logged to
+    a logger whose handler discards records, so the figures include
+    the cost of creating log records but not of storing them.
+
+    Usage: python -m bumblebee.test.bench_stream_logger [lines]
+
+"""
+
+import sys
+import time
+import logging
+from bumblebee.log_handlers import StreamLogger
+
+
+#===========================================================================
+
+class FormerStreamLogger(object):
+    """ The StreamLogger implementation before buffering was added. """
+
+    def __init__(self, logger_func):
+        self._logger_func = logger_func
+        self._incomplete_line = None
+
+    def write(self, data):
+        if self._incomplete_line:
+            data = self._incomplete_line + data
+            self._incomplete_line = None
+        lines = data.splitlines(True)
+        for line in lines[1:]:
+            self._logger_func(line[:-1])
+        line = lines[-1]
+        if "\n" in line:
+            self._logger_func(line[:-1])
+        else:
+            self._incomplete_line = line
+
+    def flush(self):
+        pass
+
+
+class DiscardingHandler(logging.Handler):
+
+    def emit(self, record):
+        record.getMessage()
+
+
+#===========================================================================
+
+def print_distinct(stream, lines):
+    # Like "print 'Processing item', index": separate writes for the
+    #  items and the newline.
+    for index in xrange(lines):
+        stream.write("Processing item")
+        stream.write(" ")
+        stream.write(str(index))
+        stream.write("\n")
+
+
+def print_repeated(stream, lines):
+    for index in xrange(lines):
+        stream.write("Waiting...")
+        stream.write("\n")
+
+
+def write_blocks(stream, lines):
+    block = "".join("line {0}\n".format(index) for index in xrange(100))
+    for index in xrange(lines // 100):
+        stream.write(block)
+
+
+def write_long_line(stream, lines):
+    for index in xrange(lines):
+        stream.write("x" * 100)
+    stream.write("\n")
+
+
+scenarios = [
+             ("distinct lines",     print_distinct),
+             ("repeated lines",     print_repeated),
+             ("100-line blocks",    write_blocks),
+             ("one long line",      write_long_line),
+            ]
+
+implementations = [
+                   ("former",       FormerStreamLogger),
+                   ("buffered",     StreamLogger),
+                  ]
+
+
+#===========================================================================
+
+def measure(stream_class, scenario, lines):
+    log = logging.getLogger("bench_stream_logger")
+    log.propagate = False
+    log.setLevel(logging.INFO)
+    handler = DiscardingHandler()
+    log.addHandler(handler)
+    try:
+        stream = stream_class(log.info)
+        start = time.time()
+        scenario(stream, lines)
+        stream.flush()
+        return time.time() - start
+    finally:
+        log.removeHandler(handler)
+
+
+def main():
+    lines = 20000
+    if len(sys.argv) > 1:
+        lines = int(sys.argv[1])
+
+    print "Writing {0} lines per scenario.".format(lines)
+    row = "{0:<20} {1:>12} {2:>12} {3:>9}"
+    print row.format("scenario", "former ms", "buffered ms", "speedup")
+    for scenario_name, scenario in scenarios:
+        times = [measure(stream_class, scenario, lines)
+                 for name, stream_class in implementations]
+        print row.format(scenario_name,
+                         "{0:.1f}".format(times[0] * 1e3),
+                         "{0:.1f}".format(times[1] * 1e3),
+                         "{0:.1f}x".format(times[0] / times[1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+    Benchmark comparing config change detection strategies.
+
+    Compares the 500 ms polling timer which Bumblebee used to check its
+    config file with the available file-watch backends.  For each
+    strategy it measures the number of wake-ups while idle and the
+    latency between modifying a watched file and detecting the change.
+
+    Usage: python -m bumblebee.test.bench_watcher [idle seconds]
+
+"""
+
+import os
+import os.path
+import sys
+import time
+import shutil
+import tempfile
+import threading
+from bumblebee.watcher import backends
+
+
+#===========================================================================
+
+class TimerStrategy(object):
+    """
+        Reproduces the former ``wx.Timer`` strategy: wake up every
+        500 ms and compare the config file's modification time.
+
+    """
+
+    name = "timer (500 ms)"
+
+    def __init__(self, callback, interval=0.5):
+        self._callback = callback
+        self._interval = interval
+        self._paths = ()
+        self._stopped = threading.Event()
+        self.wakeup_count = 0
+
+    def set_paths(self, paths):
+        self._paths = tuple(paths)
+        self._mtimes = dict((p, os.path.getmtime(p)) for p in self._paths)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run)
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            self._stopped.wait(self._interval)
+            if self._stopped.isSet():
+                break
+            self.wakeup_count += 1
+            for path in self._paths:
+                mtime = os.path.getmtime(path)
+                if mtime != self._mtimes[path]:
+                    self._mtimes[path] = mtime
+                    self._callback(set([path]))
+
+
+#===========================================================================
+
+def measure(factory, directory, idle_seconds, samples=10):
+    path = os.path.join(directory, "Bumblebee.ini")
+    open(path, "w").close()
+
+    detected = threading.Event()
+    watcher = factory(lambda changed: detected.set())
+    watcher.set_paths([path])
+    watcher.start()
+    time.sleep(0.2)
+
+    # Idle wake-ups.
+    start_count = watcher.wakeup_count
+    time.sleep(idle_seconds)
+    idle_wakeups = watcher.wakeup_count - start_count
+
+    # Change detection latency.
+    latencies = []
+    for index in range(samples):
+        detected.clear()
+        time.sleep(0.1)
+        start = time.time()
+        f = open(path, "w")
+        f.write("[Sample]\nindex = {0}\n".format(index))
+        f.close()
+        os.utime(path, (start + index + 1, start + index + 1))
+        detected.wait(5.0)
+        if detected.isSet():
+            latencies.append(time.time() - start)
+    watcher.stop()
+
+    return idle_wakeups, latencies
+
+
+def main(argv):
+    idle_seconds = 5.0
+    if len(argv) > 1:
+        idle_seconds = float(argv[1])
+
+    strategies = [(TimerStrategy.name, TimerStrategy)]
+    for watcher_class in backends:
+        if watcher_class.is_available():
+            strategies.append((watcher_class.name, watcher_class))
+
+    print "{0:<16} {1:>14} {2:>12} {3:>12}".format(
+        "strategy", "idle wakeups/s", "mean ms", "max ms")
+    for name, factory in strategies:
+        directory = tempfile.mkdtemp()
+        try:
+            wakeups, latencies = measure(factory, directory, idle_seconds)
+        finally:
+            shutil.rmtree(directory)
+        if latencies:
+            mean = sum(latencies) / len(latencies) * 1000
+            maximum = max(latencies) * 1000
+        else:
+            mean = maximum = float("nan")
+        print "{0:<16} {1:>14.2f} {2:>12.1f} {3:>12.1f}".format(
+            name, wakeups / idle_seconds, mean, maximum)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -10,6 +10,24 @@ import unittest
 
 safe_names         = [
                       "test:test_pep8",
+                      "test:test_watcher",
+                      "test:test_legacy_loader",
+                      "test:test_bytecode_cache",
+                      "test:test_log_buffer",
+                      "test:test_log_export",
+                      "test:test_log_handlers",
+                      "test:test_log_levels",
+                      "test:test_metrics",
+                      "test:test_leak_check",
+                      "test:test_worker",
+                      "test:test_registry",
+                      "test:test_timeline",
+                      "test:test_event_loop",
+                      "test:test_scheduler",
+                      "test:test_engine_connection",
+                      "test:test_mock_engine",
+                      "test:test_grammar_cache",
+                      "test:test_config.TestConfigReload",
                      ]
 unsafe_names       = [
                       "test:test_config",
@@ -0,0 +1,104 @@
+import os
+import os.path
+import time
+import shutil
+import tempfile
+import unittest
+from bumblebee.command.bytecode_cache import BytecodeCache
+from bumblebee.command.legacy_loader import compile_module
+
+
+#===========================================================================
+
+class TestBytecodeCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_directory = os.path.join(self.directory, "cache")
+        self.cache = BytecodeCache(self.cache_directory)
+        self.module_path = os.path.join(self.directory, "module.py")
+        self.source = "x = 1\n"
+        f = open(self.module_path, "w")
+        f.write(self.source)
+        f.close()
+        stat = os.stat(self.module_path)
+        self.modified_time, self.size = stat.st_mtime, stat.st_size
+        self.code = compile(self.source, self.module_path, "exec")
+        self.digest = "0" * 32
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _store(self):
+        self.cache.store(self.module_path, self.modified_time, self.size,
+                         self.digest, self.code)
+
+    def test_hit_and_miss(self):
+        """ Verify that stored code is returned and counted. """
+        self.assertEqual(self.cache.load(self.module_path,
+                                         self.modified_time, self.size),
+                         None)
+        self._store()
+        code, digest = self.cache.load(self.module_path,
+                                       self.modified_time, self.size)
+        self.assertEqual(digest, self.digest)
+        namespace = {}
+        exec code in namespace
+        self.assertEqual(namespace["x"], 1)
+        self.assertEqual(self.cache.get_statistics(), (1, 1))
+
+    def test_modified_module_misses(self):
+        """ Verify that entries for changed modules are not used. """
+        self._store()
+        self.assertEqual(self.cache.load(self.module_path,
+                                         self.modified_time + 1, self.size),
+                         None)
+        self.assertEqual(self.cache.load(self.module_path,
+                                         self.modified_time, self.size + 1),
+                         None)
+
+    def test_other_interpreter_misses(self):
+        """ Verify that entries from other interpreters are not used. """
+        self._store()
+        other_cache = BytecodeCache(self.cache_directory)
+        other_cache._magic = "\0\0\0\0"
+        self.assertEqual(other_cache.load(self.module_path,
+                                          self.modified_time, self.size),
+                         None)
+
+    def test_prune(self):
+        """ Verify that stale entries are pruned. """
+        self._store()
+        self.assertEqual(self.cache.prune([self.module_path]), 0)
+        self.assertEqual(len(os.listdir(self.cache_directory)), 1)
+
+        os.utime(self.module_path, (self.modified_time + 1,
+                                    self.modified_time + 1))
+        self.assertEqual(self.cache.prune(), 1)
+        self.assertEqual(os.listdir(self.cache_directory), [])
+
+        self._store()
+        self.assertEqual(self.cache.prune([]), 1)
+
+    def test_prune_temp_files(self):
+        """ Verify that only old temporary files are pruned, since new
+            ones may still be being written. """
+        os.makedirs(self.cache_directory)
+        paths = []
+        for name in ("old.tmp", "new.tmp"):
+            path = os.path.join(self.cache_directory, name)
+            open(path, "wb").close()
+            paths.append(path)
+        old_time = time.time() - BytecodeCache.temp_grace_period - 1
+        os.utime(paths[0], (old_time, old_time))
+        self.assertEqual(self.cache.prune(), 1)
+        self.assertEqual(os.listdir(self.cache_directory), ["new.tmp"])
+
+    def test_compile_module(self):
+        """ Verify that compile_module() uses the cache. """
+        first = compile_module(self.module_path, self.cache)
+        second = compile_module(self.module_path, self.cache)
+        self.assertEqual(self.cache.get_statistics(), (1, 1))
+        self.assertEqual(first.fingerprint.digest, second.fingerprint.digest)
+        self.assertEqual(second.compile_time, 0.0)
+        self.assertFalse(second.fingerprint.is_modified())
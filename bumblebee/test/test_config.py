@@ -4,8 +4,13 @@ import logging
 import unittest
 import os
 import os.path
+import shutil
+import tempfile
 import bumblebee.config
-from win32com.shell import shell, shellcon
+try:
+    from win32com.shell import shell, shellcon
+except ImportError:
+    shell = shellcon = None
 
 
 #===========================================================================
@@ -153,3 +158,27 @@ class TestConfig(unittest.TestCase):
             else:
                 log.debug("Remove config file: deleted {0}."
                           "".format(config_path))
+
+
+#---------------------------------------------------------------------------
+
+class TestConfigReload(unittest.TestCase):
+    """ Tests which use a config file in a temporary directory. """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.config = bumblebee.config.Config()
+        self.config._found_config_path = os.path.join(self.directory,
+                                                      "Bumblebee.ini")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_reload_missing_file(self):
+        """ Verify that a deleted config file causes a reload. """
+        loads = []
+        self.config.load_or_create = lambda: loads.append(True)
+        self.config._load_time = 1.0
+        self.assertFalse(os.path.exists(self.config.get_config_path()))
+        self.assertTrue(self.config.reload_if_modified())
+        self.assertEqual(loads, [True])
@@ -0,0 +1,144 @@
+import logging
+import unittest
+import threading
+from bumblebee.timeline import get_startup_timeline
+from bumblebee.engine_connection import (EngineConnection, DISCONNECTED,
+                                         CONNECTING, CONNECTED, FAILED)
+
+
+#===========================================================================
+
+class Engine(object):
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.connected = False
+
+    def connect(self):
+        if self.fail:
+            raise RuntimeError("connection refused")
+        self.connected = True
+
+    def disconnect(self):
+        self.connected = False
+
+
+#===========================================================================
+
+class TestEngineConnection(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = EngineConnection()
+        self.connection.retry_delays = (0.01, 0.02)
+        self.states = []
+        self.changed = threading.Event()
+        self.connection.add_observer(self.on_state)
+        self.logger = logging.getLogger("bumblebee.engine_connection")
+        self.logger.disabled = True
+
+    def tearDown(self):
+        self.connection.disconnect()
+        self.logger.disabled = False
+
+    def on_state(self, state):
+        self.states.append(state)
+        self.changed.set()
+
+    def wait_for(self, state, timeout=5.0):
+        while self.connection.get_state() != state:
+            self.changed.wait(timeout)
+            self.assertTrue(self.changed.isSet(), "Timed out")
+            self.changed.clear()
+
+    def test_connect(self):
+        engine = Engine()
+        connected = []
+        self.connection.when_connected(lambda: connected.append(1))
+        self.connection.connect(lambda: engine, "test")
+        self.wait_for(CONNECTED)
+        self.assertEqual(self.states, [CONNECTING, CONNECTED])
+        self.assertTrue(self.connection.get_engine() is engine)
+        self.assertTrue(engine.connected)
+        self.assertEqual(connected, [1])
+
+        # Callbacks run at once while connected.
+        self.connection.when_connected(lambda: connected.append(2))
+        self.assertEqual(connected, [1, 2])
+
+        self.connection.disconnect()
+        self.assertEqual(self.connection.get_state(), DISCONNECTED)
+        self.assertEqual(self.connection.get_engine(), None)
+        self.assertFalse(engine.connected)
+
+    def get_connection_phases(self):
+        return [name for name, offset, duration
+                in get_startup_timeline().get_events()
+                if name.startswith("Connecting to SR engine")]
+
+    def test_retry(self):
+        engines = [Engine(fail=True), None, Engine()]
+        phases = self.get_connection_phases()
+
+        def locate_engine():
+            engine = engines.pop(0)
+            if engine is None:
+                raise ImportError("engine not installed")
+            return engine
+        self.connection.connect(locate_engine, "test")
+        self.wait_for(CONNECTED)
+        self.assertEqual(self.states, [CONNECTING, FAILED, CONNECTING,
+                                       FAILED, CONNECTING, CONNECTED])
+        self.assertEqual(engines, [])
+
+        # The attempts are recorded as a single phase.
+        self.assertEqual(self.get_connection_phases(), phases +
+                         ["Connecting to SR engine (3 attempts)"])
+
+    def test_give_up(self):
+        """ Verify that the connection stops retrying after
+            max_attempts, and keeps queued callbacks waiting. """
+        self.connection.max_attempts = 2
+        self.connection.when_connected(lambda: None)
+        self.connection.connect(lambda: Engine(fail=True), "test")
+        while self.states != [CONNECTING, FAILED, CONNECTING, FAILED]:
+            self.changed.wait(5.0)
+            self.assertTrue(self.changed.isSet(), "Timed out")
+            self.changed.clear()
+
+        # No further attempt is made.
+        self.assertFalse(self.changed.wait(0.1) or self.changed.isSet())
+        self.assertEqual(self.connection.get_waiting_count(), 1)
+        self.assertTrue(self.connection.get_status_text().endswith(
+                        "gave up after 2 attempts; 1 waiting"))
+
+    def test_disconnect_while_connecting(self):
+        release = threading.Event()
+        located = threading.Event()
+
+        def locate_engine():
+            release.wait(5.0)
+            located.set()
+            return Engine()
+        self.connection.connect(locate_engine, "test")
+        self.assertEqual(self.connection.get_state(), CONNECTING)
+        self.connection.disconnect()
+        release.set()
+        located.wait(5.0)
+
+        # The attempt's result is ignored.
+        self.assertEqual(self.connection.get_state(), DISCONNECTED)
+        self.assertEqual(self.connection.get_engine(), None)
+
+    def test_status_text(self):
+        self.assertEqual(self.connection.get_status_text(),
+                         "Engine: disconnected")
+        self.connection.connect(lambda: Engine(fail=True), "test")
+        self.wait_for(FAILED)
+        self.assertTrue("connection refused" in
+                        self.connection.get_status_text())
+
+
+#===========================================================================
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import time
+import logging
+import unittest
+import threading
+import bumblebee.event_loop
+from bumblebee.event_loop import EventLoop
+
+
+#===========================================================================
+
+class TestEventLoop(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = EventLoop()
+        self.calls = []
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_loop(self, timeout=5.0):
+        # Stop the loop even if a test fails to.
+        guard = threading.Timer(timeout, self.loop.stop)
+        guard.start()
+        try:
+            self.loop.run()
+        finally:
+            guard.cancel()
+
+    def test_call_soon_order(self):
+        for index in range(5):
+            self.loop.call_soon(self.calls.append, index)
+        self.loop.call_soon(self.loop.stop)
+        self.run_loop()
+        self.assertEqual(self.calls, range(5))
+        self.assertFalse(self.loop.is_running())
+
+    def test_call_later_order(self):
+        self.loop.call_later(0.06, self.loop.stop)
+        self.loop.call_later(0.04, self.calls.append, "second")
+        self.loop.call_later(0.02, self.calls.append, "first")
+        start_time = time.time()
+        self.run_loop()
+        self.assertEqual(self.calls, ["first", "second"])
+        self.assertTrue(time.time() - start_time >= 0.05)
+
+    def test_cancel(self):
+        handle = self.loop.call_later(0.01, self.calls.append, "cancelled")
+        handle.cancel()
+        self.loop.call_later(0.02, self.loop.stop)
+        self.run_loop()
+        self.assertEqual(self.calls, [])
+
+    def test_call_from_other_thread(self):
+        def record_thread():
+            self.calls.append(threading.currentThread().getName())
+
+        def schedule():
+            time.sleep(0.05)
+            self.loop.call_soon(record_thread)
+            self.loop.call_soon(self.loop.stop)
+        thread = threading.Thread(target=schedule, name="scheduler")
+        thread.start()
+        self.run_loop()
+        thread.join()
+        self.assertEqual(self.calls, [threading.currentThread().getName()])
+
+    def test_idle_loop_does_not_wake(self):
+        select_function = bumblebee.event_loop.select.select
+        waits = []
+
+        def counting_select(*args):
+            waits.append(args[3])
+            return select_function(*args)
+        bumblebee.event_loop.select.select = counting_select
+        try:
+            thread = threading.Thread(target=self.loop.run)
+            thread.start()
+            time.sleep(0.3)
+            self.loop.call_later(0.05, self.calls.append, "woken")
+            time.sleep(0.3)
+            self.loop.stop()
+            thread.join(5.0)
+        finally:
+            bumblebee.event_loop.select.select = select_function
+        self.assertEqual(self.calls, ["woken"])
+
+        # One wait without a timeout until the callback was scheduled,
+        #  one until it was due, and one until the loop was stopped.
+        self.assertEqual(len(waits), 3)
+        self.assertEqual(waits[0], None)
+        self.assertEqual(waits[2], None)
+
+    def test_pump_messages(self):
+        """ Verify that a loop which dispatches window messages where
+            possible runs callbacks like any other. """
+        self.loop.close()
+        self.loop = EventLoop(pump_messages=True)
+        self.loop.call_later(0.01, self.calls.append, "called")
+        self.loop.call_later(0.02, self.loop.stop)
+        self.run_loop()
+        self.assertEqual(self.calls, ["called"])
+
+    def test_failing_callback(self):
+        def fail():
+            raise ValueError("callback failure")
+        logger = logging.getLogger("bumblebee.event_loop")
+        logger.disabled = True
+        try:
+            self.loop.call_soon(fail)
+            self.loop.call_soon(self.calls.append, "after")
+            self.loop.call_soon(self.loop.stop)
+            self.run_loop()
+        finally:
+            logger.disabled = False
+        self.assertEqual(self.calls, ["after"])
+
+
+#===========================================================================
+
+if __name__ == "__main__":
+    unittest.main()
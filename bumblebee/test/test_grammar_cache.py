@@ -0,0 +1,212 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from bumblebee.command.grammar_cache import (GrammarCache, get_grammar_key,
+                                             patch_compiler, unpatch_compiler)
+
+
+#===========================================================================
+# Stand-ins for Dragonfly's grammar objects.
+
+class Literal(object):
+    def __init__(self, words):
+        self.words = words
+        self.children = ()
+
+
+class Sequence(object):
+    def __init__(self, *children):
+        self.children = children
+
+
+class Reference(object):
+    def __init__(self, rule):
+        self.rule = rule
+        self.children = ()
+
+    def gstring(self):
+        return "<{0}>".format(self.rule.name)
+
+
+class Rule(object):
+    def __init__(self, name, element, exported=True):
+        self.name = name
+        self.element = element
+        self.exported = exported
+
+
+class List(object):
+    def __init__(self, name):
+        self.name = name
+
+
+class Grammar(object):
+    def __init__(self, rules, lists=()):
+        self.rules = rules
+        self.lists = lists
+
+
+def build_grammar(word="world", exported=True):
+    number = Rule("number", Literal(["one"]), exported=False)
+    rule = Rule("hello", Sequence(Literal(["hello", word]),
+                                  Reference(number)), exported)
+    return Grammar([rule], [List("names")])
+
+
+class Unpicklable(object):
+    def __reduce__(self):
+        raise TypeError("not picklable")
+
+
+class Compiler(object):
+    def __init__(self):
+        self.compiled = 0
+
+    def compile_grammar(self, grammar):
+        self.compiled += 1
+        return ("compiled", len(grammar.rules))
+
+
+#===========================================================================
+
+class TestGrammarKey(unittest.TestCase):
+
+    def test_stable(self):
+        self.assertEqual(get_grammar_key(build_grammar()),
+                         get_grammar_key(build_grammar()))
+
+    def test_structure_changes(self):
+        key = get_grammar_key(build_grammar())
+        self.assertNotEqual(key, get_grammar_key(build_grammar("there")))
+        self.assertNotEqual(key, get_grammar_key(build_grammar(
+                                                        exported=False)))
+        grammar = build_grammar()
+        grammar.lists = ()
+        self.assertNotEqual(key, get_grammar_key(grammar))
+
+    def test_referenced_rules(self):
+        grammar = build_grammar()
+        key = get_grammar_key(grammar)
+        grammar.rules[0].element.children[1].rule.element.words = ["two"]
+        self.assertNotEqual(key, get_grammar_key(grammar))
+
+    def test_namespace(self):
+        self.assertNotEqual(get_grammar_key(build_grammar(), "a"),
+                            get_grammar_key(build_grammar(), "b"))
+
+
+#===========================================================================
+
+class TestGrammarCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = os.path.join(tempfile.mkdtemp(), "grammars")
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.directory))
+
+    def test_memory_and_disk_hits(self):
+        compiled = []
+
+        def compile_function():
+            compiled.append(True)
+            return ("compiled", ["hello"])
+
+        cache = GrammarCache(self.directory)
+        for i in range(2):
+            self.assertEqual(cache.compile(build_grammar(), compile_function),
+                             ("compiled", ["hello"]))
+        self.assertEqual(len(compiled), 1)
+        self.assertEqual(cache.get_statistics(), (1, 0, 1))
+        self.assertEqual(cache.get_hit_rate(), 0.5)
+
+        # A new cache, as after a restart, reads the entry from disk.
+        cache = GrammarCache(self.directory)
+        cache.compile(build_grammar(), compile_function)
+        self.assertEqual(len(compiled), 1)
+        self.assertEqual(cache.get_statistics(), (0, 1, 0))
+
+        cache.reset_statistics()
+        self.assertEqual(cache.get_statistics(), (0, 0, 0))
+        self.assertEqual(cache.get_hit_rate(), None)
+
+    def test_unpicklable_values(self):
+        value = Unpicklable()
+        cache = GrammarCache(self.directory)
+        cache.put("key", value)
+        self.assertEqual(cache.get("key"), (True, value))
+        self.assertEqual(GrammarCache(self.directory).get("key"),
+                         (False, None))
+
+    def test_memory_limit(self):
+        cache = GrammarCache(max_memory_entries=2)
+        for key in ("a", "b", "c"):
+            cache.put(key, key)
+        self.assertEqual(cache.get("a"), (False, None))
+        self.assertEqual(cache.get("c"), (True, "c"))
+
+    def test_invalid_entry(self):
+        cache = GrammarCache(self.directory)
+        cache.put("key", "value")
+        entry_file = open(os.path.join(self.directory, "key.bgc"), "wb")
+        entry_file.write("garbage")
+        entry_file.close()
+        self.assertEqual(GrammarCache(self.directory).get("key"),
+                         (False, None))
+
+    def test_prune(self):
+        cache = GrammarCache(self.directory, max_age=1)
+        cache.put("old", "value")
+        cache.put("new", "value")
+        old_time = time.time() - 2 * 24 * 60 * 60
+        os.utime(os.path.join(self.directory, "old.bgc"),
+                 (old_time, old_time))
+        self.assertEqual(cache.prune(), 1)
+        self.assertEqual(sorted(os.listdir(self.directory)), ["new.bgc"])
+
+    def test_threads(self):
+        cache = GrammarCache(self.directory)
+
+        def compile_grammars():
+            for i in range(20):
+                cache.compile(build_grammar(str(i % 5)), lambda: i)
+        threads = [threading.Thread(target=compile_grammars)
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        memory_hits, disk_hits, misses = cache.get_statistics()
+        self.assertEqual(memory_hits + disk_hits + misses, 80)
+        self.assertEqual(len(os.listdir(self.directory)), 5)
+
+
+#===========================================================================
+
+class TestPatchCompiler(unittest.TestCase):
+
+    def test_patch_and_unpatch(self):
+        original = Compiler.compile_grammar.im_func
+        cache = GrammarCache()
+        patch_compiler(Compiler, cache)
+        try:
+            # Patching twice does not wrap the patched method.
+            patch_compiler(Compiler, cache)
+            compiler = Compiler()
+            for i in range(3):
+                self.assertEqual(compiler.compile_grammar(build_grammar()),
+                                 ("compiled", 1))
+            self.assertEqual(compiler.compiled, 1)
+            self.assertEqual(cache.get_statistics(), (2, 0, 1))
+        finally:
+            unpatch_compiler(Compiler)
+        self.assertTrue(Compiler.compile_grammar.im_func is original)
+
+
+#===========================================================================
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import logging
+import unittest
+from bumblebee.command.leak_check import (ModuleNamespace, LeakChecker,
+                                          describe_referrers)
+
+
+#===========================================================================
+
+class Holder(object):
+
+    def __init__(self, value):
+        self.value = value
+
+
+class RecordingHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+#===========================================================================
+
+class TestLeakChecker(unittest.TestCase):
+
+    def setUp(self):
+        self.handler = RecordingHandler()
+        self.log = logging.getLogger("bumblebee.command.leak_check")
+        self.log.addHandler(self.handler)
+
+        # The test suite only logs errors; leaks are logged as warnings.
+        self._old_level = self.log.level
+        self.log.setLevel(logging.WARNING)
+        self._old_propagate = self.log.propagate
+        self.log.propagate = False
+
+    def tearDown(self):
+        self.log.propagate = self._old_propagate
+        self.log.setLevel(self._old_level)
+        self.log.removeHandler(self.handler)
+
+    def test_freed_namespace(self):
+        """ Verify that freed objects, even in cycles, are not leaks. """
+        checker = LeakChecker()
+        namespace = ModuleNamespace()
+        exec "def function(): pass" in namespace
+        checker.watch(namespace, "namespace")
+        del namespace
+        self.assertEqual(checker.check(), [])
+        self.assertFalse(checker.has_watched())
+
+    def test_retained_namespace(self):
+        """ Verify that retained objects are reported with referrers. """
+        checker = LeakChecker()
+        namespace = ModuleNamespace()
+        exec "def function(): pass" in namespace
+        holder = Holder(namespace["function"])
+        checker.watch(namespace, "namespace")
+        del namespace
+        self.assertEqual(checker.check(), ["namespace"])
+        self.assertEqual(len(self.handler.messages), 1)
+        self.assertTrue("function: <function function" in
+                        self.handler.messages[0])
+
+    def test_describe_owner(self):
+        """ Verify that instance dicts are described by their owner. """
+        value = Holder(None)
+        holder = Holder(value)
+        descriptions = describe_referrers(value)
+        self.assertEqual(len(descriptions), 1)
+        self.assertTrue(descriptions[0].startswith("Holder: "))
@@ -0,0 +1,404 @@
+import os
+import os.path
+import shutil
+import logging
+import tempfile
+import unittest
+import threading
+from pyutilib.component.core import Plugin, implements
+from bumblebee.command.interfaces import ICommandSetObserver
+from bumblebee.command.pipeline import (LoadPipeline,
+                                        set_main_thread_dispatcher,
+                                        set_load_gate)
+from bumblebee.command.registry import get_command_set_registry
+from bumblebee.command.legacy_loader import (LegacyDirectoryLoader,
+                                             _DirectorySnapshot)
+
+
+#===========================================================================
+
+# Command modules written by these tests record their loading and
+#  unloading here.
+events = []
+
+# Command modules written by these tests may leak objects here.
+retained = []
+
+module_template = """
+from bumblebee.test.test_legacy_loader import events
+events.append(("load", __file__))
+def unload():
+    events.append(("unload", __file__))
+"""
+
+
+class RecordingObserver(Plugin):
+
+    implements(ICommandSetObserver)
+
+    def __init__(self):
+        self.changes = []
+
+    def command_sets_changed(self, added, removed):
+        self.changes.append((added, removed))
+
+
+#===========================================================================
+
+class TestLegacyDirectoryLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.loader = LegacyDirectoryLoader()
+        self.loader.__init__()
+        self.loader.directories = self.directory
+        self.loader.bytecode_cache = False
+        self.loader.lazy = False
+        self.loader.profile_memory = False
+        self.loader.check_leaks = False
+        self._old_resolution = _DirectorySnapshot.mtime_resolution
+        _DirectorySnapshot.mtime_resolution = -1.0
+        # Keep the errors these tests provoke out of the test output.
+        self.log_records = []
+        self._handler = logging.Handler()
+        self._handler.emit = self.log_records.append
+        self._logger = logging.getLogger("bumblebee.command")
+        self._logger.addHandler(self._handler)
+        self._old_propagate = self._logger.propagate
+        self._logger.propagate = False
+        del events[:]
+
+    def tearDown(self):
+        self._logger.propagate = self._old_propagate
+        self._logger.removeHandler(self._handler)
+        _DirectorySnapshot.mtime_resolution = self._old_resolution
+        self.loader.directories = ""
+        self.loader.update()
+        shutil.rmtree(self.directory)
+
+    def _write_module(self, filename, source=module_template):
+        path = os.path.join(self.directory, filename)
+        f = open(path, "w")
+        f.write(source)
+        f.close()
+        return path
+
+    def _touch_directory(self, offset):
+        stat = os.stat(self.directory)
+        os.utime(self.directory, (stat.st_atime, stat.st_mtime + offset))
+
+    def test_add_and_remove(self):
+        """ Verify that added and removed modules are (un)loaded. """
+        path_a = self._write_module("a.py")
+        self._write_module("ignored.txt")
+        self.loader.update()
+        self.assertEqual(events, [("load", path_a)])
+
+        path_b = self._write_module("b.py")
+        os.remove(path_a)
+        self._touch_directory(1)
+        del events[:]
+        self.loader.update()
+        self.assertEqual(sorted(events),
+                         [("load", path_b), ("unload", path_a)])
+
+        # The registry has been kept up to date.
+        registry = get_command_set_registry()
+        self.assertEqual(registry.find_by_path(path_a), None)
+        self.assertTrue(registry.find_by_path(path_b) is
+                        self.loader._modules[path_b])
+
+    def test_batched_notifications(self):
+        """ Verify that observers receive one delta per update. """
+        observer = RecordingObserver()
+        observer.activate()
+        try:
+            for name in ("a.py", "b.py", "c.py"):
+                self._write_module(name)
+            self.loader.update()
+            self.assertEqual(len(observer.changes), 1)
+            added, removed = observer.changes[0]
+            self.assertEqual(len(added), 3)
+            self.assertEqual(removed, ())
+
+            # A reload is reported as removal of the old command set
+            #  and addition of the new one.
+            path = self._write_module("b.py", module_template + "\n\n")
+            stat = os.stat(path)
+            os.utime(path, (stat.st_atime, stat.st_mtime + 1))
+            self.loader.update()
+            self.assertEqual(len(observer.changes), 2)
+            added, removed = observer.changes[1]
+            self.assertEqual(len(added), 1)
+            self.assertEqual(len(removed), 1)
+            self.assertFalse(added[0] is removed[0])
+        finally:
+            observer.deactivate()
+
+    def test_reload_modified(self):
+        """ Verify that only modified modules are reloaded. """
+        path_a = self._write_module("a.py")
+        path_b = self._write_module("b.py")
+        self.loader.update()
+        del events[:]
+
+        # Touching a module without changing it doesn't reload it.
+        stat = os.stat(path_a)
+        os.utime(path_a, (stat.st_atime, stat.st_mtime + 1))
+        self.loader.update()
+        self.assertEqual(events, [])
+
+        # Changing a module reloads only that module.
+        self._write_module("a.py", module_template + "\nx = 1\n")
+        os.utime(path_a, (stat.st_atime, stat.st_mtime + 2))
+        self.loader.update()
+        self.assertEqual(events, [("unload", path_a), ("load", path_a)])
+
+    def test_reload_after_failed_load(self):
+        """ Verify that a module which failed to load is retried once
+            it has been fixed. """
+        path = self._write_module("a.py", "raise Exception('broken')\n")
+        self.loader.update()
+        self.assertEqual(events, [])
+
+        stat = os.stat(path)
+        self._write_module("a.py")
+        os.utime(path, (stat.st_atime, stat.st_mtime + 1))
+        self.loader.update()
+        self.assertEqual(events, [("load", path)])
+
+    def test_lazy_loading(self):
+        """ Verify that context-specific modules are loaded when their
+            context becomes active. """
+        self.loader.lazy = True
+        global_path = self._write_module("_global.py")
+        notepad_path = self._write_module("notepad_editing.py")
+        title_path = self._write_module("titled.py", "# bumblebee.executable:"
+                                        "\n# bumblebee.title: ^Inbox"
+                                        "\n" + module_template)
+        self.loader.update()
+        self.assertEqual(events, [("load", global_path)])
+
+        del events[:]
+        self.loader.context_changed(r"C:\Windows\NOTEPAD.EXE", "Untitled")
+        self.assertEqual(events, [("load", notepad_path)])
+
+        del events[:]
+        self.loader.context_changed(r"C:\Mail\mail.exe", "Inbox - Mail")
+        self.assertEqual(events, [("load", title_path)])
+
+        # Activated modules stay loaded.
+        del events[:]
+        self.loader.context_changed(r"C:\Windows\explorer.exe", "")
+        self.assertEqual(events, [])
+
+    def test_lazy_loading_switched_off(self):
+        """ Verify that deferred modules are loaded if lazy loading is
+            switched off. """
+        self.loader.lazy = True
+        path = self._write_module("notepad.py")
+        self.loader.update()
+        self.assertEqual(events, [])
+        self.loader.lazy = False
+        self.loader.update()
+        self.assertEqual(events, [("load", path)])
+
+    def test_deferred_manifest_changed(self):
+        """ Verify that a deferred module is loaded once its manifest
+            is changed to match the current context, and that removing
+            a deferred module notifies nobody. """
+        self.loader.lazy = True
+        observer = RecordingObserver()
+        observer.activate()
+        try:
+            path = self._write_module("notepad.py")
+            removed_path = self._write_module("word.py")
+            self.loader.update()
+            self.assertEqual(events, [])
+
+            stat = os.stat(path)
+            self._write_module("notepad.py", "# bumblebee.executable:\n" +
+                               module_template)
+            os.utime(path, (stat.st_atime, stat.st_mtime + 1))
+            os.remove(removed_path)
+            self._touch_directory(1)
+            self.loader.update()
+            self.assertEqual(events, [("load", path)])
+            self.assertEqual([[len(added), len(removed)] for added, removed
+                              in observer.changes], [[1, 0]])
+        finally:
+            observer.deactivate()
+
+    def test_unchanged_directory_not_rescanned(self):
+        """ Verify that an unchanged directory is not listed again. """
+        self._write_module("a.py")
+        self.loader.update()
+
+        scanned = []
+        original = self.loader._get_valid_paths
+
+        def get_valid_paths(directory):
+            scanned.append(directory)
+            return original(directory)
+        self.loader._get_valid_paths = get_valid_paths
+        try:
+            self.loader.update()
+            self.assertEqual(scanned, [])
+
+            self._touch_directory(1)
+            self.loader.update()
+            self.assertEqual(scanned, [os.path.abspath(self.directory)])
+        finally:
+            del self.loader._get_valid_paths
+
+    def test_load_profile(self):
+        """ Verify that load times and retained memory are measured. """
+        path = self._write_module("a.py")
+        self.loader.update()
+        profile = self.loader._modules[path].get_load_profile()
+        self.assertTrue(profile.load_time >= 0)
+        self.assertEqual(profile.grammar_count, 0)
+        self.assertEqual(profile.memory, None)
+
+        self.loader.profile_memory = True
+        self._write_module("a.py", module_template +
+                           "data = [str(i) * 100 for i in range(2000)]\n")
+        self.loader.update()
+        profile = self.loader._modules[path].get_load_profile()
+        self.assertTrue(profile.memory > 2000 * 100, profile.memory)
+
+    def test_leak_check(self):
+        """ Verify that namespaces retained after unloading are
+            detected. """
+        self.loader.check_leaks = True
+        path = self._write_module("a.py", module_template +
+                                  "from bumblebee.test.test_legacy_loader"
+                                  " import retained\n"
+                                  "def callback(): pass\n"
+                                  "retained.append(callback)\n")
+        self.loader.update()
+        checked = []
+        check = self.loader._leak_checker.check
+        self.loader._leak_checker.check = lambda: checked.append(check())
+
+        os.remove(path)
+        self.loader.update()
+        self.assertEqual(checked, [["namespace of a.py"]])
+
+        del retained[:]
+        self._write_module("b.py")
+        self.loader.update()
+        os.remove(os.path.join(self.directory, "b.py"))
+        self.loader.update()
+        self.assertEqual(checked, [["namespace of a.py"], []])
+
+    def test_leak_check_disabled(self):
+        """ Verify that nothing is checked with check_leaks off. """
+        self.loader.check_leaks = False
+        path = self._write_module("a.py")
+        self.loader.update()
+        os.remove(path)
+        self.loader.update()
+        self.assertFalse(self.loader._leak_checker.has_watched())
+
+    def test_recent_snapshot_not_trusted(self):
+        """ Verify that a snapshot taken right after a change is not
+            trusted. """
+        snapshot = _DirectorySnapshot(100.0, frozenset(), 101.0)
+        _DirectorySnapshot.mtime_resolution = 2.0
+        self.assertFalse(snapshot.is_fresh(100.0))
+        snapshot = _DirectorySnapshot(100.0, frozenset(), 103.0)
+        self.assertTrue(snapshot.is_fresh(100.0))
+        self.assertFalse(snapshot.is_fresh(100.5))
+
+    def test_load_gate(self):
+        """ Verify that modules wait for the load gate to open. """
+        waiting = []
+        set_load_gate(waiting.append)
+        try:
+            path = self._write_module("a.py")
+            self.loader.update()
+            self.assertEqual(events, [])
+            self.assertEqual(len(waiting), 1)
+
+            # Modules which are still waiting are not submitted again.
+            self.loader.update()
+            self.assertEqual(len(waiting), 1)
+        finally:
+            set_load_gate(None)
+
+        waiting[0]()
+        self.assertEqual(events, [("load", path)])
+
+    def test_modified_while_waiting(self):
+        """ Verify that a module edited while waiting for the load gate
+            is reloaded once it has been loaded. """
+        waiting = []
+        set_load_gate(waiting.append)
+        try:
+            path = self._write_module("a.py")
+            self.loader.update()
+            self.assertEqual(len(waiting), 1)
+
+            edited = module_template + "events.append(('edited', __file__))\n"
+            self._write_module("a.py", edited)
+            self.loader.update()
+            self.assertEqual(len(waiting), 1)
+
+            # The old source is loaded, and the edit is resubmitted.
+            waiting[0]()
+            self.assertEqual(events, [("load", path)])
+            self.assertEqual(len(waiting), 2)
+            waiting[1]()
+        finally:
+            set_load_gate(None)
+
+        self.assertEqual(events, [("load", path), ("unload", path),
+                                  ("load", path), ("edited", path)])
+
+
+#---------------------------------------------------------------------------
+
+class TestLoadPipeline(unittest.TestCase):
+
+    def tearDown(self):
+        set_main_thread_dispatcher(None)
+
+    def test_synchronous_without_dispatcher(self):
+        """ Verify that results are delivered before submit() returns
+            if no dispatcher is set. """
+        pipeline = LoadPipeline(lambda item: item * 2, concurrency=2)
+        results = []
+        pipeline.submit(range(10), results.extend)
+        self.assertEqual(sorted(results), [(i, i * 2) for i in range(10)])
+
+    def test_dispatched_to_main_thread(self):
+        """ Verify that results are handed to the dispatcher once all
+            items are done. """
+        dispatched = []
+        done = threading.Event()
+
+        def dispatcher(func, *args):
+            dispatched.append((func, args))
+            done.set()
+        set_main_thread_dispatcher(dispatcher)
+
+        pipeline = LoadPipeline(lambda item: item + 1, concurrency=3)
+        results = []
+        pipeline.submit(range(20), results.extend)
+        done.wait(5.0)
+        self.assertEqual(len(dispatched), 1)
+        self.assertEqual(results, [])
+
+        func, args = dispatched[0]
+        func(*args)
+        self.assertEqual(sorted(results), [(i, i + 1) for i in range(20)])
+
+    def test_concurrency_change(self):
+        """ Verify that the worker count can be changed. """
+        pipeline = LoadPipeline(lambda item: item, concurrency=2)
+        pipeline.set_concurrency(0)
+        self.assertEqual(pipeline.get_concurrency(), 0)
+        results = []
+        pipeline.submit([1, 2], results.extend)
+        self.assertEqual(sorted(results), [(1, 1), (2, 2)])
@@ -0,0 +1,48 @@
+import logging
+import unittest
+from bumblebee.gui.log_buffer import LogRecordBuffer, make_entry
+
+
+#===========================================================================
+
+class TestLogRecordBuffer(unittest.TestCase):
+
+    def test_append_within_capacity(self):
+        """ Verify that entries are kept in order below capacity. """
+        buffer = LogRecordBuffer(5)
+        for index in range(3):
+            self.assertFalse(buffer.append(index))
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(list(buffer), [0, 1, 2])
+        self.assertEqual(buffer[-1], 2)
+
+    def test_eviction(self):
+        """ Verify that the oldest entries are evicted when full. """
+        buffer = LogRecordBuffer(3)
+        evicted = [buffer.append(index) for index in range(7)]
+        self.assertEqual(evicted, [False] * 3 + [True] * 4)
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(list(buffer), [4, 5, 6])
+        self.assertEqual(buffer[0], 4)
+        self.assertEqual(buffer.appended, 7)
+        self.assertRaises(IndexError, buffer.__getitem__, 3)
+
+    def test_set_capacity(self):
+        """ Verify that changing capacity keeps the newest entries. """
+        buffer = LogRecordBuffer(4)
+        for index in range(6):
+            buffer.append(index)
+        buffer.set_capacity(2)
+        self.assertEqual(list(buffer), [4, 5])
+        buffer.set_capacity(3)
+        buffer.append(6)
+        buffer.append(7)
+        self.assertEqual(list(buffer), [5, 6, 7])
+        self.assertRaises(ValueError, buffer.set_capacity, 0)
+
+    def test_make_entry(self):
+        """ Verify that entries don't reference their record. """
+        record = logging.LogRecord("name", logging.INFO, "path", 1,
+                                   "value %d", (5,), None)
+        entry = make_entry(record)
+        self.assertEqual(entry, (record.created, "INFO", "name", "value 5"))
@@ -0,0 +1,77 @@
+import csv
+import json
+import unittest
+from StringIO import StringIO
+from bumblebee.gui.log_buffer import LogRecordBuffer
+from bumblebee.gui.log_export import export_entries
+
+
+#===========================================================================
+
+class TestLogExport(unittest.TestCase):
+
+    def setUp(self):
+        self.records = LogRecordBuffer(100)
+        for index in range(25):
+            self.records.append((1000000000.0 + index, "INFO", "test",
+                                 "message {0}".format(index)))
+
+    def test_csv(self):
+        """ Verify that entries are exported as CSV rows. """
+        output = StringIO()
+        progress = []
+        result = export_entries(self.records, output, "csv", chunk_size=10,
+                                progress=lambda done, total:
+                                    progress.append((done, total)))
+        self.assertEqual(result, (25, 0))
+        self.assertEqual(progress, [(10, 25), (20, 25), (25, 25)])
+        output.seek(0)
+        rows = list(csv.reader(output))
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(rows[3][1:], ["INFO", "test", "message 3"])
+
+    def test_ndjson(self):
+        """ Verify that entries are exported as JSON lines. """
+        output = StringIO()
+        export_entries(self.records, output, "ndjson", chunk_size=7)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 25)
+        data = json.loads(lines[-1])
+        self.assertEqual(data["message"], "message 24")
+        self.assertEqual(data["level"], "INFO")
+
+    def test_ndjson_non_utf8_message(self):
+        """ Verify that byte strings which are not UTF-8 are exported. """
+        records = LogRecordBuffer(10)
+        records.append((0.0, "INFO", "stdout", "caf\xe9"))
+        records.append((0.0, "INFO", "test", u"caf\xe9"))
+        output = StringIO()
+        self.assertEqual(export_entries(records, output, "ndjson"), (2, 0))
+        lines = output.getvalue().splitlines()
+        self.assertEqual(json.loads(lines[0])["message"], u"caf\ufffd")
+        self.assertEqual(json.loads(lines[1])["message"], u"caf\xe9")
+
+    def test_entries_evicted_during_export(self):
+        """ Verify that evicted entries are skipped and counted. """
+        records = LogRecordBuffer(10)
+        for index in range(10):
+            records.append((0.0, "INFO", "test", str(index)))
+
+        def progress(done, total):
+            # Simulate a burst of logging while the export runs.
+            for index in range(5):
+                records.append((0.0, "INFO", "test", "new"))
+
+        output = StringIO()
+        written, skipped = export_entries(records, output, "ndjson",
+                                          chunk_size=3, progress=progress)
+        self.assertEqual(written + skipped, 10)
+        self.assertTrue(skipped > 0)
+        self.assertFalse("new" in output.getvalue())
+
+    def test_cancel(self):
+        """ Verify that an export can be canceled. """
+        output = StringIO()
+        result = export_entries(self.records, output, "csv", chunk_size=10,
+                                cancelled=lambda: True)
+        self.assertEqual(result, (0, 0))
@@ -0,0 +1,168 @@
+import os
+import os.path
+import gzip
+import shutil
+import logging
+import tempfile
+import threading
+import unittest
+from bumblebee.log_handlers import (AsyncLogHandler, RotatingLogFileHandler,
+                                    StreamLogger)
+
+
+#===========================================================================
+
+class RecordingHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+        self.released = threading.Event()
+        self.released.set()
+
+    def emit(self, record):
+        self.released.wait()
+        self.messages.append(self.format(record))
+
+
+def make_record(message, *args):
+    return logging.LogRecord("test", logging.INFO, __file__, 0,
+                             message, args, None)
+
+
+#===========================================================================
+
+class TestAsyncLogHandler(unittest.TestCase):
+
+    def test_delivery(self):
+        """ Verify that records are passed on in order. """
+        target = RecordingHandler()
+        handler = AsyncLogHandler(target)
+        for index in range(100):
+            handler.handle(make_record("message %d", index))
+        handler.flush()
+        self.assertEqual(target.messages,
+                         ["message %d" % index for index in range(100)])
+        handler.close()
+
+    def test_arguments_merged_on_emit(self):
+        """ Verify that message arguments are merged when logging. """
+        target = RecordingHandler()
+        target.released.clear()
+        handler = AsyncLogHandler(target)
+        value = ["before"]
+        handler.handle(make_record("value %s", value))
+        value[0] = "after"
+        target.released.set()
+        handler.close()
+        self.assertEqual(target.messages, ["value ['before']"])
+
+    def test_full_queue(self):
+        """ Verify that records are dropped, not blocked, when full. """
+        target = RecordingHandler()
+        target.released.clear()
+        handler = AsyncLogHandler(target, max_queued=5)
+        for index in range(20):
+            handler.handle(make_record("message"))
+        self.assertTrue(handler.dropped > 0)
+        target.released.set()
+        handler.close()
+        self.assertTrue(target.messages[-1].startswith("Log queue full"))
+
+
+#===========================================================================
+
+class TestRotatingLogFileHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "test-log.txt")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _log(self, handler, count):
+        for index in range(count):
+            handler.handle(make_record("message %04d", index))
+
+    def test_size_rotation(self):
+        """ Verify that the file is rotated and compressed by size. """
+        handler = RotatingLogFileHandler(self.path, max_bytes=100,
+                                         interval=0, backup_count=2)
+        self._log(handler, 40)
+        handler.close()
+
+        self.assertTrue(os.path.getsize(self.path) <= 100 + 20)
+        self.assertTrue(os.path.exists(handler.get_backup_path(1)))
+        self.assertTrue(os.path.exists(handler.get_backup_path(2)))
+        self.assertFalse(os.path.exists(handler.get_backup_path(3)))
+        backup = gzip.open(handler.get_backup_path(1), "rb")
+        try:
+            self.assertTrue(backup.read().startswith("message"))
+        finally:
+            backup.close()
+
+    def test_time_rotation(self):
+        """ Verify that the file is rotated once its interval passes. """
+        handler = RotatingLogFileHandler(self.path, max_bytes=0,
+                                         interval=3600, compress=False)
+        self._log(handler, 3)
+        self.assertFalse(os.path.exists(handler.get_backup_path(1)))
+        handler._rollover_time = 0
+        self._log(handler, 1)
+        handler.close()
+
+        backup = open(handler.get_backup_path(1))
+        try:
+            self.assertEqual(len(backup.readlines()), 3)
+        finally:
+            backup.close()
+        self.assertEqual(open(self.path).read(), "message 0000\n")
+
+
+#===========================================================================
+
+class TestStreamLogger(unittest.TestCase):
+
+    def setUp(self):
+        self.blocks = []
+        self.stream = StreamLogger(self.blocks.append, max_line_length=20,
+                                   repeat_limit=2)
+
+    def test_partial_lines(self):
+        """ Verify that partial lines are buffered until complete. """
+        self.stream.write("first")
+        self.stream.write(" line")
+        self.assertEqual(self.blocks, [])
+        self.stream.write("\nsecond\nthird\npartial")
+        self.assertEqual(self.blocks, ["first line\nsecond\nthird"])
+        self.stream.write("\n")
+        self.assertEqual(self.blocks[-1], "partial")
+
+    def test_long_lines(self):
+        """ Verify that long lines are truncated. """
+        self.stream.write("x" * 30 + "\n")
+        for index in range(10):
+            self.stream.write("y" * 5)
+        self.stream.write("\n")
+        self.assertEqual(self.blocks,
+                         ["x" * 20 + "... [10 characters truncated]",
+                          "y" * 20 + "... [30 characters truncated]"])
+
+    def test_repeated_lines(self):
+        """ Verify that repeated identical lines are rate-limited. """
+        for index in range(5):
+            self.stream.write("same")
+            self.stream.write("\n")
+        self.stream.write("other\n")
+        self.assertEqual(self.blocks,
+                         ["same", "same",
+                          "[Previous line repeated 3 more times]\nother"])
+
+    def test_flush_reports_repeats(self):
+        """ Verify that flushing reports suppressed repetitions. """
+        self.stream.write("same\n" * 4)
+        self.stream.flush()
+        self.assertEqual(self.blocks,
+                         ["same\nsame",
+                          "[Previous line repeated 2 more times]"])
@@ -0,0 +1,117 @@
+import logging
+import unittest
+from bumblebee.log_handlers import (OFF, register_sink, unregister_sink,
+                                    set_sink_enabled, parse_levels,
+                                    configure_levels)
+from bumblebee.system.log_levels import LogLevelParticipant
+
+
+#===========================================================================
+
+class CountingHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+#===========================================================================
+
+class TestLogLevels(unittest.TestCase):
+
+    def setUp(self):
+        self.root = logging.getLogger("")
+        self._old_root_level = self.root.level
+        # Lowering the root level below the test run's ERROR would
+        #  otherwise let the test run's stderr handler print records.
+        self._old_handler_levels = [(handler, handler.level)
+                                    for handler in self.root.handlers]
+        for handler, level in self._old_handler_levels:
+            handler.setLevel(max(level, self._old_root_level))
+        self.file = CountingHandler()
+        self.view = CountingHandler()
+        register_sink("file", self.file)
+        register_sink("view", self.view)
+        self.log = logging.getLogger("test_log_levels.child")
+
+    def tearDown(self):
+        configure_levels({}, {})
+        unregister_sink("file")
+        unregister_sink("view")
+        self.root.setLevel(self._old_root_level)
+        for handler, level in self._old_handler_levels:
+            handler.setLevel(level)
+
+    def test_parse_levels(self):
+        """ Verify parsing of level configuration lines. """
+        levels = parse_levels("""
+            # Comment
+            engine:         INFO
+            grammar.decode = warning
+            custom:         15
+            broken
+            invalid:        LOUD
+            """)
+        self.assertEqual(levels, {"engine": logging.INFO,
+                                  "grammar.decode": logging.WARNING,
+                                  "custom": 15})
+
+    def test_sink_levels(self):
+        """ Verify that loggers never go below the lowest sink level. """
+        configure_levels({"test_log_levels": logging.DEBUG},
+                         {"file": logging.INFO, "view": logging.WARNING})
+        self.assertEqual(self.file.level, logging.INFO)
+        self.assertEqual(self.view.level, logging.WARNING)
+        self.assertEqual(self.root.level, logging.INFO)
+        self.assertFalse(self.log.isEnabledFor(logging.DEBUG))
+        self.assertTrue(self.log.isEnabledFor(logging.INFO))
+
+    def test_disabled_sink(self):
+        """ Verify that disabled sinks are skipped entirely. """
+        set_sink_enabled("view", False)
+        configure_levels({}, {"file": logging.WARNING,
+                              "view": logging.DEBUG})
+        self.assertEqual(self.view.level, OFF)
+        self.assertFalse(self.log.isEnabledFor(logging.INFO))
+
+        configure_levels({}, {"file": OFF, "view": OFF})
+        self.assertFalse(self.log.isEnabledFor(logging.CRITICAL))
+
+    def test_sink_enabled_after_configure(self):
+        """ Verify that enabling or disabling a sink takes effect at
+            once. """
+        configure_levels({}, {"file": logging.WARNING,
+                              "view": logging.DEBUG})
+        self.assertTrue(self.log.isEnabledFor(logging.DEBUG))
+
+        set_sink_enabled("view", False)
+        self.assertEqual(self.view.level, OFF)
+        self.assertFalse(self.log.isEnabledFor(logging.INFO))
+
+        set_sink_enabled("view", True)
+        self.assertEqual(self.view.level, logging.DEBUG)
+        self.assertTrue(self.log.isEnabledFor(logging.DEBUG))
+
+    def test_removed_logger_levels_reset(self):
+        """ Verify that loggers dropped from the config are reset. """
+        configure_levels({"test_log_levels.child": logging.ERROR}, {})
+        self.assertEqual(self.log.level, logging.ERROR)
+        configure_levels({}, {})
+        self.assertEqual(self.log.level, logging.NOTSET)
+
+    def test_participant(self):
+        """ Verify that the participant applies config changes. """
+        participant = LogLevelParticipant()
+        participant.__init__()
+        participant.levels = "test_log_levels.child: ERROR"
+        participant.sinks = "file: INFO\nview: OFF"
+        participant.startup()
+        self.assertEqual(self.log.level, logging.ERROR)
+        self.assertEqual(self.view.level, OFF)
+
+        participant.sinks = "file: DEBUG\nview: DEBUG"
+        participant.config_changed()
+        self.assertEqual(self.view.level, logging.DEBUG)
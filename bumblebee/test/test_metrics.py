@@ -0,0 +1,127 @@
+import gc
+import csv
+import weakref
+import unittest
+from StringIO import StringIO
+from bumblebee.metrics import Histogram, LatencyMetrics, export_metrics
+from bumblebee.system.recognition_metrics import (
+                                            RecognitionMetricsParticipant)
+
+
+#===========================================================================
+
+class TestHistogram(unittest.TestCase):
+
+    def test_empty(self):
+        histogram = Histogram()
+        self.assertEqual(histogram.get_mean(), None)
+        self.assertEqual(histogram.get_percentile(50), None)
+
+    def test_percentiles(self):
+        """ Verify that percentiles are accurate to within a bucket. """
+        histogram = Histogram()
+        for index in range(1, 101):
+            histogram.record(index / 1000.0)
+        self.assertEqual(histogram.count, 100)
+        self.assertAlmostEqual(histogram.get_mean(), 0.0505)
+        for percentile in (50, 90, 99):
+            expected = percentile / 1000.0
+            estimate = histogram.get_percentile(percentile)
+            self.assertTrue(expected <= estimate <= expected * 1.42,
+                            (percentile, estimate))
+        self.assertEqual(histogram.get_percentile(100), 0.1)
+
+    def test_out_of_range(self):
+        """ Verify that values beyond the buckets are counted. """
+        histogram = Histogram()
+        histogram.record(0.0)
+        histogram.record(1000.0)
+        self.assertEqual(histogram.get_percentile(100), 1000.0)
+        self.assertTrue(histogram.get_percentile(1) <= Histogram.bounds[0])
+
+
+#===========================================================================
+
+class Rule(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.processed = []
+
+    def process_recognition(self, node):
+        self.processed.append(node)
+
+
+class Grammar(object):
+
+    def __init__(self, name, rules):
+        self.name = name
+        self.rules = rules
+
+
+class CommandSet(object):
+
+    def __init__(self, grammars):
+        self._grammars = grammars
+
+    def get_grammars(self):
+        return tuple(self._grammars)
+
+
+class TestRecognitionMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.participant = RecognitionMetricsParticipant()
+        self.participant.__init__()
+        self.metrics = LatencyMetrics()
+        self.participant._metrics = self.metrics
+
+    def test_instrumented_rules(self):
+        """ Verify that rule processing is timed per grammar and rule. """
+        rule = Rule("rule")
+        grammar = Grammar("grammar", [rule])
+        self.participant.command_sets_changed((CommandSet([grammar]),), ())
+        self.participant.command_sets_changed((CommandSet([grammar]),), ())
+
+        rule.process_recognition("node")
+        self.assertEqual(rule.processed, ["node"])
+        summary = self.metrics.get_summary()
+        self.assertEqual([row[:4] for row in summary],
+                         [("grammar", "rule", "action", 1)])
+
+        self.participant.utterance_begun()
+        rule.process_recognition("node")
+        phases = dict((row[2], row[3]) for row in
+                      self.metrics.get_summary())
+        self.assertEqual(phases, {"action": 2, "recognition": 1,
+                                  "total": 1})
+
+    def test_instrumented_rules_freed(self):
+        """ Verify that instrumented rules are freed without waiting
+            for the garbage collector. """
+        rule = Rule("rule")
+        self.participant.instrument_grammar(Grammar("grammar", [rule]))
+        rule_reference = weakref.ref(rule)
+        gc.disable()
+        try:
+            del rule
+            self.assertEqual(rule_reference(), None)
+        finally:
+            gc.enable()
+
+    def test_failures(self):
+        self.participant.utterance_begun()
+        self.participant.utterance_failed()
+        self.assertEqual(self.metrics.failures, 1)
+
+    def test_export(self):
+        """ Verify that metrics are exported as CSV in milliseconds. """
+        self.metrics.record("grammar", "rule", "action", 0.002)
+        output = StringIO()
+        export_metrics(self.metrics, output)
+        output.seek(0)
+        rows = list(csv.reader(output))
+        self.assertEqual(rows[0][:6], ["grammar", "rule", "phase", "count",
+                                       "mean_ms", "max_ms"])
+        self.assertEqual(rows[1][:6], ["grammar", "rule", "action", "1",
+                                       "2.0", "2.0"])
@@ -0,0 +1,271 @@
+import os
+import time
+import tempfile
+import unittest
+from bumblebee.command.pipeline import set_main_thread_dispatcher
+from bumblebee.mock_engine import (MockEngine, Replayer, parse_utterance,
+                                   read_recording, DICTATION_RULE_ID)
+
+
+#===========================================================================
+
+class RecordingEngine(object):
+    """ Engine which recognizes utterances starting with "hello". """
+
+    def __init__(self):
+        self.utterances = []
+
+    def recognize(self, utterance):
+        self.utterances.append(utterance)
+        return utterance[0][0] == "hello"
+
+
+#---------------------------------------------------------------------------
+# Stand-ins for Dragonfly's decoding objects.
+
+class FakeState(object):
+    """ Decoding state; finished once a rule sets *matched*. """
+
+    def __init__(self, results, rule_names, engine):
+        self.results = results
+        self.rule_names = rule_names
+        self.engine = engine
+        self.matched = False
+
+    def initialize_decoding(self):
+        pass
+
+    def finished(self):
+        return self.matched
+
+    def build_parse_tree(self):
+        return ("root", self.results)
+
+
+class FakeRule(object):
+    """ Rule which matches one sequence of words. """
+
+    def __init__(self, name, words, exported=True, active=True,
+                 dictation=False):
+        self.name = name
+        self.words = words.split()
+        self.exported = exported
+        self.active = active
+        self.dictation = dictation
+        self.decoded = []
+        self.recognized = []
+        self.values = []
+
+    def decode(self, state):
+        self.decoded.append(state.results)
+        words = [word for word, rule_id in state.results
+                 if rule_id != DICTATION_RULE_ID]
+        if words != self.words:
+            return
+        if self.dictation:
+            # As Dragonfly's Dictation element extracts its value.
+            dictated = [word for word, rule_id in state.results
+                        if rule_id == DICTATION_RULE_ID]
+            self.values.append(state.engine.DictationContainer(dictated))
+        state.matched = True
+        yield state
+
+    def process_recognition(self, root):
+        self.recognized.append(root)
+
+
+class FakeGrammar(object):
+
+    def __init__(self, *rules):
+        self.rules = rules
+        self.enabled = True
+        self.contexts = []
+
+    def process_begin(self, executable, title, handle):
+        self.contexts.append((executable, title, handle))
+
+
+class FakeStateEngine(MockEngine):
+    """ Mock engine which decodes with :class:`FakeState`. """
+
+    def _create_state(self, results, rule_names):
+        return FakeState(results, rule_names, self)
+
+
+class RecordingObserver(object):
+
+    def __init__(self):
+        self.events = []
+
+    def on_begin(self):
+        self.events.append("begin")
+
+    def on_recognition(self, words):
+        self.events.append(("recognition", words))
+
+    def on_failure(self):
+        self.events.append("failure")
+
+
+#===========================================================================
+
+class TestRecordings(unittest.TestCase):
+
+    def test_parse_utterance(self):
+        self.assertEqual(parse_utterance("  open  file "),
+                         [("open", False), ("file", False)])
+        self.assertEqual(parse_utterance("say <hello world> now"),
+                         [("say", False), ("hello", True), ("world", True),
+                          ("now", False)])
+        self.assertEqual(parse_utterance("<note>"), [("note", True)])
+
+    def test_read_recording(self):
+        handle, path = tempfile.mkstemp(suffix=".txt")
+        os.write(handle, "# Comment\n\nhello world\n  say <this>  \n")
+        os.close(handle)
+        try:
+            self.assertEqual(read_recording(path),
+                             [[("hello", False), ("world", False)],
+                              [("say", False), ("this", True)]])
+        finally:
+            os.remove(path)
+
+
+#---------------------------------------------------------------------------
+
+class TestMockEngine(unittest.TestCase):
+
+    def test_grammars(self):
+        engine = MockEngine()
+        first, second = object(), object()
+        engine.load_grammar(first)
+        engine.load_grammar(second)
+        engine.load_grammar(first)
+        self.assertEqual(engine.get_grammars(), [first, second])
+
+        engine.set_exclusiveness(second, True)
+        engine.unload_grammar(second)
+        self.assertEqual(engine.get_grammars(), [first])
+        self.assertEqual(engine._exclusive, [])
+
+
+class TestRecognize(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = FakeStateEngine("notepad", "Untitled", 42)
+        self.observer = RecordingObserver()
+        self.engine.register_recognition_observer(self.observer)
+
+    def test_match(self):
+        """ Verify that the first matching rule processes the
+            recognition, and that words are tagged with rule ids. """
+        hidden = FakeRule("hidden", "open file", exported=False)
+        inactive = FakeRule("inactive", "open file", active=False)
+        other = FakeRule("other", "close file")
+        rule = FakeRule("open", "open file")
+        later = FakeRule("later", "open file")
+        grammar = FakeGrammar(hidden, inactive, other, rule)
+        self.engine.load_grammar(grammar)
+        self.engine.load_grammar(FakeGrammar(later))
+
+        self.assertTrue(self.engine.recognize(parse_utterance("open file")))
+        self.assertEqual(grammar.contexts, [("notepad", "Untitled", 42)])
+        self.assertEqual(hidden.decoded + inactive.decoded, [])
+        results = [("open", 2), ("file", 2)]
+        self.assertEqual(rule.recognized, [("root", results)])
+        self.assertEqual(later.decoded, [])
+        self.assertEqual(self.observer.events,
+                         ["begin", ("recognition", ["open", "file"])])
+
+    def test_no_match(self):
+        self.engine.load_grammar(FakeGrammar(FakeRule("open", "open")))
+        self.assertFalse(self.engine.recognize(parse_utterance("close")))
+        self.assertEqual(self.observer.events, ["begin", "failure"])
+        self.assertRaises(ValueError, self.engine.mimic, "close")
+
+    def test_exclusive(self):
+        rule = FakeRule("open", "open")
+        exclusive_rule = FakeRule("exclusive", "close")
+        exclusive = FakeGrammar(exclusive_rule)
+        self.engine.load_grammar(FakeGrammar(rule))
+        self.engine.load_grammar(exclusive)
+        self.engine.set_exclusiveness(exclusive, True)
+        self.assertFalse(self.engine.recognize(parse_utterance("open")))
+        self.assertEqual(rule.decoded, [])
+        self.engine.mimic(["close"])
+        self.assertEqual(len(exclusive_rule.recognized), 1)
+
+    def test_dictation(self):
+        """ Verify that dictated words are tagged and that dictation
+            values can be extracted. """
+        rule = FakeRule("say", "say now", dictation=True)
+        self.engine.load_grammar(FakeGrammar(rule))
+        self.engine.mimic("say <hello world> now")
+        self.assertEqual(rule.recognized[0][1],
+                         [("say", 0), ("hello", DICTATION_RULE_ID),
+                          ("world", DICTATION_RULE_ID), ("now", 0)])
+        value = rule.values[0]
+        self.assertEqual(value.words, ("hello", "world"))
+        self.assertEqual(value.format(), "hello world")
+        self.assertEqual(str(value), "hello world")
+        self.assertEqual(unicode(value), u"hello world")
+
+
+#---------------------------------------------------------------------------
+
+class TestReplayer(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = RecordingEngine()
+        self.utterances = [parse_utterance("hello world"),
+                           parse_utterance("goodbye")]
+
+    def tearDown(self):
+        set_main_thread_dispatcher(None)
+
+    def test_replay(self):
+        replayer = Replayer(self.engine, self.utterances, repeat=3,
+                            batch_size=4)
+        replayer.start()
+        self.assertTrue(replayer.wait(5.0))
+        self.assertEqual(self.engine.utterances, self.utterances * 3)
+        self.assertEqual((replayer.replayed, replayer.recognized), (6, 3))
+        self.assertTrue(replayer.get_throughput() > 0)
+
+    def test_rate(self):
+        replayer = Replayer(self.engine, self.utterances, rate=100,
+                            repeat=5)
+        start_time = time.time()
+        replayer.start()
+        self.assertTrue(replayer.wait(5.0))
+        self.assertEqual(replayer.replayed, 10)
+        # The last of ten utterances is due after 90 ms.
+        self.assertTrue(time.time() - start_time >= 0.08)
+
+    def test_dispatched_in_batches(self):
+        batches = []
+
+        def dispatcher(function, *args):
+            batches.append(len(args[0]))
+            function(*args)
+        set_main_thread_dispatcher(dispatcher)
+        replayer = Replayer(self.engine, self.utterances, repeat=5,
+                            batch_size=4)
+        replayer.start()
+        self.assertTrue(replayer.wait(5.0))
+        self.assertEqual(batches, [4, 4, 2])
+
+    def test_stop(self):
+        replayer = Replayer(self.engine, self.utterances, rate=10,
+                            repeat=100)
+        replayer.start()
+        time.sleep(0.05)
+        replayer.stop()
+        self.assertTrue(replayer.wait(5.0))
+        self.assertTrue(replayer.replayed < 200)
+
+
+#===========================================================================
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os.path
+import unittest
+from bumblebee.command.manifest import CommandSetManifest
+from bumblebee.command.registry import CommandSetRegistry
+
+
+#===========================================================================
+
+class CommandSet(object):
+
+    def __init__(self, name, executable=None, title=None):
+        self._name = name
+        self._manifest = CommandSetManifest(name, "", executable, title)
+
+    def get_name_description(self):
+        return (self._name, "")
+
+    def get_path(self):
+        return os.path.join("commands", self._name + ".py")
+
+    def get_manifest(self):
+        return self._manifest
+
+
+#===========================================================================
+
+class TestCommandSetRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = CommandSetRegistry()
+        self.a = CommandSet("a")
+        self.b = CommandSet("b", executable="notepad")
+        self.c = CommandSet("c", title="Editor")
+        self.registry.apply_changes((self.c, self.a, self.b), ())
+
+    def test_sorted(self):
+        """ Verify that command sets are kept sorted by name. """
+        self.assertEqual(self.registry.get_command_sets(),
+                         (self.a, self.b, self.c))
+        self.assertEqual(self.registry.get_position(self.b), 1)
+        duplicate = CommandSet("b")
+        self.registry.apply_changes((duplicate,), (self.a,))
+        self.assertEqual(len(self.registry), 3)
+        self.assertEqual(set(self.registry.find_by_name("b")),
+                         set([self.b, duplicate]))
+        self.assertEqual(self.registry.find_by_name("a"), ())
+
+    def test_find_by_path(self):
+        self.assertTrue(self.registry.find_by_path("commands/b.py")
+                        is self.b)
+        self.registry.apply_changes((), (self.b,))
+        self.assertEqual(self.registry.find_by_path("commands/b.py"), None)
+
+    def test_find_for_context(self):
+        """ Verify that lookups by context use the manifests. """
+        self.assertEqual(set(self.registry.find_for_context(
+                             r"C:\Windows\Notepad.exe", "Untitled")),
+                         set([self.a, self.b]))
+        self.assertEqual(set(self.registry.find_for_context(
+                             "/usr/bin/vim", "Editor")),
+                         set([self.a, self.c]))
+
+    def test_changes_since(self):
+        """ Verify that changes can be replayed from a version. """
+        version = self.registry.get_version()
+        self.assertEqual(list(self.registry.changes_since(version)), [])
+        d = CommandSet("d")
+        self.registry.apply_changes((d,), (self.a,))
+        changes = list(self.registry.changes_since(version))
+        self.assertEqual(changes, [(version + 1, "removed", self.a),
+                                   (version + 2, "added", d)])
+
+    def test_changes_no_longer_retained(self):
+        """ Verify that callers must resync after old changes are
+            dropped. """
+        registry = CommandSetRegistry(max_changes=2)
+        for index in range(5):
+            registry.apply_changes((CommandSet(str(index)),), ())
+        self.assertEqual(registry.changes_since(0), None)
+        self.assertEqual(len(list(registry.changes_since(3))), 2)
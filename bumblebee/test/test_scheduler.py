@@ -0,0 +1,147 @@
+import time
+import logging
+import unittest
+import threading
+from bumblebee.scheduler import Scheduler
+
+
+#===========================================================================
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        # Main thread tasks are queued here, and run by run_queued().
+        self.queued = []
+        self.scheduler = Scheduler(self.call_soon)
+        self.calls = []
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def call_soon(self, function, *args):
+        self.queued.append((function, args))
+
+    def run_queued(self):
+        while self.queued:
+            function, args = self.queued.pop(0)
+            function(*args)
+
+    def get_statistics(self, name):
+        for statistics in self.scheduler.get_statistics():
+            if statistics[0] == name:
+                return statistics
+        self.fail("No task named {0}".format(name))
+
+    def test_trigger(self):
+        self.scheduler.add_task("a", lambda: self.calls.append("a"),
+                                triggers=["first", "both"])
+        self.scheduler.add_task("b", lambda: self.calls.append("b"),
+                                triggers=["second", "both"])
+        self.scheduler.trigger("first")
+        self.run_queued()
+        self.assertEqual(self.calls, ["a"])
+        self.scheduler.trigger("both")
+        self.run_queued()
+        self.assertEqual(self.calls, ["a", "a", "b"])
+        self.scheduler.trigger("unknown")
+        self.assertEqual(self.queued, [])
+
+    def test_overrun_coalesced(self):
+        self.scheduler.add_task("a", lambda: self.calls.append("a"),
+                                triggers=["event"])
+        for index in range(3):
+            self.scheduler.trigger("event")
+        self.assertEqual(len(self.queued), 1)
+        self.run_queued()
+        # The requests made while the first run was queued result in
+        #  one more run.
+        self.assertEqual(self.calls, ["a", "a"])
+        name, runs, failures, overruns = self.get_statistics("a")[:4]
+        self.assertEqual((runs, failures, overruns), (2, 0, 2))
+
+    def test_failure(self):
+        def fail():
+            raise ValueError("task failure")
+        self.scheduler.add_task("fail", fail, triggers=["event"])
+        logger = logging.getLogger("bumblebee.scheduler")
+        logger.disabled = True
+        try:
+            self.scheduler.trigger("event")
+            self.run_queued()
+        finally:
+            logger.disabled = False
+        self.assertEqual(self.get_statistics("fail")[1:3], (1, 1))
+
+        self.scheduler.reset_statistics()
+        self.assertEqual(self.get_statistics("fail")[1:], (0, 0, 0, None,
+                                                           None, None))
+
+    def test_slow_thread_task_does_not_block(self):
+        release = threading.Event()
+        finished = threading.Event()
+
+        def slow():
+            release.wait(5.0)
+            finished.set()
+        self.scheduler.add_task("slow", slow, triggers=["event"],
+                                main_thread=False)
+        self.scheduler.add_task("fast", lambda: self.calls.append("fast"),
+                                triggers=["event"])
+        self.scheduler.trigger("event")
+        self.scheduler.trigger("event")
+        self.run_queued()
+        self.assertEqual(self.calls, ["fast", "fast"])
+        self.assertFalse(finished.isSet())
+        self.assertEqual(self.get_statistics("slow")[3], 1)
+
+        release.set()
+        finished.wait(5.0)
+        for index in range(50):
+            if self.get_statistics("slow")[1] == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.get_statistics("slow")[1], 2)
+
+    def test_interval(self):
+        called = threading.Event()
+
+        def record():
+            self.calls.append(threading.currentThread().getName())
+            if len(self.calls) >= 3:
+                called.set()
+        self.scheduler.add_task("interval", record, interval=0.01,
+                                main_thread=False)
+        self.scheduler.start()
+        called.wait(5.0)
+        self.scheduler.stop()
+        self.assertTrue(len(self.calls) >= 3)
+        self.assertEqual(self.calls[0], "bumblebee-task-interval")
+
+    def test_timing_thread_only_for_intervals(self):
+        self.scheduler.add_task("triggered", lambda: None,
+                                triggers=["event"])
+        self.scheduler.start()
+        self.assertFalse(self.scheduler.is_timing())
+
+        called = threading.Event()
+        self.scheduler.add_task("interval", called.set, interval=0.01,
+                                main_thread=False)
+        self.assertTrue(self.scheduler.is_timing())
+        self.assertTrue(called.wait(5.0))
+        self.scheduler.stop()
+        self.assertFalse(self.scheduler.is_timing())
+
+    def test_remove_task(self):
+        self.scheduler.add_task("a", lambda: self.calls.append("a"),
+                                triggers=["event"])
+        self.scheduler.trigger("event")
+        self.scheduler.remove_task("a")
+        self.assertEqual(self.scheduler.get_task_names(), [])
+        self.scheduler.trigger("event")
+        self.assertEqual(len(self.queued), 1)
+
+
+#===========================================================================
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import time
+import logging
+import unittest
+from bumblebee.timeline import Timeline, get_startup_timeline
+
+
+#===========================================================================
+
+class TestTimeline(unittest.TestCase):
+
+    def test_mark_and_phase(self):
+        timeline = Timeline("Test")
+        timeline.mark("first")
+        with timeline.phase("second"):
+            time.sleep(0.01)
+        timeline.mark("third")
+
+        events = timeline.get_events()
+        self.assertEqual([e[0] for e in events], ["first", "second", "third"])
+        self.assertEqual(events[0][2], None)
+        self.assertTrue(events[1][2] >= 0.009)
+        self.assertTrue(events[0][1] <= events[1][1] <= events[2][1])
+        self.assertTrue(events[2][1] >= events[1][1] + events[1][2])
+
+    def test_phase_records_failures(self):
+        timeline = Timeline("Test")
+        try:
+            with timeline.phase("failing"):
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual([e[0] for e in timeline.get_events()], ["failing"])
+
+    def test_format(self):
+        timeline = Timeline("Test")
+        with timeline.phase("phase"):
+            pass
+        timeline.mark("event")
+        lines = timeline.format().splitlines()
+        self.assertEqual(lines[0], "Test:")
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].endswith(" ms)"))
+        self.assertTrue(" ms  phase (" in lines[1])
+        self.assertTrue(lines[2].endswith(" ms  event"))
+
+    def test_log_summary(self):
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        logger = logging.getLogger("bumblebee.timeline")
+        level, propagate = logger.level, logger.propagate
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        try:
+            timeline = Timeline("Test")
+            timeline.mark("event")
+            timeline.log_summary()
+        finally:
+            logger.removeHandler(handler)
+            logger.setLevel(level)
+            logger.propagate = propagate
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0].getMessage(), timeline.format())
+
+    def test_startup_timeline(self):
+        self.assertTrue(isinstance(get_startup_timeline(), Timeline))
+        self.assertTrue(get_startup_timeline() is get_startup_timeline())
+
+
+#===========================================================================
+
+if __name__ == "__main__":
+    unittest.main()
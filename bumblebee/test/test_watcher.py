@@ -0,0 +1,120 @@
+import os
+import os.path
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from bumblebee.watcher import (InotifyWatcher, Win32Watcher, PollingWatcher,
+                               create_watcher)
+
+
+#===========================================================================
+
+class WatcherTestBase(object):
+
+    watcher_class = None
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.changes = []
+        self.event = threading.Event()
+        self.watcher = self.watcher_class(self._callback, debounce=0.05)
+
+    def tearDown(self):
+        self.watcher.stop()
+        shutil.rmtree(self.directory)
+
+    def _callback(self, changed):
+        self.changes.append(changed)
+        self.event.set()
+
+    def _wait_for_change(self, timeout=5.0):
+        self.event.wait(timeout)
+        self.assertTrue(self.event.isSet(), "No change detected.")
+        self.event.clear()
+
+    def _write(self, filename, data):
+        path = os.path.join(self.directory, filename)
+        f = open(path, "w")
+        f.write(data)
+        f.close()
+        return path
+
+    def test_detects_new_file(self):
+        """ Verify that adding a file to a watched directory is seen. """
+        self.watcher.set_paths([self.directory])
+        self.watcher.start()
+        time.sleep(0.2)
+
+        self._write("module.py", "x = 1\n")
+        self._wait_for_change()
+        changed = set()
+        for c in self.changes:
+            changed.update(c)
+        self.assertTrue(changed)
+
+    def test_watched_file_ignores_siblings(self):
+        """ Verify that a watched file's siblings are not reported. """
+        config_path = self._write("Bumblebee.ini", "[a]\n")
+        self.watcher.set_paths([config_path])
+        self.watcher.start()
+        time.sleep(0.2)
+
+        self._write("other.txt", "data\n")
+        time.sleep(0.3)
+        for changed in self.changes:
+            self.assertFalse(os.path.join(self.directory, "other.txt")
+                             in changed)
+
+    def test_changes_are_debounced(self):
+        """ Verify that a burst of changes gives a single callback. """
+        self.watcher.set_paths([self.directory])
+        self.watcher.start()
+        time.sleep(0.2)
+
+        for index in range(20):
+            self._write("module_{0}.py".format(index), "x = 1\n")
+        self._wait_for_change()
+        time.sleep(0.2)
+        self.assertTrue(len(self.changes) <= 2)
+
+    def test_stop(self):
+        """ Verify that stopping the watcher ends its thread. """
+        self.watcher.set_paths([self.directory])
+        self.watcher.start()
+        time.sleep(0.1)
+        self.watcher.stop()
+        self._write("module.py", "x = 1\n")
+        time.sleep(0.2)
+        self.assertFalse(self.changes)
+
+
+#---------------------------------------------------------------------------
+
+class TestPollingWatcher(WatcherTestBase, unittest.TestCase):
+
+    class watcher_class(PollingWatcher):
+        def __init__(self, callback, debounce):
+            PollingWatcher.__init__(self, callback, debounce, interval=0.05)
+
+
+if InotifyWatcher.is_available():
+    class TestInotifyWatcher(WatcherTestBase, unittest.TestCase):
+        watcher_class = InotifyWatcher
+
+if Win32Watcher.is_available():
+    class TestWin32Watcher(WatcherTestBase, unittest.TestCase):
+        watcher_class = Win32Watcher
+
+
+#---------------------------------------------------------------------------
+
+class TestCreateWatcher(unittest.TestCase):
+
+    def test_polling_fallback(self):
+        """ Verify that create_watcher() always returns a watcher. """
+        watcher = create_watcher(lambda changed: None)
+        self.assertTrue(watcher.is_available())
+        watcher = create_watcher(lambda changed: None, backend="polling")
+        self.assertTrue(isinstance(watcher, PollingWatcher))
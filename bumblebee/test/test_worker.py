@@ -0,0 +1,96 @@
+import os
+import os.path
+import time
+import shutil
+import tempfile
+import unittest
+from bumblebee.command.worker import (WorkerPool, WorkerError, WorkerTimeout,
+                                      WorkerCrashed, RemoteFunction)
+
+
+#===========================================================================
+
+helper_source = """
+import os
+import time
+
+def add(a, b):
+    return a + b
+
+def get_pid():
+    return os.getpid()
+
+def fail():
+    raise ValueError("failed on purpose")
+
+def hang():
+    time.sleep(60)
+
+def crash():
+    os._exit(1)
+"""
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "helpers.py")
+        f = open(self.path, "w")
+        f.write(helper_source)
+        f.close()
+        self.pool = WorkerPool(size=1, timeout=5.0)
+
+    def tearDown(self):
+        self.pool.close()
+        shutil.rmtree(self.directory)
+
+    def test_call(self):
+        """ Verify that functions run in a separate process. """
+        self.assertEqual(self.pool.call(self.path, "add", 2, 3), 5)
+        self.assertNotEqual(self.pool.call(self.path, "get_pid"),
+                            os.getpid())
+        self.assertEqual(self.pool.call("os.path", "join", "a", "b"),
+                         os.path.join("a", "b"))
+
+    def test_error(self):
+        """ Verify that exceptions are reported with tracebacks. """
+        try:
+            self.pool.call(self.path, "fail")
+        except WorkerError, e:
+            self.assertTrue("failed on purpose" in str(e))
+        else:
+            self.fail("WorkerError not raised.")
+
+    def test_timeout(self):
+        """ Verify that hanging workers are restarted. """
+        call = self.pool.submit(self.path, "hang", timeout=0.5)
+        self.assertRaises(WorkerTimeout, call.wait, 10)
+        self.assertEqual(self.pool.get_restart_count(), 1)
+        self.assertEqual(self.pool.call(self.path, "add", 1, 1), 2)
+
+    def test_crash(self):
+        """ Verify that crashed workers are restarted. """
+        call = self.pool.submit(self.path, "crash")
+        self.assertRaises(WorkerCrashed, call.wait, 10)
+        self.assertEqual(self.pool.get_restart_count(), 1)
+        self.assertEqual(self.pool.call(self.path, "add", 1, 1), 2)
+
+    def test_remote_function(self):
+        """ Verify that remote functions return without waiting. """
+        remote = RemoteFunction(self.path, "add", pool=self.pool)
+        call = remote(4, 5)
+        self.assertEqual(call.wait(10), 9)
+
+    def test_close(self):
+        """ Verify that busy workers share the timeout on close. """
+        pool = WorkerPool(size=2, timeout=30.0)
+        busy = [pool.submit(self.path, "hang") for index in range(2)]
+        pending = pool.submit(self.path, "add", (1, 1))
+        time.sleep(0.5)
+        start = time.time()
+        pool.close(timeout=1.0)
+        self.assertTrue(time.time() - start < 5.0)
+        self.assertRaises(WorkerError, pending.wait, 1)
+        for call in busy:
+            self.assertRaises(WorkerError, call.wait, 5)
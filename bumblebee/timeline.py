@@ -0,0 +1,98 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+
+class Timeline(object):
+    """
+        Records the times of named events and the durations of named
+        phases, relative to the timeline's creation.
+
+        Bumblebee's startup timeline is created when
+        :mod:`bumblebee.application` starts importing, and records
+        each startup step up to the engine connection, so that slow
+        steps, and the time until the main window is visible, can be
+        found.
+
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._start_time = time.time()
+        self._events = []
+        self._lock = threading.Lock()
+
+    def get_events(self):
+        """
+            Returns a list of ``(name, offset, duration)`` 3-tuples, in
+            seconds; *duration* is None for events which mark a single
+            point in time.
+
+        """
+
+        self._lock.acquire()
+        try:
+            return list(self._events)
+        finally:
+            self._lock.release()
+
+    def mark(self, name):
+        """ Records that the event *name* happened now. """
+        self._add(name, time.time() - self._start_time, None)
+
+    @contextmanager
+    def phase(self, name):
+        """ Context manager which records the duration of a phase. """
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self.add_phase(name, start_time, time.time() - start_time)
+
+    def add_phase(self, name, start_time, duration):
+        """
+            Records a phase which started at *start_time*, as given by
+            ``time.time()``, and lasted *duration* seconds.
+
+        """
+
+        self._add(name, start_time - self._start_time, duration)
+
+    def format(self):
+        """ Returns the timeline as text, one event per line. """
+        lines = ["{0}:".format(self._name)]
+        for name, offset, duration in sorted(self.get_events(),
+                                             key=lambda e: e[1]):
+            line = "{0:>9.1f} ms  {1}".format(offset * 1000, name)
+            if duration is not None:
+                line += " ({0:.1f} ms)".format(duration * 1000)
+            lines.append(line)
+        return "\n".join(lines)
+
+    def log_summary(self):
+        log.info(self.format())
+
+    def _add(self, name, offset, duration):
+        self._lock.acquire()
+        try:
+            self._events.append((name, offset, duration))
+        finally:
+            self._lock.release()
+
+
+#---------------------------------------------------------------------------
+
+startup_timeline = Timeline("Startup timeline")
+
+
+def get_startup_timeline():
+    """ Returns the :class:`Timeline` of Bumblebee's startup. """
+    return startup_timeline
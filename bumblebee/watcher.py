@@ -0,0 +1,573 @@
+import os
+import os.path
+import sys
+import errno
+import select
+import struct
+import logging
+import threading
+
+
+#===========================================================================
+
+log = logging.getLogger(__name__)
+
+
+#===========================================================================
+
+class WatcherBase(object):
+    """
+        Base class for file-watch backends.
+
+        A watcher monitors a set of files and directories from a
+        background thread and calls a given callback whenever one
+        of them changes.  Changes that arrive in quick succession are
+        debounced, so that a single editor save or a bulk copy into a
+        command directory results in a single callback.
+
+        The callback is called from the watcher's thread.  It is passed
+        a single argument: a set of absolute paths which were reported
+        as changed.  Backends which cannot report individual files
+        report the watched directory instead, so callers should treat
+        the paths as hints.
+
+        Derived classes implement the following methods:
+         - :meth:`_open` and :meth:`_close` -- acquire and release
+           backend resources; called on the watcher thread.
+         - :meth:`_update_watches` -- start watching a new set of
+           directories.
+         - :meth:`_wait` -- block for at most *timeout* seconds and
+           return the set of changed paths.
+         - :meth:`_wake` -- interrupt a blocking :meth:`_wait`.
+
+    """
+
+    name = None
+
+    def __init__(self, callback, debounce=0.05):
+        self._callback = callback
+        self._debounce = debounce
+        self._lock = threading.Lock()
+        self._paths = frozenset()
+        self._paths_dirty = False
+        self._running = False
+        self._thread = None
+        self.wakeup_count = 0
+        self.callback_count = 0
+
+    def __str__(self):
+        return "<{0}({1} paths)>".format(self.__class__.__name__,
+                                         len(self._paths))
+
+    @classmethod
+    def is_available(cls):
+        """ Returns True if this backend can be used on this system. """
+        return False
+
+    #-----------------------------------------------------------------------
+    # Public interface.
+
+    def set_paths(self, paths):
+        """
+            Sets the files and directories to watch.
+
+            Directories are watched for any changes to their direct
+            contents; files are watched by watching their parent
+            directory and filtering for the file's name.
+
+        """
+
+        paths = frozenset(os.path.abspath(path) for path in paths)
+        self._lock.acquire()
+        try:
+            if paths == self._paths:
+                return
+            self._paths = paths
+            self._paths_dirty = True
+        finally:
+            self._lock.release()
+
+        log.debug("Watching paths: {0}".format(", ".join(sorted(paths))))
+        if self._running:
+            self._wake()
+
+    def get_paths(self):
+        return self._paths
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run,
+                                        name="bumblebee-watcher")
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self._wake()
+        if self._thread and self._thread is not threading.currentThread():
+            self._thread.join(5.0)
+        self._thread = None
+
+    #-----------------------------------------------------------------------
+    # Internal methods.
+
+    def _run(self):
+        log.debug("Watcher {0} started.".format(self))
+        try:
+            self._open()
+        except Exception, e:
+            log.exception("Failed to start watcher {0}: {1}"
+                          "".format(self, e))
+            self._running = False
+            return
+
+        try:
+            while self._running:
+                self._refresh_watches()
+                changed = self._wait(None)
+                self.wakeup_count += 1
+                if not changed or not self._running:
+                    continue
+
+                # Debounce: keep collecting changes until things
+                #  have been quiet for the debounce interval.
+                while self._running:
+                    more = self._wait(self._debounce)
+                    self.wakeup_count += 1
+                    if not more:
+                        break
+                    changed.update(more)
+
+                if self._running:
+                    self._dispatch(changed)
+        finally:
+            self._close()
+            log.debug("Watcher {0} stopped.".format(self))
+
+    def _refresh_watches(self):
+        self._lock.acquire()
+        try:
+            if not self._paths_dirty:
+                return
+            self._paths_dirty = False
+            paths = self._paths
+        finally:
+            self._lock.release()
+
+        directories = set()
+        for path in paths:
+            if os.path.isdir(path):
+                directories.add(path)
+            else:
+                directories.add(os.path.dirname(path))
+        self._update_watches(directories)
+
+    def _is_relevant(self, directory, filename):
+        """
+            Returns the path to report for a change to *filename*
+            within *directory*, or None if the change is not relevant.
+
+        """
+
+        paths = self._paths
+        if directory in paths:
+            if filename:
+                return os.path.join(directory, filename)
+            return directory
+        if filename:
+            path = os.path.join(directory, filename)
+            if path in paths:
+                return path
+            return None
+        # Backend cannot tell which file changed; report the
+        #  directory and let the caller check its files.
+        return directory
+
+    def _dispatch(self, changed):
+        self.callback_count += 1
+        try:
+            self._callback(changed)
+        except Exception, e:
+            log.exception("Watcher callback failed: {0}".format(e))
+
+    def _open(self):
+        pass
+
+    def _close(self):
+        pass
+
+    def _update_watches(self, directories):
+        raise NotImplementedError
+
+    def _wait(self, timeout):
+        raise NotImplementedError
+
+    def _wake(self):
+        raise NotImplementedError
+
+
+#---------------------------------------------------------------------------
+# Linux inotify backend.
+
+class InotifyWatcher(WatcherBase):
+    """
+        Watcher backend using the Linux inotify API through ctypes.
+
+        The watcher thread blocks in ``select()`` on the inotify file
+        descriptor and a wake-up pipe, so it uses no CPU while idle.
+
+    """
+
+    name = "inotify"
+
+    IN_MODIFY       = 0x00000002
+    IN_ATTRIB       = 0x00000004
+    IN_CLOSE_WRITE  = 0x00000008
+    IN_MOVED_FROM   = 0x00000040
+    IN_MOVED_TO     = 0x00000080
+    IN_CREATE       = 0x00000100
+    IN_DELETE       = 0x00000200
+    IN_DELETE_SELF  = 0x00000400
+    IN_MOVE_SELF    = 0x00000800
+    IN_Q_OVERFLOW   = 0x00004000
+    IN_IGNORED      = 0x00008000
+
+    watch_mask = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+                  IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF |
+                  IN_MOVE_SELF)
+
+    _event_header = struct.Struct("iIII")
+    _libc = None
+
+    def __init__(self, callback, debounce=0.05):
+        WatcherBase.__init__(self, callback, debounce)
+        self._fd = None
+        self._wake_read = None
+        self._wake_write = None
+        self._watches = {}     # directory -> watch descriptor
+        self._directories = {}  # watch descriptor -> directory
+
+    @classmethod
+    def _get_libc(cls):
+        if cls._libc is None:
+            import ctypes
+            import ctypes.util
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6",
+                               use_errno=True)
+            libc.inotify_init.restype = ctypes.c_int
+            libc.inotify_add_watch.argtypes = [ctypes.c_int,
+                                               ctypes.c_char_p,
+                                               ctypes.c_uint32]
+            libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+            cls._libc = libc
+        return cls._libc
+
+    @classmethod
+    def is_available(cls):
+        if not sys.platform.startswith("linux"):
+            return False
+        try:
+            libc = cls._get_libc()
+            return bool(getattr(libc, "inotify_init", None))
+        except Exception:
+            return False
+
+    def _open(self):
+        import ctypes
+        self._wake_read, self._wake_write = os.pipe()
+        self._fd = self._get_libc().inotify_init()
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def _close(self):
+        for fd in (self._fd, self._wake_read, self._wake_write):
+            if fd is not None:
+                os.close(fd)
+        self._fd = self._wake_read = self._wake_write = None
+        self._watches = {}
+        self._directories = {}
+
+    def _update_watches(self, directories):
+        import ctypes
+        libc = self._get_libc()
+
+        for directory in set(self._watches) - directories:
+            descriptor = self._watches.pop(directory)
+            self._directories.pop(descriptor, None)
+            libc.inotify_rm_watch(self._fd, descriptor)
+
+        for directory in directories - set(self._watches):
+            encoding = sys.getfilesystemencoding() or "utf-8"
+            encoded = directory.encode(encoding)
+            descriptor = libc.inotify_add_watch(self._fd, encoded,
+                                                self.watch_mask)
+            if descriptor < 0:
+                error = ctypes.get_errno()
+                log.warning("Cannot watch directory {0}: {1}"
+                            "".format(directory, os.strerror(error)))
+                continue
+            self._watches[directory] = descriptor
+            self._directories[descriptor] = directory
+
+    def _wait(self, timeout):
+        try:
+            readable = select.select([self._fd, self._wake_read],
+                                     [], [], timeout)[0]
+        except select.error, e:
+            if e.args[0] == errno.EINTR:
+                return set()
+            raise
+
+        if self._wake_read in readable:
+            os.read(self._wake_read, 4096)
+        if self._fd not in readable:
+            return set()
+        return self._read_events(os.read(self._fd, 65536))
+
+    def _read_events(self, data):
+        changed = set()
+        header_size = self._event_header.size
+        offset = 0
+        while offset + header_size <= len(data):
+            descriptor, mask, cookie, length = \
+                self._event_header.unpack_from(data, offset)
+            offset += header_size
+            filename = data[offset:offset + length].rstrip("\0")
+            offset += length
+
+            if mask & self.IN_Q_OVERFLOW:
+                # Events were lost; report every watched path.
+                changed.update(self._paths)
+                continue
+            directory = self._directories.get(descriptor)
+            if directory is None:
+                continue
+            if mask & self.IN_IGNORED:
+                # Watched directory was removed; re-add it later.
+                del self._directories[descriptor]
+                self._watches.pop(directory, None)
+                self._paths_dirty = True
+                changed.add(directory)
+                continue
+            path = self._is_relevant(directory, filename)
+            if path:
+                changed.add(path)
+        return changed
+
+    def _wake(self):
+        if self._wake_write is not None:
+            os.write(self._wake_write, "x")
+
+
+#---------------------------------------------------------------------------
+# Windows change-notification backend.
+
+class Win32Watcher(WatcherBase):
+    """
+        Watcher backend using Win32 directory change notifications.
+
+        The watcher thread blocks in ``WaitForMultipleObjects()`` on one
+        change notification handle per directory plus a wake-up event.
+        Windows does not report which file changed, so the directory
+        is reported instead.
+
+    """
+
+    name = "win32"
+    max_handles = 63   # MAXIMUM_WAIT_OBJECTS minus the wake-up event.
+
+    def __init__(self, callback, debounce=0.05):
+        WatcherBase.__init__(self, callback, debounce)
+        self._wake_event = None
+        self._handles = {}   # directory -> change notification handle
+
+    @classmethod
+    def is_available(cls):
+        if sys.platform != "win32":
+            return False
+        try:
+            import win32file
+            import win32event
+        except ImportError:
+            return False
+        return True
+
+    def _open(self):
+        import win32event
+        self._wake_event = win32event.CreateEvent(None, False, False, None)
+
+    def _close(self):
+        import win32file
+        for handle in self._handles.values():
+            win32file.FindCloseChangeNotification(handle)
+        self._handles = {}
+        self._wake_event = None
+
+    def _update_watches(self, directories):
+        import win32con
+        import win32file
+
+        for directory in set(self._handles) - directories:
+            handle = self._handles.pop(directory)
+            win32file.FindCloseChangeNotification(handle)
+
+        flags = (win32con.FILE_NOTIFY_CHANGE_FILE_NAME |
+                 win32con.FILE_NOTIFY_CHANGE_LAST_WRITE |
+                 win32con.FILE_NOTIFY_CHANGE_SIZE)
+        for directory in sorted(directories - set(self._handles)):
+            if len(self._handles) >= self.max_handles:
+                log.warning("Too many watched directories; not watching"
+                            " {0}".format(directory))
+                continue
+            try:
+                handle = win32file.FindFirstChangeNotification(directory,
+                                                               False, flags)
+            except Exception, e:
+                log.warning("Cannot watch directory {0}: {1}"
+                            "".format(directory, e))
+                continue
+            self._handles[directory] = handle
+
+    def _wait(self, timeout):
+        import win32event
+        import win32file
+
+        directories = list(self._handles)
+        handles = [self._wake_event]
+        handles.extend(self._handles[d] for d in directories)
+        if timeout is None:
+            milliseconds = win32event.INFINITE
+        else:
+            milliseconds = int(timeout * 1000)
+
+        result = win32event.WaitForMultipleObjects(handles, False,
+                                                   milliseconds)
+        index = result - win32event.WAIT_OBJECT_0
+        if index <= 0 or index >= len(handles):
+            return set()
+        directory = directories[index - 1]
+        win32file.FindNextChangeNotification(handles[index])
+        return set([self._is_relevant(directory, None)])
+
+    def _wake(self):
+        import win32event
+        if self._wake_event is not None:
+            win32event.SetEvent(self._wake_event)
+
+
+#---------------------------------------------------------------------------
+# Portable polling backend.
+
+class PollingWatcher(WatcherBase):
+    """
+        Watcher backend which polls file modification times.
+
+        This backend is used when no event-driven backend is available.
+        Each poll costs one ``stat()`` per watched file and per file
+        within each watched directory.
+
+    """
+
+    name = "polling"
+
+    def __init__(self, callback, debounce=0.05, interval=0.5):
+        WatcherBase.__init__(self, callback, debounce)
+        self._interval = interval
+        self._wake_event = threading.Event()
+        self._signatures = {}
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def _update_watches(self, directories):
+        # Take fresh signatures of the current paths, so that
+        #  only changes after this point are reported.
+        self._signatures = dict((path, self._get_signature(path))
+                                for path in self._paths)
+
+    def _get_signature(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isdir(path):
+            return (stat.st_mtime, stat.st_size)
+
+        entries = [stat.st_mtime]
+        try:
+            names = os.listdir(path)
+        except OSError:
+            return None
+        for name in sorted(names):
+            try:
+                entry = os.stat(os.path.join(path, name))
+            except OSError:
+                continue
+            entries.append((name, entry.st_mtime, entry.st_size))
+        return tuple(entries)
+
+    def _wait(self, timeout):
+        if timeout is None:
+            timeout = self._interval
+        else:
+            timeout = min(timeout, self._interval)
+        self._wake_event.wait(timeout)
+        self._wake_event.clear()
+        if not self._running or self._paths_dirty:
+            return set()
+
+        changed = set()
+        for path in self._paths:
+            signature = self._get_signature(path)
+            if self._signatures.get(path) != signature:
+                self._signatures[path] = signature
+                changed.add(path)
+        return changed
+
+    def _wake(self):
+        self._wake_event.set()
+
+
+#===========================================================================
+# Backend selection.
+
+backends = [
+            InotifyWatcher,
+            Win32Watcher,
+            PollingWatcher,
+           ]
+
+
+def create_watcher(callback, backend="auto", debounce=0.05):
+    """
+        Creates a watcher using the named backend.
+
+        :param callback: Callable which will be called from the
+            watcher's thread with a set of changed paths.
+        :param backend: Name of the backend to use, or "auto" to
+            select the first available event-driven backend and fall
+            back to polling.
+        :param debounce: Quiet period in seconds after a change before
+            the callback is called.
+
+    """
+
+    for watcher_class in backends:
+        if backend not in ("auto", watcher_class.name):
+            continue
+        if not watcher_class.is_available():
+            if backend != "auto":
+                log.warning("Watcher backend {0} is not available."
+                            "".format(backend))
+            continue
+        log.info("Using {0} file watcher.".format(watcher_class.name))
+        return watcher_class(callback, debounce=debounce)
+
+    log.warning("Falling back to polling file watcher.")
+    return PollingWatcher(callback, debounce=debounce)